@@ -0,0 +1,38 @@
+"""
+Скрипт пересчета вычисляемых полей parts_catalog (size_keys, диаметр, длина,
+стандарт, класс прочности, покрытие, нормализованное название)
+
+Запускать после миграций supabase/migrations/20261016000000_parts_catalog_size_keys.sql
+и 20261016000100_parts_catalog_search_fields.sql и после каждой загрузки каталога
+в обход ingest_catalog.py. Поля считаются теми же функциями, что и при загрузке.
+"""
+
+import asyncio
+import logging
+
+from config import DB_TABLES
+from database import supabase_client
+from services.catalog_ingest import SNAPSHOT_COLUMNS, stale_catalog_rows, upload_catalog
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def backfill_size_keys():
+    """Пересчитывает вычисляемые поля для позиций, где они устарели"""
+    await supabase_client.init_supabase()
+    client = supabase_client._supabase_client
+    if not client:
+        logger.error("Supabase client not initialized")
+        return
+    
+    table = DB_TABLES['parts_catalog']
+    response = client.table(table).select(', '.join(SNAPSHOT_COLUMNS)).execute()
+    rows = response.data or []
+    
+    stale = stale_catalog_rows(rows)
+    upload_catalog(client, stale, table=table)
+    
+    logger.info(f"Вычисляемые поля обновлены: {len(stale)} из {len(rows)} позиций")
+
+if __name__ == "__main__":
+    asyncio.run(backfill_size_keys())
@@ -19,6 +19,23 @@ OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4')
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY не установлен в переменных окружения")
 
+# Запуск ассистента (Assistants API): stream - события по SSE, poll - опрос runs.retrieve
+# с растущей паузой (от начальной до максимальной, секунды); общий дедлайн запуска (секунды)
+ASSISTANT_RUN_MODE = os.getenv('ASSISTANT_RUN_MODE', 'stream').lower()
+ASSISTANT_RUN_TIMEOUT = float(os.getenv('ASSISTANT_RUN_TIMEOUT', '60'))
+ASSISTANT_POLL_INITIAL = float(os.getenv('ASSISTANT_POLL_INITIAL', '0.05'))
+ASSISTANT_POLL_MAX = float(os.getenv('ASSISTANT_POLL_MAX', '0.5'))
+
+# Треды ассистента: сколько держать всего (свободных и занятых), сколько секунд
+# свободный тред ждет повторного использования и после скольких запусков удаляется
+ASSISTANT_MAX_THREADS = int(os.getenv('ASSISTANT_MAX_THREADS', '50'))
+ASSISTANT_THREAD_IDLE_TTL = float(os.getenv('ASSISTANT_THREAD_IDLE_TTL', '600'))
+ASSISTANT_THREAD_MAX_RUNS = int(os.getenv('ASSISTANT_THREAD_MAX_RUNS', '20'))
+
+# Локальный разбор строк заказа правилами: строки с уверенностью не ниже порога
+# не отправляются ассистенту (значение больше 1 отключает локальный разбор)
+RULE_PARSER_MIN_CONFIDENCE = float(os.getenv('RULE_PARSER_MIN_CONFIDENCE', '0.8'))
+
 # Supabase конфигурация
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
@@ -49,6 +66,77 @@ DB_TABLES = {
 MAX_EXCEL_ROWS = 1000  # Максимальное количество строк в Excel файле
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB максимальный размер файла
 
+# Кэш каталога (секунды между проверками изменений parts_catalog/aliases)
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', '300'))
+
+# Кэш разбора строк заказа (количество уникальных строк в LRU)
+PARSER_CACHE_SIZE = int(os.getenv('PARSER_CACHE_SIZE', '4096'))
+
+# Кэш решений GPT-валидации (SQLite; пустой путь отключает кэш)
+GPT_CACHE_PATH = os.getenv('GPT_CACHE_PATH', 'gpt_decision_cache.sqlite3')
+GPT_CACHE_TTL = int(os.getenv('GPT_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Пакетная GPT-валидация: строк в одном промпте и бюджет токенов промпта
+GPT_BATCH_MAX_LINES = int(os.getenv('GPT_BATCH_MAX_LINES', '20'))
+GPT_BATCH_TOKEN_BUDGET = int(os.getenv('GPT_BATCH_TOKEN_BUDGET', '6000'))
+
+# Таймаут пакетных этапов обработки заказа: GPT-валидация и поиск в Supabase (секунды)
+STAGE_TIMEOUT = float(os.getenv('STAGE_TIMEOUT', '60'))
+
+# Общий HTTP-клиент (Edge Functions): размер пула соединений и таймауты (секунды)
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))
+
+# Кэш результатов fastener-search: TTL (0 отключает кэш), TTL пустых ответов,
+# размер кэша в памяти, Redis (опционально) и интервал сверки с версией снимка каталога
+# (саму версию в Supabase проверяет кэш каталога раз в CATALOG_CACHE_TTL)
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '600'))
+SEARCH_CACHE_NEGATIVE_TTL = int(os.getenv('SEARCH_CACHE_NEGATIVE_TTL', '60'))
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', '5000'))
+SEARCH_CACHE_REDIS_URL = os.getenv('SEARCH_CACHE_REDIS_URL', '')
+SEARCH_CACHE_VERSION_INTERVAL = int(os.getenv('SEARCH_CACHE_VERSION_INTERVAL', '60'))
+
+# Параллельный поиск позиций множественного заказа (одновременных вызовов fastener-search)
+SEARCH_CONCURRENCY = int(os.getenv('SEARCH_CONCURRENCY', '8'))
+
+# Позиций в одном batch-запросе к fastener-search (не больше 50, см. index.ts)
+SEARCH_BATCH_SIZE = int(os.getenv('SEARCH_BATCH_SIZE', '50'))
+
+# Локальный поиск (порт ранжирования fastener-search): off - выключен,
+# primary - вместо Edge Function, fallback - при недоступности Edge Function.
+# Источник каталога: supabase (parts_catalog), путь к normalized_skus.jsonl
+# или к снимку каталога *.json.gz
+LOCAL_SEARCH_MODE = os.getenv('LOCAL_SEARCH_MODE', 'fallback').lower()
+LOCAL_SEARCH_SOURCE = os.getenv('LOCAL_SEARCH_SOURCE', 'supabase')
+LOCAL_SEARCH_REFRESH = int(os.getenv('LOCAL_SEARCH_REFRESH', '300'))
+
+# Снимок каталога, который пишет ingest_catalog.py (можно указать в LOCAL_SEARCH_SOURCE)
+CATALOG_SNAPSHOT_PATH = os.getenv('CATALOG_SNAPSHOT_PATH', 'catalog_snapshot.json.gz')
+
+# Поиск по каталогу: сколько лучших кандидатов оставлять на строку (0 - все; GPT видит 5)
+# и с какого размера шортлиста считать оценки векторно через NumPy (если установлен)
+MATCH_TOP_K = int(os.getenv('MATCH_TOP_K', '20'))
+VECTOR_SCORING_MIN_SHORTLIST = int(os.getenv('VECTOR_SCORING_MIN_SHORTLIST', '500'))
+
+# Исправление опечаток по триграммам до поиска в Supabase: минимальная похожесть слова (0 отключает)
+TYPO_MIN_SIMILARITY = float(os.getenv('TYPO_MIN_SIMILARITY', '0.3'))
+# Исправлять опечатки, только если локальных кандидатов меньше этого числа (0 - только когда их нет)
+TYPO_MAX_CANDIDATES = int(os.getenv('TYPO_MAX_CANDIDATES', '5'))
+
+# Очередь webhook (webhook_app_v2): воркеров, максимум обновлений в очереди
+# (при переполнении отвечаем 503, Telegram повторит доставку) и сколько секунд
+# дорабатывать очередь при остановке. 0 воркеров - обработка прямо в запросе
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '4'))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '100'))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))
+
+# Повторы обновлений Telegram: сколько последних update_id помнить (0 отключает)
+# и SQLite-файл, чтобы помнить их после перезапуска (пусто - только в памяти)
+UPDATE_DEDUP_SIZE = int(os.getenv('UPDATE_DEDUP_SIZE', '10000'))
+UPDATE_DEDUP_PATH = os.getenv('UPDATE_DEDUP_PATH', '')
+
 # Фильтрация результатов
 MIN_PROBABILITY_THRESHOLD = 25  # Минимальная вероятность для включения в результаты (в процентах)
 
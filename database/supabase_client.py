@@ -2,10 +2,14 @@
 Клиент для работы с Supabase
 """
 
+import asyncio
 import logging
 import json
+import time
+from typing import Optional
 from supabase import create_client, Client
-from config import SUPABASE_URL, SUPABASE_KEY, DB_TABLES
+from config import SUPABASE_URL, SUPABASE_KEY, DB_TABLES, CATALOG_CACHE_TTL
+from services.local_search import local_search, local_search_mode, MODE_PRIMARY, MODE_FALLBACK
 
 logger = logging.getLogger(__name__)
 
@@ -75,7 +79,8 @@ async def search_parts(query: str, user_intent: dict = None) -> list:
             return []
         
         # Вызываем Edge Function для умного поиска
-        import aiohttp
+        from shared.http import get_http_session
+        from services.search_cache import get_search_cache
         
         edge_function_url = f"{SUPABASE_URL}/functions/v1/fastener-search"
         headers = {
@@ -83,63 +88,7 @@ async def search_parts(query: str, user_intent: dict = None) -> list:
             'Content-Type': 'application/json'
         }
         
-        # Создаем поисковый запрос из user_intent
-        if user_intent and user_intent.get('type'):
-            parts = []
-            item_type = user_intent.get('type', '')
-            parts.append(item_type)
-
-            diameter = (user_intent.get('diameter') or '').strip()
-            length = (user_intent.get('length') or '').strip()
-
-            # Приводим размеры к формату 4.2x90 и добавляем варианты с х/×
-            def clean_mm(value: str) -> str:
-                v = value.lower().replace('мм', '').replace(' ', '')
-                return v
-
-            if diameter and length:
-                d = clean_mm(diameter)
-                l = clean_mm(length)
-                size_tokens = [f"{d}x{l}", f"{d}х{l}", f"{d}×{l}"]
-                parts.extend(size_tokens)
-            else:
-                if diameter:
-                    parts.append(diameter)
-                if length:
-                    parts.append(length)
-
-            if user_intent.get('coating'):
-                parts.append(user_intent['coating'])
-            if user_intent.get('standard'):
-                parts.append(user_intent['standard'])
-
-            # Если исходный текст содержит ГКЛ — добавим синонимы для повышения совпадений
-            ql = (query or '').lower()
-            if 'гкл' in ql or 'гипсокарт' in ql:
-                parts.extend(['гкл', 'гипсокартон'])
-
-            search_query = ' '.join([p for p in parts if p])
-        else:
-            # Fallback на исходный запрос
-            search_query = query
-
-        # Расширяем токены по справочнику синонимов
-        try:
-            from services.alias_service import AliasService
-            alias_service = AliasService()
-            base_tokens = [t for t in search_query.split() if t]
-            expanded_tokens = await alias_service.expand_tokens(base_tokens, original_text=query)
-            # Собираем строку, избегая повторов
-            if expanded_tokens:
-                search_query = ' '.join(expanded_tokens)
-        except Exception as e:
-            logger.warning(f"Не удалось расширить синонимы: {e}")
-
-        # Логируем финальный поисковый запрос (после расширения)
-        logger.info(f"Умный поиск через Edge Function по запросу: {search_query}")
-        
-        # Сохраняем оригинальный user_intent для лучшего поиска
-        simplified_user_intent = user_intent.copy() if user_intent else {}
+        search_query, simplified_user_intent = await _build_edge_search_request(query, user_intent)
         
         payload = {
             'search_query': search_query,
@@ -151,7 +100,17 @@ async def search_parts(query: str, user_intent: dict = None) -> list:
         logger.info(f"Отправляем в Edge Function: user_intent.diameter = {simplified_user_intent.get('diameter')}")
         logger.info(f"Отправляем в Edge Function: user_intent.length = {simplified_user_intent.get('length')}")
         
-        async with aiohttp.ClientSession() as session:
+        search_cache = get_search_cache()
+        results = None
+        if local_search_mode() == MODE_PRIMARY:
+            results = await local_search(search_query, simplified_user_intent)
+        if results is None and search_cache is not None:
+            results = await search_cache.get(search_query, simplified_user_intent)
+        
+        if results is not None:
+            logger.info(f"Результаты поиска из локального каталога или кэша: {len(results)}")
+        else:
+            session = await get_http_session()
             async with session.post(edge_function_url, json=payload, headers=headers) as response:
                 if response.status == 200:
                     data = await response.json()
@@ -160,59 +119,169 @@ async def search_parts(query: str, user_intent: dict = None) -> list:
                     logger.error(f"Edge Function вернул ошибку: {response.status}")
                     # Fallback на старый поиск
                     return await _fallback_search_parts(query, user_intent)
+            if search_cache is not None:
+                await search_cache.set(search_query, simplified_user_intent, results)
         
-        # Конвертируем в формат для Excel
-        formatted_results = []
-        for result in results:
-            # Рассчитываем упаковку если указано количество
-            if user_intent and user_intent.get('quantity'):
-                # Извлекаем числовое значение из строки количества
-                qty_str = str(user_intent['quantity'])
-                qty_number = int(''.join(filter(str.isdigit, qty_str)))
-                
-                packaging = await _calculate_packaging_for_result(
-                    qty_number, 
-                    result.get('pack_size', 1)
-                )
-            else:
-                packaging = {
-                    'packages_needed': 0,
-                    'total_quantity': 0,
-                    'excess_quantity': 0
-                }
-            
-            # Форматируем результат
-            formatted_result = {
-                'sku': result.get('sku', ''),
-                'name': result.get('name', ''),
-                'type': _extract_type_from_name(result.get('name', '')),
-                'pack_size': result.get('pack_size', 1),
-                'unit': result.get('unit', 'шт'),
-                'relevance_score': result.get('relevance_score', 0),
-                'match_reason': result.get('match_reason', ''),
-                'packages_needed': packaging['packages_needed'],
-                'total_quantity': packaging['total_quantity'],
-                'excess_quantity': packaging['excess_quantity'],
-                'confidence_score': int(result.get('relevance_score', 0) * 100),
-                'probability_percent': result.get('probability_percent', 1.0),  # Добавляем probability_percent из Edge Function
-                'user_intent': user_intent,  # Добавляем user_intent для Excel
-                'search_query': result.get('search_query', query),  # Добавляем search_query
-                'full_query': result.get('full_query', query)  # Добавляем full_query
-            }
-            
-            formatted_results.append(formatted_result)
-        
-        # Сортируем по релевантности
-        formatted_results.sort(key=lambda x: x['relevance_score'], reverse=True)
-        
-        logger.info(f"Edge Function поиск вернул {len(formatted_results)} результатов")
-        return formatted_results
+        return await _format_edge_results(results, query, user_intent)
         
     except Exception as e:
         logger.error(f"Ошибка при поиске через Edge Function: {e}")
         # Fallback на старый поиск
         return await _fallback_search_parts(query, user_intent)
 
+async def search_parts_batch(requests: list) -> list:
+    """Ищет несколько позиций (query, user_intent) одним вызовом Edge Function
+
+    Результаты в порядке requests. Позиции, не разрешенные batch-вызовом,
+    и все позиции в режиме локального поиска primary ищутся поштучно через
+    search_parts (не более SEARCH_CONCURRENCY одновременно).
+    """
+    if not _supabase_client:
+        logger.warning("Supabase не инициализирован, возвращаем заглушку")
+        return [[] for _ in requests]
+    
+    from services.fastener_search import fastener_search_batch
+    from services.search_cache import get_search_cache
+    from config import SEARCH_BATCH_SIZE, SEARCH_CONCURRENCY
+    
+    semaphore = asyncio.Semaphore(max(1, SEARCH_CONCURRENCY))
+    
+    async def search(position: int) -> list:
+        async with semaphore:
+            return await search_parts(*requests[position])
+    
+    if local_search_mode() == MODE_PRIMARY:
+        return list(await asyncio.gather(*(search(position) for position in range(len(requests)))))
+    
+    prepared = [await _build_edge_search_request(query, user_intent) for query, user_intent in requests]
+    batch_results = await fastener_search_batch(
+        SUPABASE_URL, SUPABASE_KEY, prepared, search_cache=get_search_cache(), batch_size=SEARCH_BATCH_SIZE
+    )
+    
+    async def resolve(position: int, results) -> list:
+        if results is None:
+            return await search(position)
+        query, user_intent = requests[position]
+        return await _format_edge_results(results, query, user_intent)
+    
+    return list(await asyncio.gather(*(
+        resolve(position, results) for position, results in enumerate(batch_results)
+    )))
+
+async def _build_edge_search_request(query: str, user_intent: dict = None) -> tuple:
+    """Строит search_query (с расширением синонимов) и user_intent для Edge Function"""
+    # Создаем поисковый запрос из user_intent
+    if user_intent and user_intent.get('type'):
+        parts = []
+        item_type = user_intent.get('type', '')
+        parts.append(item_type)
+
+        diameter = (user_intent.get('diameter') or '').strip()
+        length = (user_intent.get('length') or '').strip()
+
+        # Приводим размеры к формату 4.2x90 и добавляем варианты с х/×
+        def clean_mm(value: str) -> str:
+            v = value.lower().replace('мм', '').replace(' ', '')
+            return v
+
+        if diameter and length:
+            d = clean_mm(diameter)
+            l = clean_mm(length)
+            size_tokens = [f"{d}x{l}", f"{d}х{l}", f"{d}×{l}"]
+            parts.extend(size_tokens)
+        else:
+            if diameter:
+                parts.append(diameter)
+            if length:
+                parts.append(length)
+
+        if user_intent.get('coating'):
+            parts.append(user_intent['coating'])
+        if user_intent.get('standard'):
+            parts.append(user_intent['standard'])
+
+        # Если исходный текст содержит ГКЛ — добавим синонимы для повышения совпадений
+        ql = (query or '').lower()
+        if 'гкл' in ql or 'гипсокарт' in ql:
+            parts.extend(['гкл', 'гипсокартон'])
+
+        search_query = ' '.join([p for p in parts if p])
+    else:
+        # Fallback на исходный запрос
+        search_query = query
+
+    # Расширяем токены по справочнику синонимов
+    try:
+        from services.alias_service import AliasService
+        alias_service = AliasService()
+        base_tokens = [t for t in search_query.split() if t]
+        expanded_tokens = await alias_service.expand_tokens(base_tokens, original_text=query)
+        # Собираем строку, избегая повторов
+        if expanded_tokens:
+            search_query = ' '.join(expanded_tokens)
+    except Exception as e:
+        logger.warning(f"Не удалось расширить синонимы: {e}")
+
+    # Логируем финальный поисковый запрос (после расширения)
+    logger.info(f"Умный поиск через Edge Function по запросу: {search_query}")
+    
+    # Сохраняем оригинальный user_intent для лучшего поиска
+    simplified_user_intent = user_intent.copy() if user_intent else {}
+
+    return search_query, simplified_user_intent
+
+async def _format_edge_results(results: list, query: str, user_intent: dict = None) -> list:
+    """Конвертирует ответ Edge Function в формат для Excel"""
+    formatted_results = []
+    for result in results:
+        # Рассчитываем упаковку если указано количество
+        if user_intent and user_intent.get('quantity'):
+            # Извлекаем числовое значение из строки количества
+            qty_str = str(user_intent['quantity'])
+            qty_number = int(''.join(filter(str.isdigit, qty_str)))
+            
+            packaging = await _calculate_packaging_for_result(
+                qty_number, 
+                result.get('pack_size', 1)
+            )
+        else:
+            packaging = {
+                'packages_needed': 0,
+                'total_quantity': 0,
+                'excess_quantity': 0
+            }
+        
+        # Форматируем результат
+        formatted_result = {
+            'sku': result.get('sku', ''),
+            'name': result.get('name', ''),
+            'type': _extract_type_from_name(result.get('name', '')),
+            'pack_size': result.get('pack_size', 1),
+            'unit': result.get('unit', 'шт'),
+            'relevance_score': result.get('relevance_score', 0),
+            'match_reason': result.get('match_reason', ''),
+            'packages_needed': packaging['packages_needed'],
+            'total_quantity': packaging['total_quantity'],
+            'excess_quantity': packaging['excess_quantity'],
+            'confidence_score': int(result.get('relevance_score', 0) * 100),
+            'probability_percent': result.get('probability_percent', 1.0),  # Добавляем probability_percent из Edge Function
+            'user_intent': user_intent,  # Добавляем user_intent для Excel
+            'search_query': result.get('search_query', query),  # Добавляем search_query
+            'full_query': result.get('full_query', query),  # Добавляем full_query
+            # Поля, посчитанные при загрузке каталога (ingest_catalog.py)
+            'standard': result.get('standard', ''),
+            'strength_class': result.get('strength_class', ''),
+            'coating': result.get('coating', '')
+        }
+        
+        formatted_results.append(formatted_result)
+    
+    # Сортируем по релевантности
+    formatted_results.sort(key=lambda x: x['relevance_score'], reverse=True)
+    
+    logger.info(f"Edge Function поиск вернул {len(formatted_results)} результатов")
+    return formatted_results
+
 async def _calculate_packaging_for_result(requested_qty: int, pack_size: float) -> dict:
     """Рассчитывает упаковку для одного результата"""
     try:
@@ -247,6 +316,13 @@ async def _calculate_packaging_for_result(requested_qty: int, pack_size: float)
 
 async def _fallback_search_parts(query: str, user_intent: dict = None) -> list:
     """Fallback поиск если умные функции не работают"""
+    if local_search_mode() == MODE_FALLBACK:
+        search_query, simplified_user_intent = await _build_edge_search_request(query, user_intent)
+        results = await local_search(search_query, simplified_user_intent)
+        if results is not None:
+            logger.info("Edge Function недоступна, используем локальный поиск")
+            return await _format_edge_results(results, query, user_intent)
+    
     try:
         logger.info("Используем fallback поиск...")
         
@@ -322,6 +398,67 @@ async def get_aliases() -> list:
         logger.error(f"Ошибка при получении алиасов: {e}")
         return []
 
+def fetch_catalog_version(client: Client) -> tuple:
+    """Дешевая версия каталога: число строк и max(updated_at) parts_catalog, число алиасов"""
+    try:
+        items_response = client.table(DB_TABLES['parts_catalog'])\
+            .select('updated_at', count='exact')\
+            .order('updated_at', desc=True)\
+            .limit(1)\
+            .execute()
+        max_updated_at = items_response.data[0].get('updated_at') if items_response.data else None
+    except Exception as e:
+        # В parts_catalog может не быть updated_at: используем только число строк
+        logger.debug(f"Проверка updated_at не удалась, используем число строк: {e}")
+        items_response = client.table(DB_TABLES['parts_catalog'])\
+            .select('sku', count='exact')\
+            .limit(1)\
+            .execute()
+        max_updated_at = None
+    
+    aliases_response = client.table(DB_TABLES['aliases'])\
+        .select('alias', count='exact')\
+        .limit(1)\
+        .execute()
+    
+    return (items_response.count, max_updated_at, aliases_response.count)
+
+# Последняя проверенная версия каталога: (time.monotonic() проверки, версия)
+_catalog_version: Optional[tuple] = None
+_catalog_version_lock: Optional[asyncio.Lock] = None
+
+async def get_catalog_version(max_age: Optional[float] = None) -> Optional[tuple]:
+    """Версия каталога (fetch_catalog_version), проверенная не раньше max_age секунд назад
+
+    Общая для кэша каталога, кэша результатов поиска и локального поиска:
+    по умолчанию max_age = CATALOG_CACHE_TTL. Запрос к Supabase выполняется
+    в отдельном потоке, одновременные вызовы ждут один запрос.
+    """
+    global _catalog_version, _catalog_version_lock
+    if max_age is None:
+        max_age = CATALOG_CACHE_TTL
+
+    def cached() -> Optional[tuple]:
+        if _catalog_version is not None and time.monotonic() - _catalog_version[0] < max_age:
+            return _catalog_version
+        return None
+
+    if cached():
+        return _catalog_version[1]
+
+    if _catalog_version_lock is None:
+        _catalog_version_lock = asyncio.Lock()
+    async with _catalog_version_lock:
+        if cached():
+            return _catalog_version[1]
+        if not _supabase_client:
+            await init_supabase()
+        if not _supabase_client:
+            return None
+        version = await asyncio.to_thread(fetch_catalog_version, _supabase_client)
+        _catalog_version = (time.monotonic(), version)
+        return version
+
 async def create_tables():
     """Создает необходимые таблицы в БД (для разработки)"""
     try:
@@ -352,6 +489,13 @@ async def create_tables():
                     type VARCHAR(200),
                     pack_size INTEGER,
                     unit VARCHAR(20),
+                    diameter VARCHAR(20),
+                    length VARCHAR(20),
+                    size_keys TEXT[],
+                    standard VARCHAR(50),
+                    strength_class VARCHAR(20),
+                    coating VARCHAR(50),
+                    name_normalized TEXT,
                     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
                 );
             ''',
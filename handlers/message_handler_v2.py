@@ -97,7 +97,7 @@ class MessageHandlerV2:
             log_processing_pipeline("STARTING_GPT_ANALYSIS", {"input_text": text[:200]}, user_id, chat_id)
             
             # Use GPT Assistant for analysis
-            gpt_result = await self.openai_service.analyze_with_assistant(text)
+            gpt_result = await self.openai_service.analyze_with_assistant(text, chat_id=chat_id)
             
             log_processing_pipeline("GPT_ANALYSIS_COMPLETED", {"gpt_result": gpt_result}, user_id, chat_id)
             
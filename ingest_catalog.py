@@ -0,0 +1,56 @@
+"""
+Загрузка каталога в Supabase с предрасчетом полей поиска
+
+Читает Source/normalized_skus.jsonl, один раз разбирает названия SKU
+(диаметр, длина, ключи размеров, стандарт, класс прочности, покрытие,
+нормализованное название), загружает строки в parts_catalog и пишет
+колоночный снимок каталога для быстрого старта локального поиска.
+
+    python ingest_catalog.py                     # загрузка + снимок
+    python ingest_catalog.py --no-upload         # только снимок
+    python ingest_catalog.py --snapshot ''       # только загрузка
+"""
+
+import argparse
+import asyncio
+import logging
+
+from config import DB_TABLES, SOURCE_FILES, CATALOG_SNAPSHOT_PATH
+from database import supabase_client
+from services.catalog_ingest import prepare_catalog, upload_catalog, write_snapshot
+from services.local_search import load_catalog_jsonl
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def ingest_catalog(source: str, snapshot: str, upload: bool = True):
+    """Разбирает каталог, загружает его в parts_catalog и пишет снимок"""
+    rows = prepare_catalog(load_catalog_jsonl(source))
+    logger.info(f"Подготовлено {len(rows)} позиций из {source}")
+    
+    version = None
+    if upload:
+        await supabase_client.init_supabase()
+        client = supabase_client._supabase_client
+        if not client:
+            logger.error("Supabase client not initialized")
+            return
+        upload_catalog(client, rows, table=DB_TABLES['parts_catalog'])
+        version = list(supabase_client.fetch_catalog_version(client))
+    
+    if snapshot:
+        write_snapshot(rows, snapshot, version=version)
+
+def main():
+    parser = argparse.ArgumentParser(description="Загрузка каталога в parts_catalog с предрасчетом полей")
+    parser.add_argument('--source', default=SOURCE_FILES.get('normalized_skus', 'Source/normalized_skus.jsonl'),
+                        help="исходный normalized_skus.jsonl")
+    parser.add_argument('--snapshot', default=CATALOG_SNAPSHOT_PATH,
+                        help="путь снимка каталога (пустая строка - не писать)")
+    parser.add_argument('--no-upload', action='store_true', help="не загружать в Supabase")
+    args = parser.parse_args()
+    
+    asyncio.run(ingest_catalog(args.source, args.snapshot, upload=not args.no_upload))
+
+if __name__ == "__main__":
+    main()
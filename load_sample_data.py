@@ -1,10 +1,15 @@
 """
 Скрипт для загрузки тестовых данных в Supabase
+
+Позиции пишутся в items (пайплайн v2) и в parts_catalog (fastener-search)
+с полями поиска, вычисленными так же, как в ingest_catalog.py.
 """
 
 import asyncio
 import logging
+from config import DB_TABLES
 from database.supabase_client_v2 import get_supabase_client
+from services.catalog_ingest import prepare_catalog, upload_catalog
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -102,6 +107,16 @@ async def load_sample_data():
             except Exception as e:
                 logger.warning(f"Alias {alias['alias']} might already exist: {e}")
         
+        # Те же позиции в parts_catalog, с диаметром, длиной, ключами размеров и т.д.
+        catalog_rows = prepare_catalog(
+            {'sku': item['ku'], 'name': item['name'], 'pack_size': item['pack_qty'], 'unit': 'шт'}
+            for item in items_data
+        )
+        try:
+            upload_catalog(client.client, catalog_rows, table=DB_TABLES['parts_catalog'])
+        except Exception as e:
+            logger.warning(f"Could not upsert sample items into parts_catalog: {e}")
+        
         logger.info("✅ Sample data loaded successfully!")
         
     except Exception as e:
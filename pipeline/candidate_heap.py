@@ -0,0 +1,89 @@
+"""
+Bounded top-k candidate selection, one candidate per KU
+"""
+
+import heapq
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class CandidateHeap:
+    """Keeps the k best-scoring candidates with distinct KUs
+
+    Candidates rank by score, then by `order` (lower first; by default the
+    offer sequence). The result is the same as sorting every offered
+    candidate that way, keeping the first candidate of each KU and then the
+    first k, whatever order the offers arrive in. Candidates are built by a
+    factory only when they enter the heap, and callers can ask whether a
+    score bound could still enter before scoring an item at all. k=0 keeps
+    all.
+    """
+
+    def __init__(self, k: int = 0):
+        self.k = k
+        # Min-heap of (score, -order, ku); entries replaced in _best are skipped lazily
+        self._heap: List[Tuple[float, int, str]] = []
+        self._best: Dict[str, Tuple[float, int, object]] = {}
+        self._seq = 0
+        self.offered = 0
+        self.created = 0
+        self.pruned = 0
+
+    def __len__(self) -> int:
+        return len(self._best)
+
+    def _is_current(self, entry: Tuple[float, int, str]) -> bool:
+        best = self._best.get(entry[2])
+        return best is not None and best[0] == entry[0] and best[1] == -entry[1]
+
+    def _worst(self) -> Tuple[float, int, str]:
+        while not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0]
+
+    @property
+    def full(self) -> bool:
+        return bool(self.k) and len(self._best) >= self.k
+
+    @property
+    def floor(self) -> Optional[float]:
+        """Lowest kept score once the heap is full (None while there is room)"""
+        return self._worst()[0] if self.full else None
+
+    def can_enter(self, score_bound: float, order: Optional[int] = None, count: int = 1) -> bool:
+        """False if a candidate scoring at most score_bound cannot enter; counts `count` pruned items
+
+        Without `order` the candidate is assumed to come after everything offered so far.
+        """
+        if not self.full:
+            return True
+        worst_score, worst_order, _ = self._worst()
+        if score_bound > worst_score or (score_bound == worst_score and order is not None and -order > worst_order):
+            return True
+        self.pruned += count
+        return False
+
+    def offer(self, ku: str, score: float, make: Callable[[], object], order: Optional[int] = None) -> bool:
+        """Add a candidate built by make() if it ranks among the best k; True if added"""
+        self.offered += 1
+        if order is None:
+            order = self._seq
+        self._seq += 1
+
+        best = self._best.get(ku)
+        if best is not None and (best[0], -best[1]) >= (score, -order):
+            return False
+        if best is None and not self.can_enter(score, order):
+            return False
+
+        self.created += 1
+        self._best[ku] = (score, order, make())
+        heapq.heappush(self._heap, (score, -order, ku))
+        if self.k and len(self._best) > self.k:
+            del self._best[self._worst()[2]]
+            heapq.heappop(self._heap)
+        return True
+
+    def candidates(self) -> List:
+        """Kept candidates, best first"""
+        ranked = sorted(self._best.values(), key=lambda best: (-best[0], best[1]))
+        return [candidate for _, _, candidate in ranked]
@@ -0,0 +1,139 @@
+"""
+In-process catalog cache with TTL and change-detection refresh
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pipeline.catalog_index import CatalogIndex
+from shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CatalogSnapshot:
+    """Catalog view shared by all requests"""
+    items: List[Dict]
+    aliases: List[Dict]
+    index: CatalogIndex
+    version: Optional[Any]
+    loaded_at: float  # time.monotonic() of the last successful check
+
+
+class CatalogCache:
+    """Shared catalog cache (items + aliases + derived indexes)
+
+    The first call loads the catalog synchronously. After `ttl` seconds the
+    current snapshot is still served while a background task runs a cheap
+    version check and reloads the catalog only if it changed. Loaders are
+    expected to keep blocking I/O off the event loop, and the index is built
+    in a worker thread; the new snapshot replaces the old one with a single
+    assignment on the loop, so readers never see a half-built catalog.
+    """
+
+    def __init__(self,
+                 load_items: Callable[[], Awaitable[List[Dict]]],
+                 load_aliases: Callable[[], Awaitable[List[Dict]]],
+                 check_version: Callable[[], Awaitable[Optional[Any]]],
+                 ttl: float = 300,
+                 type_patterns: Optional[Dict[str, List[str]]] = None,
+                 metrics_prefix: str = 'catalog_cache'):
+        self._load_items = load_items
+        self._load_aliases = load_aliases
+        self._check_version = check_version
+        self.ttl = ttl
+        self.type_patterns = type_patterns
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+        metrics = get_metrics()
+        self._refresh_duration = metrics.histogram(f'{metrics_prefix}.refresh_duration_ms')
+        self._reloads = metrics.counter(f'{metrics_prefix}.reloads')
+        self._unchanged = metrics.counter(f'{metrics_prefix}.unchanged_checks')
+        self._errors = metrics.counter(f'{metrics_prefix}.refresh_errors')
+        metrics.gauge(f'{metrics_prefix}.age_seconds', self.age)
+        metrics.gauge(f'{metrics_prefix}.items', lambda: len(self._snapshot.items) if self._snapshot else 0)
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+
+    def age(self) -> Optional[float]:
+        """Seconds since the catalog was last loaded or confirmed unchanged"""
+        if self._snapshot is None:
+            return None
+        return round(time.monotonic() - self._snapshot.loaded_at, 3)
+
+    def is_stale(self) -> bool:
+        return self._snapshot is None or time.monotonic() - self._snapshot.loaded_at >= self.ttl
+
+    async def get(self) -> Optional[CatalogSnapshot]:
+        """Return the current snapshot, loading or scheduling a refresh if needed"""
+        if self._snapshot is None:
+            await self.refresh()
+        elif self.is_stale() and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self.refresh())
+        return self._snapshot
+
+    async def refresh(self, force: bool = False) -> Optional[CatalogSnapshot]:
+        """Reload the catalog if its version changed (or unconditionally if forced)"""
+        async with self._lock:
+            # Another task may have refreshed while we waited for the lock
+            if not force and self._snapshot is not None and not self.is_stale():
+                return self._snapshot
+
+            start = time.perf_counter()
+            try:
+                try:
+                    version = await self._check_version()
+                except Exception as e:
+                    # Without a version we can only reload unconditionally
+                    logger.warning(f"Catalog version check failed: {e}")
+                    version = None
+
+                current = self._snapshot
+                if not force and current is not None and version is not None and version == current.version:
+                    current.loaded_at = time.monotonic()
+                    self._unchanged.inc()
+                    logger.debug(f"Catalog unchanged (version {version})")
+                    return current
+
+                items, aliases = await asyncio.gather(self._load_items(), self._load_aliases())
+                if not items:
+                    logger.warning("Catalog reload returned no items, keeping previous snapshot")
+                    if current is not None:
+                        current.loaded_at = time.monotonic()
+                    return current
+
+                # Building the index (postings, trigram vocabulary) is CPU-bound
+                index = await asyncio.to_thread(CatalogIndex, items, self.type_patterns, aliases)
+                self._snapshot = CatalogSnapshot(
+                    items=items,
+                    aliases=aliases,
+                    index=index,
+                    version=version,
+                    loaded_at=time.monotonic(),
+                )
+                self._reloads.inc()
+                logger.info(f"Catalog cache refreshed: {len(items)} items, {len(aliases)} aliases, version {version}")
+                return self._snapshot
+
+            except Exception as e:
+                self._errors.inc()
+                logger.error(f"Catalog cache refresh failed: {e}")
+                if self._snapshot is None:
+                    raise
+                return self._snapshot
+
+            finally:
+                self._refresh_duration.observe((time.perf_counter() - start) * 1000)
+
+    def invalidate(self) -> None:
+        """Force a version check on the next get()"""
+        if self._snapshot is not None:
+            self._snapshot.loaded_at = time.monotonic() - self.ttl
@@ -0,0 +1,261 @@
+"""
+Prebuilt catalog index for fast candidate shortlisting
+"""
+
+import logging
+from typing import Iterable, List, Dict, Optional, Set, FrozenSet, Tuple
+
+from pipeline.trigram_index import TrigramIndex, is_word
+from shared.size_key import item_size_keys, size_key
+
+logger = logging.getLogger(__name__)
+
+# Specs compared by equality in MatchingEngine._calculate_specs_similarity
+EXACT_SPEC_KEYS = ('diameter', 'length')
+
+# Specs compared by substring in MatchingEngine._calculate_specs_similarity
+CONTAINS_SPEC_KEYS = ('material', 'coating', 'standard')
+
+SPEC_KEYS = EXACT_SPEC_KEYS + CONTAINS_SPEC_KEYS
+
+# Canonical diameter x length key (shared.size_key), matched instead of separate diameter/length
+SIZE_KEY = 'size'
+
+
+def tokenize(text: str) -> FrozenSet[str]:
+    """Split text into lowercase word tokens (same rules as text similarity)"""
+    return frozenset((text or '').lower().split())
+
+
+class AttributeIndex:
+    """Multi-key attribute index: attribute -> value -> set of item ids
+
+    Diameter and length are looked up by exact value and, together, by the
+    canonical size key parsed from item names at load time; material/coating/
+    standard by substring over the (small) set of distinct values, type by the
+    same patterns as MatchingEngine.type_patterns. Every lookup is counted as
+    a hit or a miss.
+    """
+
+    def __init__(self, type_patterns: Optional[Dict[str, List[str]]] = None):
+        self.type_patterns = type_patterns or {}
+        self.values: Dict[str, Dict] = {key: {} for key in SPEC_KEYS}
+        self.types: Dict[str, Set[int]] = {type_name: set() for type_name in self.type_patterns}
+        self.size_keys: Dict[str, Set[int]] = {}
+        self.hits: Dict[str, int] = {key: 0 for key in SPEC_KEYS + (SIZE_KEY, 'type', 'diameter_length')}
+        self.misses: Dict[str, int] = dict(self.hits)
+        self._contains_cache: Dict[tuple, Set[int]] = {}
+
+    def add(self, item_id: int, name: str, specs: Dict, size_keys: Iterable[str] = ()):
+        """Add one item to the index"""
+        for key in size_keys:
+            self.size_keys.setdefault(key, set()).add(item_id)
+
+        for key in EXACT_SPEC_KEYS:
+            if key in specs:
+                value = specs[key]
+                if key == 'diameter':
+                    value = (value or '').lower()
+                try:
+                    self.values[key].setdefault(value, set()).add(item_id)
+                except TypeError:
+                    logger.debug(f"Unhashable {key} spec for item {item_id}: {value!r}")
+
+        for key in CONTAINS_SPEC_KEYS:
+            if key in specs:
+                value = (specs.get(key, '') or '').lower()
+                self.values[key].setdefault(value, set()).add(item_id)
+
+        name_lower = (name or '').lower()
+        for type_name, patterns in self.type_patterns.items():
+            if any(pattern in name_lower for pattern in patterns):
+                self.types[type_name].add(item_id)
+
+    def _count(self, key: str, item_ids: Set[int]) -> Set[int]:
+        if item_ids:
+            self.hits[key] += 1
+        else:
+            self.misses[key] += 1
+        return item_ids
+
+    def lookup(self, key: str, value) -> Set[int]:
+        """Return ids of items whose spec `key` matches `value`"""
+        if key in EXACT_SPEC_KEYS:
+            if key == 'diameter':
+                value = (value or '').lower()
+            try:
+                item_ids = self.values[key].get(value, set())
+            except TypeError:
+                item_ids = set()
+            return self._count(key, item_ids)
+
+        needle = (value or '').lower()
+        cache_key = (key, needle)
+        item_ids = self._contains_cache.get(cache_key)
+        if item_ids is None:
+            item_ids = set()
+            for spec_value, value_ids in self.values[key].items():
+                if needle in spec_value:
+                    item_ids |= value_ids
+            self._contains_cache[cache_key] = item_ids
+        return self._count(key, item_ids)
+
+    def match(self, params: Dict) -> Dict[str, Set[int]]:
+        """Look up every spec present in params, plus the size key if both diameter and length are"""
+        spec_hits = {key: self.lookup(key, params[key]) for key in SPEC_KEYS if key in params}
+        key = size_key(params.get('diameter'), params.get('length'))
+        if key is not None:
+            spec_hits[SIZE_KEY] = self._count(SIZE_KEY, self.size_keys.get(key, set()))
+        return spec_hits
+
+    def intersect(self, spec_hits: Dict[str, Set[int]], keys=('diameter', 'length')) -> Optional[Set[int]]:
+        """Intersect posting sets for keys; None if any key was not requested"""
+        if not all(key in spec_hits for key in keys):
+            return None
+        item_ids = set.intersection(*(spec_hits[key] for key in keys))
+        return self._count('_'.join(keys), item_ids)
+
+    def type_ids(self, required_type: str) -> Optional[Set[int]]:
+        """Ids of items of the required type; None if the type is not recognized"""
+        required_type = (required_type or '').lower()
+        for type_name, patterns in self.type_patterns.items():
+            if any(pattern in required_type for pattern in patterns):
+                return self._count('type', self.types[type_name])
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters per attribute"""
+        return {key: {'hits': self.hits[key], 'misses': self.misses[key]} for key in self.hits}
+
+
+class CatalogIndex:
+    """Inverted index over catalog items
+
+    Built once per catalog load. Holds token -> posting list of item ids,
+    per-item lowercase name token sets, an attribute index over specs,
+    alias -> type -> item id maps and a trigram index over name and alias
+    words, so that MatchingEngine only scores items that can pass the
+    similarity threshold and can correct misspelled words.
+    """
+
+    def __init__(self, items: List[Dict], type_patterns: Optional[Dict[str, List[str]]] = None,
+                 aliases: Optional[List[Dict]] = None):
+        self.items = items
+        self.aliases = aliases
+        self.name_tokens: List[FrozenSet[str]] = []
+        self.active: List[bool] = []
+        # lowercase SKU -> item ids, for the exact KU bonus
+        self.sku_ids: Dict[str, List[int]] = {}
+        self.postings: Dict[str, List[int]] = {}
+        self.attributes = AttributeIndex(type_patterns)
+        # lowercase alias -> [(alias, type)], lowercase type -> ids of items whose name contains it
+        self.alias_map: Dict[str, List[Tuple[str, str]]] = {}
+        self.alias_type_items: Dict[str, List[int]] = {}
+        # NumPy-encoded attributes (pipeline.vector_scoring), built on first use
+        self.vector_scorer = None
+        self._build()
+        self._build_aliases()
+        # Trigram index over name and alias words, for typo correction
+        self.vocabulary = TrigramIndex(self._vocabulary_words())
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _build(self):
+        """Build posting lists from items"""
+        for item_id, item in enumerate(self.items):
+            name = item.get('name', '') or ''
+            tokens = tokenize(name)
+
+            self.name_tokens.append(tokens)
+            self.active.append(bool(item.get('is_active', True)))
+            self.sku_ids.setdefault((item.get('sku') or '').lower(), []).append(item_id)
+
+            for token in tokens:
+                self.postings.setdefault(token, []).append(item_id)
+
+            self.attributes.add(item_id, name, item.get('specs_json') or {}, item_size_keys(item))
+
+        logger.info(f"Catalog index built: {len(self.items)} items, {len(self.postings)} tokens")
+
+    def _build_aliases(self):
+        """Build alias -> canonical type and type -> item ids maps"""
+        names = None
+        for alias in self.aliases or []:
+            alias_type = alias.get('type', '')
+            if not alias_type:
+                continue
+
+            alias_text = alias.get('alias', '') or ''
+            self.alias_map.setdefault(alias_text.lower(), []).append((alias_text, alias_type))
+
+            type_key = alias_type.lower()
+            if type_key not in self.alias_type_items:
+                if names is None:
+                    names = [(item.get('name', '') or '').lower() for item in self.items]
+                self.alias_type_items[type_key] = [
+                    item_id for item_id, name in enumerate(names) if type_key in name
+                ]
+
+    def _vocabulary_words(self) -> Iterable[str]:
+        for token in self.postings:
+            if is_word(token):
+                yield token
+        for alias_text in self.alias_map:
+            for token in tokenize(alias_text):
+                if is_word(token):
+                    yield token
+
+    def correct_typos(self, text: str, min_similarity: float = 0.3,
+                      keep: FrozenSet[str] = frozenset()) -> Tuple[str, List[Tuple[str, str]]]:
+        """Replace unknown words of text with the closest vocabulary word by trigrams
+
+        Words in keep are left as they are. Returns the corrected text and the
+        (word, replacement) pairs applied.
+        """
+        words = (text or '').lower().split()
+        corrections = []
+        for i, word in enumerate(words):
+            if not is_word(word) or word in self.vocabulary or word in keep:
+                continue
+            best = self.vocabulary.search(word, k=1, min_similarity=min_similarity)
+            if best:
+                words[i] = best[0][0]
+                corrections.append((word, best[0][0]))
+        return ' '.join(words), corrections
+
+    def resolve_alias(self, text: str) -> List[Tuple[str, str, List[int]]]:
+        """Return (alias, type, item ids) for every alias equal to text"""
+        return [
+            (alias_text, alias_type, self.alias_type_items[alias_type.lower()])
+            for alias_text, alias_type in self.alias_map.get((text or '').lower(), ())
+        ]
+
+    def shortlist(self, query_tokens: FrozenSet[str], spec_hits: Optional[Dict[str, Set[int]]] = None,
+                  required_type: Optional[str] = None) -> List[int]:
+        """Return sorted ids of active candidate items
+
+        If the size key matched, candidates are the items with that size;
+        else if both diameter and length matched, their intersection.
+        Otherwise candidates are items sharing any name token or spec.
+        """
+        spec_hits = spec_hits or {}
+        item_ids = spec_hits.get(SIZE_KEY) or self.attributes.intersect(spec_hits)
+
+        if not item_ids:
+            item_ids = set()
+            for token in query_tokens:
+                item_ids.update(self.postings.get(token, ()))
+            for spec_ids in spec_hits.values():
+                item_ids |= spec_ids
+
+        if required_type:
+            type_ids = self.attributes.type_ids(required_type)
+            if type_ids is not None:
+                item_ids = item_ids & type_ids
+
+        return sorted(item_id for item_id in item_ids if self.active[item_id])
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Attribute index hit/miss counters"""
+        return self.attributes.stats()
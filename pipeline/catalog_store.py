@@ -0,0 +1,155 @@
+"""
+Compact columnar in-memory catalog
+"""
+
+import math
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Spec attributes stored as columns (parts_catalog fields, see services.catalog_ingest)
+SPEC_FIELDS = ('diameter', 'length', 'strength_class', 'coating', 'standard')
+
+# Keys of the item view, same as the dicts built by ProcessingPipeline._load_items
+ITEM_FIELDS = ('sku', 'name', 'pack_qty', 'price', 'unit', 'is_active', 'size_keys', 'specs_json')
+
+# Marks a spec that the source item did not have at all (distinct from None)
+_MISSING = object()
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class CatalogItem(Mapping):
+    """Read-only dict-like view of one catalog row
+
+    Supports item['sku'], item.get('specs_json') and so on, so MatchingEngine
+    and CatalogIndex work with it exactly as with the plain item dicts.
+    """
+
+    __slots__ = ('_store', '_id')
+
+    def __init__(self, store: 'CatalogStore', item_id: int):
+        self._store = store
+        self._id = item_id
+
+    def __getitem__(self, key: str) -> Any:
+        getter = self._store._getters.get(key)
+        if getter is None:
+            raise KeyError(key)
+        return getter(self._id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(ITEM_FIELDS)
+
+    def __len__(self) -> int:
+        return len(ITEM_FIELDS)
+
+    def __repr__(self) -> str:
+        return f"CatalogItem({dict(self)!r})"
+
+
+class CatalogStore(Sequence):
+    """Catalog held as parallel arrays, one entry per item id
+
+    Names and SKUs are plain string lists; unit and spec values are interned,
+    so repeated values ("шт", "M10", "DIN 933") share one string object;
+    pack_qty and price are float arrays (NaN for missing); is_active is a
+    bytearray and size keys are shared tuples. Indexing returns a
+    CatalogItem view, iterating yields views in item id order.
+    """
+
+    def __init__(self, items: Iterable[Dict] = ()):
+        self.skus: List[str] = []
+        self.names: List[str] = []
+        self.units: List[Optional[str]] = []
+        self.pack_qty = array('d')
+        self.price = array('d')
+        self.active = bytearray()
+        self.size_keys: List[Optional[Tuple[str, ...]]] = []
+        self.specs: Dict[str, List[Any]] = {key: [] for key in SPEC_FIELDS}
+        # Specs outside SPEC_FIELDS are rare; kept per item id only when present
+        self.extra_specs: Dict[int, Dict] = {}
+        self._size_key_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self._getters: Dict[str, Callable[[int], Any]] = {
+            'sku': self.skus.__getitem__,
+            'name': self.names.__getitem__,
+            'pack_qty': self._pack_qty,
+            'price': self._price,
+            'unit': self.units.__getitem__,
+            'is_active': self._is_active,
+            'size_keys': self.size_keys.__getitem__,
+            'specs_json': self._specs_json,
+        }
+        for item in items:
+            self.append(item)
+
+    def append(self, item: Dict) -> int:
+        """Add an item dict (the _load_items format) and return its id"""
+        item_id = len(self.skus)
+        self.skus.append(item.get('sku', ''))
+        self.names.append(item.get('name', '') or '')
+        self.units.append(_intern(item.get('unit')))
+        self.pack_qty.append(_to_float(item.get('pack_qty')))
+        self.price.append(_to_float(item.get('price')))
+        self.active.append(1 if item.get('is_active', True) else 0)
+
+        keys = item.get('size_keys')
+        if keys is not None:
+            keys = tuple(_intern(key) for key in keys)
+            keys = self._size_key_tuples.setdefault(keys, keys)
+        self.size_keys.append(keys)
+
+        specs = item.get('specs_json') or {}
+        for key, column in self.specs.items():
+            column.append(_intern(specs[key]) if key in specs else _MISSING)
+        extra = {key: value for key, value in specs.items() if key not in self.specs}
+        if extra:
+            self.extra_specs[item_id] = extra
+        return item_id
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+    def __getitem__(self, item_id):
+        if isinstance(item_id, slice):
+            return [CatalogItem(self, i) for i in range(*item_id.indices(len(self)))]
+        if item_id < 0:
+            item_id += len(self)
+        if not 0 <= item_id < len(self):
+            raise IndexError('catalog item id out of range')
+        return CatalogItem(self, item_id)
+
+    def __iter__(self) -> Iterator[CatalogItem]:
+        return (CatalogItem(self, item_id) for item_id in range(len(self)))
+
+    def _pack_qty(self, item_id: int) -> Optional[float]:
+        value = self.pack_qty[item_id]
+        if math.isnan(value):
+            return None
+        return int(value) if value.is_integer() else value
+
+    def _price(self, item_id: int) -> Optional[float]:
+        value = self.price[item_id]
+        return None if math.isnan(value) else value
+
+    def _is_active(self, item_id: int) -> bool:
+        return bool(self.active[item_id])
+
+    def _specs_json(self, item_id: int) -> Dict:
+        specs = {
+            key: column[item_id] for key, column in self.specs.items()
+            if column[item_id] is not _MISSING
+        }
+        if item_id in self.extra_specs:
+            specs.update(self.extra_specs[item_id])
+        return specs
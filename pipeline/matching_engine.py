@@ -6,12 +6,20 @@ Based on the comprehensive specification
 import logging
 import re
 from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
-from pipeline.text_parser import ParsedLine
-from database.supabase_client import search_parts
+from dataclasses import dataclass, replace
+from pipeline.text_parser import ParsedLine, get_text_parser
+from pipeline.candidate_heap import CandidateHeap
+from pipeline.catalog_index import CatalogIndex, SPEC_KEYS, SIZE_KEY, tokenize
+from pipeline.vector_scoring import score_shortlist, vector_scoring_available
+from shared.size_key import size_key
+from database.supabase_client import search_parts, search_parts_batch
+from config import MATCH_TOP_K, VECTOR_SCORING_MIN_SHORTLIST, TYPO_MIN_SIMILARITY, TYPO_MAX_CANDIDATES
 
 logger = logging.getLogger(__name__)
 
+# Tie-break order ranges: alias and fuzzy matches of the line, then of its typo-corrected text
+ORDER_STRIDE = 1 << 32
+
 @dataclass
 class MatchCandidate:
     """Match candidate data structure"""
@@ -51,144 +59,268 @@ class MatchingEngine:
             'дюбель': ['дюбель', 'dowel'],
             'шуруп': ['шуруп', 'wood screw'],
         }
+
+        # Catalog index, reused while the same items list is passed in
+        self._catalog_index: Optional[CatalogIndex] = None
+
+        # Candidates kept per line (0 - all) and the shortlist size from which
+        # fuzzy matches are scored with NumPy instead of item by item
+        self.top_k = MATCH_TOP_K
+        self.vector_min_shortlist = VECTOR_SCORING_MIN_SHORTLIST
+        # Minimum trigram similarity for correcting misspelled words (0 - off), tried only
+        # for lines with fewer local candidates than typo_max_candidates (0 - only with none)
+        self.typo_min_similarity = TYPO_MIN_SIMILARITY
+        self.typo_max_candidates = TYPO_MAX_CANDIDATES
+        # Standard forms written by the normalizer are not typos even if the catalog spells them otherwise
+        self.normalized_words = get_text_parser().normalizer.standard_words
+    
+    def get_catalog_index(self, items: List[Dict], aliases: Optional[List[Dict]] = None) -> CatalogIndex:
+        """Get catalog index for items, building it only when the catalog changes"""
+        index = self._catalog_index
+        if index is None or index.items is not items or index.aliases is not aliases:
+            self._catalog_index = CatalogIndex(items, self.type_patterns, aliases)
+        return self._catalog_index
     
     async def find_candidates(self, parsed_line: ParsedLine, items: List[Dict], 
-                            aliases: List[Dict]) -> List[MatchCandidate]:
+                            aliases: List[Dict],
+                            catalog_index: Optional[CatalogIndex] = None) -> List[MatchCandidate]:
         """Find candidates for a parsed line"""
-        candidates = []
-        
-        # 1. Exact alias match
-        alias_candidates = await self._find_alias_matches(parsed_line, aliases, items)
-        candidates.extend(alias_candidates)
-        
-        # 2. Fuzzy name/specs match
-        fuzzy_candidates = await self._find_fuzzy_matches(parsed_line, items)
-        candidates.extend(fuzzy_candidates)
+        candidates = await self.find_local_candidates(parsed_line, items, aliases, catalog_index)
+        if candidates:
+            return candidates
 
         # Fallback to Supabase search if no local candidates
-        if not candidates:
-            logger.info("No local candidates found, performing Supabase search")
-            try:
-                supabase_results = await search_parts(parsed_line.raw_text, parsed_line.extracted_params or {})
-                for res in supabase_results:
-                    candidates.append(
-                        MatchCandidate(
-                            ku=res.get('sku', ''),
-                            name=res.get('name', ''),
-                            pack_qty=res.get('pack_size'),
-                            price=res.get('price'),
-                            unit=res.get('unit'),
-                            score=(res.get('probability_percent', 0) or 0) / 100,
-                            explanation=res.get('match_reason', 'Supabase search'),
-                            source='vector',
-                        )
-                    )
-            except Exception as e:
-                logger.error(f"Supabase search failed: {e}")
+        logger.info("No local candidates found, performing Supabase search")
+        try:
+            supabase_results = await search_parts(parsed_line.raw_text, parsed_line.extracted_params or {})
+            candidates = self.candidates_from_search_results(supabase_results)
+        except Exception as e:
+            logger.error(f"Supabase search failed: {e}")
 
-        # 3. Apply type filter
-        candidates = self._apply_type_filter(parsed_line, candidates)
-        
-        # 4. Calculate scores
-        for candidate in candidates:
-            candidate.score = self._calculate_score(parsed_line, candidate)
-        
-        # 5. Sort by score
-        candidates.sort(key=lambda x: x.score, reverse=True)
-        
-        # 6. Remove duplicates (same KU)
-        unique_candidates = []
-        seen_kus = set()
-        for candidate in candidates:
-            if candidate.ku not in seen_kus:
-                unique_candidates.append(candidate)
-                seen_kus.add(candidate.ku)
-        
-        return unique_candidates
+        return self.finalize_candidates(parsed_line, candidates)
     
-    async def _find_alias_matches(self, parsed_line: ParsedLine, aliases: List[Dict], 
-                                items: List[Dict]) -> List[MatchCandidate]:
-        """Find exact alias matches"""
-        candidates = []
-        
-        # Create items lookup
-        items_lookup = {item['sku']: item for item in items}
-        
-        for alias in aliases:
-            if (alias.get('alias', '') or '').lower() == parsed_line.normalized_text.lower():
-                # Извлекаем тип из alias для поиска подходящих товаров
-                alias_type = alias.get('type', '')
-                if alias_type:
-                    # Ищем товары по типу
-                    for item in items:
-                        item_name = (item.get('name', '') or '').lower()
-                        if alias_type.lower() in item_name:
-                            candidate = MatchCandidate(
-                                ku=item['sku'],
-                                name=item['name'],
-                                pack_qty=item.get('pack_qty'),
-                                price=item.get('price'),
-                                unit=item.get('unit'),
-                                score=0.6,  # Высокий балл за точное совпадение алиаса
-                                explanation=f"Exact alias match: {alias['alias']} -> {alias_type}",
-                                source='rules'
-                            )
-                            candidates.append(candidate)
-                            logger.debug(f"Found alias match: {alias['alias']} -> {alias_type} -> {item['sku']}")
-        
-        return candidates
+    async def find_local_candidates(self, parsed_line: ParsedLine, items: List[Dict],
+                                    aliases: List[Dict],
+                                    catalog_index: Optional[CatalogIndex] = None) -> List[MatchCandidate]:
+        """Find the best local candidates (aliases, then fuzzy name/specs), scored and ranked
+        
+        Keeps at most top_k candidates with distinct KUs in a bounded heap;
+        items whose score upper bound cannot beat the current k-th best are
+        skipped before they are scored or turned into candidates.
+        """
+        if catalog_index is None:
+            catalog_index = self.get_catalog_index(items, aliases)
+        heap = CandidateHeap(self.top_k)
+        
+        # 1-2. Exact alias and fuzzy name/specs matches
+        self._rank_matches(parsed_line, parsed_line, catalog_index, heap, order_base=0)
+        
+        # 3. Same again with misspelled words corrected, so typos don't fall through to remote search
+        if self.typo_min_similarity > 0 and len(heap) < max(self.typo_max_candidates, 1):
+            corrected_text, corrections = catalog_index.correct_typos(
+                parsed_line.normalized_text, self.typo_min_similarity, keep=self.normalized_words
+            )
+            if corrections:
+                note = ', '.join(f"{word} -> {replacement}" for word, replacement in corrections)
+                corrected_line = replace(parsed_line, normalized_text=corrected_text)
+                self._rank_matches(parsed_line, corrected_line, catalog_index, heap,
+                                   order_base=2 * ORDER_STRIDE, note=f" (typo: {note})")
+        
+        logger.debug(f"Local candidates: {heap.offered} offered, {heap.pruned} pruned, "
+                     f"{heap.created} built, {len(heap)} kept")
+        return heap.candidates()
     
-    async def _find_fuzzy_matches(self, parsed_line: ParsedLine, items: List[Dict]) -> List[MatchCandidate]:
-        """Find fuzzy matches by name and specs"""
-        candidates = []
-        
-        for item in items:
-            if not item.get('is_active', True):
-                continue
-            
-            # Calculate similarity score
-            similarity = self._calculate_similarity(parsed_line, item)
-            
-            if similarity > 0.1:  # Minimum threshold
-                candidate = MatchCandidate(
-                    ku=item['sku'],
-                    name=item['name'],
-                    pack_qty=item.get('pack_qty'),
-                    price=item.get('price'),
-                    unit=item.get('unit'),
-                    score=similarity,
-                    explanation=f"Fuzzy match: {similarity:.2f} similarity",
-                    source='rules'
+    def _rank_matches(self, parsed_line: ParsedLine, match_line: ParsedLine,
+                      catalog_index: CatalogIndex, heap: CandidateHeap, order_base: int, note: str = ''):
+        """Offer alias and fuzzy matches of match_line to the heap, scored against parsed_line
+        
+        Ties rank alias matches first, in alias order, then fuzzy matches by
+        item id, so the result does not depend on the order items are scored in.
+        """
+        required_type = self._required_type(parsed_line)
+        
+        order = order_base
+        for alias_text, alias_type, item_ids in catalog_index.resolve_alias(match_line.normalized_text):
+            explanation = f"Exact alias match: {alias_text} -> {alias_type}{note}"
+            for item_id in item_ids:
+                order += 1
+                item = catalog_index.items[item_id]
+                if required_type and not self._matches_type(item['name'], required_type):
+                    continue
+                score = self._final_score(parsed_line, 0.6, item['sku'], item['name'], alias=True)
+                heap.offer(item['sku'], score, lambda: self._item_candidate(item, score, explanation), order)
+        
+        params = match_line.extracted_params or {}
+        query_tokens = tokenize(match_line.normalized_text)
+        spec_hits = catalog_index.attributes.match(params)
+        item_ids = catalog_index.shortlist(query_tokens, spec_hits, params.get('type'))
+        fuzzy_base = order_base + ORDER_STRIDE
+        
+        if vector_scoring_available() and len(item_ids) >= self.vector_min_shortlist:
+            # KUs already in the heap may take some of the top slots, so ask for that many more
+            scored = score_shortlist(
+                catalog_index, item_ids, query_tokens, params, parsed_line.normalized_text,
+                self.weights, self.type_patterns, threshold=0.1,
+                top_k=heap.k + len(heap) if heap.k else None, required_type=required_type
+            )
+            for item_id, similarity in scored:
+                self._offer_fuzzy(parsed_line, catalog_index.items[item_id], similarity, heap, fuzzy_base + item_id, note)
+            return
+        
+        groups = self._bounded_groups(parsed_line, catalog_index, item_ids, query_tokens, spec_hits, heap)
+        for position, (bound, group) in enumerate(groups):
+            # Groups come best bound first: once one cannot pass the threshold or enter, none can
+            if bound <= 0.1 or not heap.can_enter(bound * 0.7, fuzzy_base + group[0][0],
+                                                  count=sum(len(rest) for _, rest in groups[position:])):
+                break
+            # Items of a group share the bound and come in id order, so the first one that
+            # cannot enter ends the group; the check only changes when the heap does
+            check = heap.full and heap.floor >= bound * 0.7
+            for offset, (item_id, specs_similarity) in enumerate(group):
+                if check and not heap.can_enter(bound * 0.7, fuzzy_base + item_id, count=len(group) - offset):
+                    break
+                item = catalog_index.items[item_id]
+                if required_type and not self._matches_type(item['name'], required_type):
+                    continue
+                similarity = self._calculate_similarity(
+                    match_line, item,
+                    query_tokens=query_tokens,
+                    name_tokens=catalog_index.name_tokens[item_id],
+                    specs_similarity=specs_similarity
                 )
-                candidates.append(candidate)
-        
-        return candidates
+                if similarity > 0.1 and self._offer_fuzzy(parsed_line, item, similarity, heap, fuzzy_base + item_id, note):
+                    check = heap.full and heap.floor >= bound * 0.7
+    
+    def _bounded_groups(self, parsed_line: ParsedLine, catalog_index: CatalogIndex, item_ids: List[int],
+                        query_tokens: frozenset, spec_hits: Dict[str, set],
+                        heap: CandidateHeap) -> List[Tuple[float, List[Tuple[int, float]]]]:
+        """Shortlisted (item id, specs similarity) grouped by their similarity upper bound, best first
+        
+        The bound depends only on the specs score and the name token count, so
+        items outside every spec hit set are grouped without scoring. Items
+        that get the exact KU bonus form their own group, ahead of the rest.
+        """
+        if not item_ids:
+            return []
+        if not heap.k:
+            return [(1.0, [(item_id, self._calculate_indexed_specs_similarity(item_id, spec_hits))
+                           for item_id in item_ids])]
+        
+        hit_ids = set().union(*spec_hits.values()) if spec_hits else set()
+        sku_ids = set(catalog_index.sku_ids.get(parsed_line.normalized_text.lower(), ()))
+        groups: Dict[Tuple[float, int], List[Tuple[int, float]]] = {}
+        ku_group = []
+        for item_id in item_ids:
+            specs_similarity = self._calculate_indexed_specs_similarity(item_id, spec_hits) if item_id in hit_ids else 0.0
+            if item_id in sku_ids:
+                ku_group.append((item_id, specs_similarity))
+            else:
+                groups.setdefault((specs_similarity, len(catalog_index.name_tokens[item_id])), []).append((item_id, specs_similarity))
+        
+        bounded = [
+            (min(self._token_similarity_bound(query_tokens, size) * 0.4 + specs_similarity * 0.6, 1.0), group)
+            for (specs_similarity, size), group in groups.items()
+        ]
+        bounded.sort(key=lambda entry: (-entry[0], entry[1][0][0]))
+        if ku_group:
+            # The KU bonus alone lifts the bound above any other group
+            bounded.insert(0, ((1.0 + self.weights['ku_match']) / 0.7, ku_group))
+        return bounded
+    
+    def _offer_fuzzy(self, parsed_line: ParsedLine, item: Dict, similarity: float,
+                     heap: CandidateHeap, order: int, note: str = '') -> bool:
+        score = self._final_score(parsed_line, similarity, item['sku'], item['name'])
+        return heap.offer(item['sku'], score, lambda: self._item_candidate(
+            item, score, f"Fuzzy match: {similarity:.2f} similarity{note}"
+        ), order)
+    
+    async def search_fallback_batch(self, parsed_lines: List[ParsedLine]) -> List[List[MatchCandidate]]:
+        """Supabase search for several lines with one Edge Function call, in input order"""
+        logger.info(f"No local candidates for {len(parsed_lines)} lines, performing batched Supabase search")
+        try:
+            batch_results = await search_parts_batch([
+                (parsed_line.raw_text, parsed_line.extracted_params or {}) for parsed_line in parsed_lines
+            ])
+        except Exception as e:
+            logger.error(f"Supabase batch search failed: {e}")
+            return [[] for _ in parsed_lines]
+        return [self.candidates_from_search_results(results) for results in batch_results]
+    
+    def candidates_from_search_results(self, results: List[Dict]) -> List[MatchCandidate]:
+        """Convert Supabase search results into unscored candidates"""
+        return [
+            MatchCandidate(
+                ku=res.get('sku', ''),
+                name=res.get('name', ''),
+                pack_qty=res.get('pack_size'),
+                price=res.get('price'),
+                unit=res.get('unit'),
+                score=(res.get('probability_percent', 0) or 0) / 100,
+                explanation=res.get('match_reason', 'Supabase search'),
+                source='vector',
+            )
+            for res in results
+        ]
     
-    def _calculate_similarity(self, parsed_line: ParsedLine, item: Dict) -> float:
+    def finalize_candidates(self, parsed_line: ParsedLine, candidates: List[MatchCandidate]) -> List[MatchCandidate]:
+        """Type-filter and score candidates, keep the best top_k with distinct KUs, best first"""
+        required_type = self._required_type(parsed_line)
+        heap = CandidateHeap(self.top_k)
+        for candidate in candidates:
+            if required_type and not self._matches_type(candidate.name, required_type):
+                logger.debug(f"Filtered out {candidate.ku} - type mismatch")
+                continue
+            candidate.score = self._calculate_score(parsed_line, candidate)
+            heap.offer(candidate.ku, candidate.score, lambda: candidate)
+        return heap.candidates()
+    
+    def _item_candidate(self, item: Dict, score: float, explanation: str) -> MatchCandidate:
+        return MatchCandidate(
+            ku=item['sku'],
+            name=item['name'],
+            pack_qty=item.get('pack_qty'),
+            price=item.get('price'),
+            unit=item.get('unit'),
+            score=score,
+            explanation=explanation,
+            source='rules'
+        )
+    
+    def _calculate_similarity(self, parsed_line: ParsedLine, item: Dict,
+                              query_tokens: Optional[frozenset] = None,
+                              name_tokens: Optional[frozenset] = None,
+                              specs_similarity: Optional[float] = None) -> float:
         """Calculate similarity between parsed line and item"""
         score = 0.0
-        name = (item.get('name', '') or '').lower()
-        specs = item.get('specs_json', {})
         
-        # Name similarity
-        name_similarity = self._calculate_text_similarity(
-            parsed_line.normalized_text.lower(), 
-            name
-        )
+        # Name similarity (token sets may come precomputed from the catalog index)
+        if query_tokens is None:
+            query_tokens = tokenize(parsed_line.normalized_text)
+        if name_tokens is None:
+            name_tokens = tokenize(item.get('name', '') or '')
+        name_similarity = self._calculate_token_similarity(query_tokens, name_tokens)
         score += name_similarity * 0.4
         
-        # Specs similarity
-        if specs:
-            specs_similarity = self._calculate_specs_similarity(parsed_line, specs)
-            score += specs_similarity * 0.6
+        # Specs similarity (may come precomputed from the attribute index)
+        if specs_similarity is None:
+            specs = item.get('specs_json', {})
+            specs_similarity = self._calculate_specs_similarity(parsed_line, specs) if specs else 0.0
+        score += specs_similarity * 0.6
         
         return min(score, 1.0)
     
     def _calculate_text_similarity(self, text1: str, text2: str) -> float:
         """Calculate text similarity using word overlap"""
-        words1 = set(text1.split())
-        words2 = set(text2.split())
-        
+        return self._calculate_token_similarity(set(text1.split()), set(text2.split()))
+    
+    def _token_similarity_bound(self, words: frozenset, other_size: int) -> float:
+        """Upper bound of the Jaccard similarity with any set of other_size tokens"""
+        if not words or not other_size:
+            return 0.0
+        return min(len(words), other_size) / max(len(words), other_size)
+    
+    def _calculate_token_similarity(self, words1: frozenset, words2: frozenset) -> float:
+        """Calculate Jaccard similarity of two token sets"""
         if not words1 or not words2:
             return 0.0
         
@@ -202,15 +334,20 @@ class MatchingEngine:
         score = 0.0
         params = parsed_line.extracted_params or {}
         
-        # Diameter match
-        if 'diameter' in params and 'diameter' in specs:
-            if (params.get('diameter', '') or '').lower() == (specs.get('diameter', '') or '').lower():
-                score += self.weights['diameter_match']
-        
-        # Length match
-        if 'length' in params and 'length' in specs:
-            if params['length'] == specs['length']:
-                score += self.weights['length_match']
+        # Diameter x length match by canonical size key
+        params_size = size_key(params.get('diameter'), params.get('length'))
+        if params_size is not None and params_size == size_key(specs.get('diameter'), specs.get('length')):
+            score += self.weights['diameter_match'] + self.weights['length_match']
+        else:
+            # Diameter match
+            if 'diameter' in params and 'diameter' in specs:
+                if (params.get('diameter', '') or '').lower() == (specs.get('diameter', '') or '').lower():
+                    score += self.weights['diameter_match']
+            
+            # Length match
+            if 'length' in params and 'length' in specs:
+                if params['length'] == specs['length']:
+                    score += self.weights['length_match']
         
         # Material match
         if 'material' in params and 'material' in specs:
@@ -229,21 +366,22 @@ class MatchingEngine:
         
         return score
     
-    def _apply_type_filter(self, parsed_line: ParsedLine, candidates: List[MatchCandidate]) -> List[MatchCandidate]:
-        """Apply type filter - remove candidates that don't match the required type"""
+    def _calculate_indexed_specs_similarity(self, item_id: int, spec_hits: Dict[str, set]) -> float:
+        """Calculate specs similarity from attribute index lookups"""
+        score = 0.0
+        sized = SIZE_KEY in spec_hits and item_id in spec_hits[SIZE_KEY]
+        for key in SPEC_KEYS:
+            if sized and key in ('diameter', 'length'):
+                score += self.weights[f'{key}_match']
+            elif key in spec_hits and item_id in spec_hits[key]:
+                score += self.weights[f'{key}_match']
+        return score
+    
+    def _required_type(self, parsed_line: ParsedLine) -> Optional[str]:
+        """Type every candidate must match (lowercase), if the line names one"""
         if not parsed_line.extracted_params or 'type' not in parsed_line.extracted_params:
-            return candidates
-        
-        required_type = (parsed_line.extracted_params.get('type', '') or '').lower()
-        filtered_candidates = []
-        
-        for candidate in candidates:
-            if self._matches_type(candidate.name, required_type):
-                filtered_candidates.append(candidate)
-            else:
-                logger.debug(f"Filtered out {candidate.ku} - type mismatch")
-        
-        return filtered_candidates
+            return None
+        return (parsed_line.extracted_params.get('type', '') or '').lower()
     
     def _matches_type(self, item_name: str, required_type: str) -> bool:
         """Check if item name matches required type"""
@@ -257,21 +395,27 @@ class MatchingEngine:
     
     def _calculate_score(self, parsed_line: ParsedLine, candidate: MatchCandidate) -> float:
         """Calculate final score for candidate"""
+        is_alias = candidate.source == 'rules' and 'Exact alias match' in candidate.explanation
+        return self._final_score(parsed_line, candidate.score, candidate.ku, candidate.name, is_alias)
+    
+    def _final_score(self, parsed_line: ParsedLine, base_score: float, ku: str, name: str,
+                     alias: bool = False) -> float:
+        """Final score from the matching score and the candidate KU, name and alias flag"""
         score = 0.0
         
         # Base score from matching algorithm
-        score += candidate.score * 0.7
+        score += base_score * 0.7
         
         # Bonus for exact KU match
-        if parsed_line.normalized_text.lower() == (candidate.ku or '').lower():
+        if parsed_line.normalized_text.lower() == (ku or '').lower():
             score += self.weights['ku_match']
         
         # Bonus for exact alias match
-        if candidate.source == 'rules' and 'Exact alias match' in candidate.explanation:
+        if alias:
             score += self.weights['exact_alias']
         
         # Apply type filter penalty
-        if not self._matches_type(candidate.name, parsed_line.normalized_text):
+        if not self._matches_type(name, parsed_line.normalized_text):
             score = 0.0
         
         return min(score, 1.0)
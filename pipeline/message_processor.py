@@ -5,7 +5,7 @@
 
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from telegram import Bot, Message
 from telegram.ext import ContextTypes
 
@@ -15,13 +15,22 @@ from shared.errors import MessageProcessingError, handle_service_error
 from services.message_processor import MessageProcessor
 from services.excel_generator import ExcelGenerator
 # from database.supabase_client import save_user_request, search_parts  # Заменяем на Edge Function
-from config import MIN_PROBABILITY_THRESHOLD
+from config import MIN_PROBABILITY_THRESHOLD, SEARCH_CONCURRENCY, SEARCH_BATCH_SIZE
 
 import os
+import copy
 import aiohttp
+from shared.http import get_http_session
+from services.search_cache import get_search_cache, make_search_key
+from services.fastener_search import fastener_search_batch
+from services.local_search import local_search, local_search_mode, MODE_PRIMARY, MODE_FALLBACK
+from shared.cache import SingleFlight
 
 logger = get_logger(__name__)
 
+# Объединение одновременных одинаковых вызовов fastener-search
+_search_flight = SingleFlight()
+
 
 class MessagePipeline:
     """Pipeline для обработки сообщений - УПРОЩЕННЫЙ"""
@@ -153,8 +162,9 @@ class MessagePipeline:
         """Обрабатывает поиск для множественного заказа"""
         all_results = []
         position_results = {}
-        processed_queries = {}  # Кэш для избежания дублирования запросов
         
+        # Сначала строим запросы всех позиций, затем ищем уникальные параллельно
+        queries = []
         for i, item in enumerate(items):
             # Создаем уникальный запрос для поиска (включаем длину для различения)
             search_query_parts = []
@@ -185,16 +195,20 @@ class MessagePipeline:
             ]).strip()
             
             logger.info(f"Позиция {i+1}: поиск по '{item_query}'")
-            
-            # Проверяем, не делали ли мы уже такой запрос
-            if item_query in processed_queries:
-                logger.info(f"Используем кэшированный результат для '{item_query}'")
-                item_results = processed_queries[item_query].copy()
-            else:
-                # Ищем деталь
-                item_results = await search_parts_direct(item_query, item)
-                # Сохраняем в кэш
-                processed_queries[item_query] = item_results.copy() if item_results else []
+            queries.append((item_query, full_item_query))
+        
+        # Одинаковые запросы выполняются один раз (с user_intent первой такой позиции)
+        unique_items = {}
+        for (item_query, _), item in zip(queries, items):
+            unique_items.setdefault(item_query, item)
+        
+        # Весь заказ - одним batch-вызовом Edge Function
+        found = await search_parts_batch_direct(list(unique_items.items()))
+        processed_queries = dict(zip(unique_items, found))
+        
+        for i, (item, (item_query, full_item_query)) in enumerate(zip(items, queries)):
+            # Каждая позиция получает свою копию, т.к. результаты дополняются полями позиции
+            item_results = copy.deepcopy(processed_queries[item_query])
             
             if item_results:
                 # Добавляем информацию о заказе
@@ -474,9 +488,77 @@ async def search_parts_direct(query: str, user_intent: Dict[str, Any]) -> List[D
     supabase_url = os.getenv('SUPABASE_URL')
     supabase_key = os.getenv('SUPABASE_KEY')
 
+    mode = local_search_mode()
+    if mode == MODE_PRIMARY:
+        local_results = await local_search(query, user_intent)
+        if local_results is not None:
+            return local_results
+
     if not supabase_url or not supabase_key:
         raise RuntimeError("SUPABASE_URL и SUPABASE_KEY должны быть установлены")
 
+    search_cache = get_search_cache()
+    if search_cache is not None:
+        cached_results = await search_cache.get(query, user_intent)
+        if cached_results is not None:
+            logger.info(f"Результаты Edge Function из кэша ({len(cached_results)}) для '{query}'")
+            return cached_results
+
+    # Одинаковые одновременные запросы (в том числе от разных пользователей) выполняются один раз
+    try:
+        results = await _search_flight.run(
+            make_search_key(query, user_intent),
+            lambda: _call_fastener_search(supabase_url, supabase_key, query, user_intent, search_cache)
+        )
+    except Exception:
+        if mode != MODE_FALLBACK:
+            raise
+        local_results = await local_search(query, user_intent)
+        if local_results is None:
+            raise
+        logger.warning(f"Edge Function недоступна, локальный поиск для '{query}'")
+        return local_results
+    # Вызывающий код дополняет результаты полями позиции заказа
+    return copy.deepcopy(results)
+
+
+async def search_parts_batch_direct(queries: List[Tuple[str, Dict[str, Any]]]) -> List[List[Dict[str, Any]]]:
+    """Поиск нескольких позиций одним вызовом Edge Function (batch-контракт)
+
+    Позиции, которые batch-вызов не разрешил, и все позиции в режиме
+    локального поиска primary ищутся поштучно через search_parts_direct
+    (не более SEARCH_CONCURRENCY одновременно).
+    """
+    supabase_url = os.getenv('SUPABASE_URL')
+    supabase_key = os.getenv('SUPABASE_KEY')
+    semaphore = asyncio.Semaphore(max(1, SEARCH_CONCURRENCY))
+
+    async def search(position: int) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await search_parts_direct(*queries[position]) or []
+
+    if local_search_mode() == MODE_PRIMARY:
+        return list(await asyncio.gather(*(search(position) for position in range(len(queries)))))
+
+    if not supabase_url or not supabase_key:
+        raise RuntimeError("SUPABASE_URL и SUPABASE_KEY должны быть установлены")
+
+    results = await fastener_search_batch(
+        supabase_url, supabase_key, queries, search_cache=get_search_cache(), batch_size=SEARCH_BATCH_SIZE
+    )
+
+    missing = [position for position, found in enumerate(results) if found is None]
+    if missing:
+        logger.info(f"Поштучный поиск для {len(missing)} позиций без batch-результата")
+        for position, found in zip(missing, await asyncio.gather(*(search(p) for p in missing))):
+            results[position] = found
+
+    return results
+
+
+async def _call_fastener_search(supabase_url: str, supabase_key: str, query: str,
+                                user_intent: Dict[str, Any], search_cache=None) -> List[Dict[str, Any]]:
+    """Вызов Edge Function fastener-search с повторами"""
     edge_function_url = f"{supabase_url}/functions/v1/fastener-search"
 
     headers = {
@@ -499,15 +581,17 @@ async def search_parts_direct(query: str, user_intent: Dict[str, Any]) -> List[D
     for attempt in range(1, max_retries + 1):
         try:
             logger.info(f"Попытка {attempt}/{max_retries} вызова Edge Function")
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(edge_function_url, json=payload, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise RuntimeError(f"Edge Function error {response.status}: {error_text}")
-                    result = await response.json()
-                    results = result.get('results', [])
-                    logger.info(f"Edge Function вернул {len(results)} результатов на попытке {attempt}")
-                    return results
+            session = await get_http_session()
+            async with session.post(edge_function_url, json=payload, headers=headers, timeout=timeout) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise RuntimeError(f"Edge Function error {response.status}: {error_text}")
+                result = await response.json()
+                results = result.get('results', [])
+                logger.info(f"Edge Function вернул {len(results)} результатов на попытке {attempt}")
+                if search_cache is not None:
+                    await search_cache.set(query, user_intent, results)
+                return results
         except Exception as e:
             logger.error(f"Попытка {attempt} вызова Edge Function завершилась исключением: {e}")
             last_error = e
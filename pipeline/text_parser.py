@@ -8,8 +8,17 @@ import logging
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 
+from shared.cache import LRUCache
+
 logger = logging.getLogger(__name__)
 
+# Default number of distinct lines memoized per cache
+DEFAULT_CACHE_SIZE = 4096
+
+# Line splitting (comma excluded to keep numbers like "4,0" intact) and list markers
+LINE_SPLIT_RE = re.compile(r'[\n;\t]+')
+BULLET_RE = re.compile(r'^[\-\*\u2022•]+\s*')
+
 @dataclass
 class ParsedLine:
     """Parsed line data structure"""
@@ -20,15 +29,21 @@ class ParsedLine:
     extracted_params: Dict[str, str] = None
 
 class TextNormalizer:
-    """Text normalization according to specification rules"""
+    """Text normalization according to specification rules
+
+    All patterns are compiled once at construction. Colloquial size words and
+    material/type synonyms are each replaced in a single alternation pass.
+    Results are memoized per input text in bounded LRU caches.
+    """
     
-    def __init__(self):
-        # Size normalization patterns
-        self.size_patterns = [
-            (r'(\d+)\s*[xх×*]\s*(\d+)', r'\1x\2'),  # M10x120, M10х120, M10*120 -> M10x120
-            (r'М(\d+)\s*[xх×*]\s*(\d+)', r'M\1x\2'),  # М10x120 -> M10x120
-            (r'(\d+)\s*[xх×*]\s*(\d+)\s*мм', r'\1x\2'),  # 10x120мм -> 10x120
-        ]
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.normalize_cache = LRUCache(cache_size)
+        self.params_cache = LRUCache(cache_size)
+        self.quantity_cache = LRUCache(cache_size)
+
+        # Size normalization: M10x120, M10х120, M10*120, М10 х 120 мм -> M10x120
+        # (Cyrillic М prefix -> Latin M, trailing "мм" dropped)
+        self.size_re = re.compile(r'(М)?(\d+)\s*[xх×*]\s*(\d+)(\s*мм)?', re.IGNORECASE)
         
         # Material/coating normalization
         self.material_synonyms = {
@@ -54,104 +69,119 @@ class TextNormalizer:
             (r'двенаш[какуи]?', 'M12'),
             (r'двенадцат[какуи]?', 'M12'),
         ]
+        self.word_size_re = re.compile(
+            '|'.join(f'({pattern})' for pattern, _ in self.word_size_patterns), re.IGNORECASE
+        )
+        self._word_size_replacements = [repl for _, repl in self.word_size_patterns]
+
+        # Synonym variant -> standard form. Standard forms map to themselves so
+        # already normalized words are not expanded again; longest variants first.
+        self.synonyms: Dict[str, str] = {}
+        for synonyms in (self.material_synonyms, self.type_synonyms):
+            for standard, variants in synonyms.items():
+                self.synonyms.setdefault(standard, standard)
+                for variant in variants:
+                    self.synonyms.setdefault(variant, standard)
+        self.synonym_re = re.compile(
+            '|'.join(re.escape(variant) for variant in sorted(self.synonyms, key=len, reverse=True)),
+            re.IGNORECASE
+        )
+        # Words the synonym pass writes into normalized text
+        self.standard_words = frozenset(word for standard in self.synonyms.values() for word in standard.split())
+
+        self.spaces_re = re.compile(r'\s+')
 
-        # Quantity extraction patterns
+        # Quantity extraction patterns (pieces take priority over packs)
         self.qty_patterns = [
-            r'(\d+)\s*шт',
-            r'(\d+)\s*уп',
-            r'(\d+)\s*штук',
-            r'(\d+)\s*упаковок',
-            r'(\d+)\s*шт\.',
-            r'(\d+)\s*уп\.',
+            (re.compile(r'(\d+)\s*шт', re.IGNORECASE), 'шт'),  # шт, шт., штук
+            (re.compile(r'(\d+)\s*уп', re.IGNORECASE), 'уп'),  # уп, уп., упаковок
         ]
+
+        # Parameter extraction patterns
+        self.diameter_re = re.compile(r'[МM](\d+(?:\.\d+)?)', re.IGNORECASE)
+        self.length_re = re.compile(r'[МM]\d+(?:\.\d+)?[xх×*](\d+(?:\.\d+)?)', re.IGNORECASE)
+        self.strength_re = re.compile(r'кл\.пр\.(\d+\.\d+)', re.IGNORECASE)
+        self.din_re = re.compile(r'DIN\s*(\d+)', re.IGNORECASE)
+        self.coating_re = re.compile(r'(оцинк|цинк|латун|нержавеющий)', re.IGNORECASE)
     
     def normalize_text(self, text: str) -> str:
         """Normalize text according to specification rules"""
         if not text:
             return ""
-        
+        return self.normalize_cache.get_or_compute(text, lambda: self._normalize_text(text))
+    
+    def _normalize_text(self, text: str) -> str:
         normalized = text.strip()
 
         # Replace colloquial size words with metric thread notation
-        for pattern, repl in self.word_size_patterns:
-            normalized = re.sub(pattern, repl, normalized, flags=re.IGNORECASE)
+        normalized = self.word_size_re.sub(self._replace_word_size, normalized)
 
         # Apply size normalization
-        for pattern, replacement in self.size_patterns:
-            normalized = re.sub(pattern, replacement, normalized, flags=re.IGNORECASE)
-        
-        # Normalize materials/coatings
-        normalized = self._normalize_materials(normalized)
+        normalized = self.size_re.sub(self._replace_size, normalized)
         
-        # Normalize types
-        normalized = self._normalize_types(normalized)
+        # Normalize materials/coatings and types
+        normalized = self.synonym_re.sub(self._replace_synonym, normalized)
         
         # Clean up extra spaces
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
+        normalized = self.spaces_re.sub(' ', normalized).strip()
         
         return normalized
     
-    def _normalize_materials(self, text: str) -> str:
-        """Normalize material and coating terms"""
-        text_lower = text.lower()
-        
-        for standard, variants in self.material_synonyms.items():
-            for variant in variants:
-                if variant in text_lower:
-                    text = re.sub(re.escape(variant), standard, text, flags=re.IGNORECASE)
-                    break
-        
-        return text
+    def _replace_word_size(self, match: re.Match) -> str:
+        return self._word_size_replacements[match.lastindex - 1]
     
-    def _normalize_types(self, text: str) -> str:
-        """Normalize fastener type terms"""
-        text_lower = text.lower()
-        
-        for standard, variants in self.type_synonyms.items():
-            for variant in variants:
-                if variant in text_lower:
-                    text = re.sub(re.escape(variant), standard, text, flags=re.IGNORECASE)
-                    break
-        
-        return text
+    def _replace_size(self, match: re.Match) -> str:
+        prefix = 'M' if match.group(1) else ''
+        return f"{prefix}{match.group(2)}x{match.group(3)}"
+    
+    def _replace_synonym(self, match: re.Match) -> str:
+        variant = match.group(0)
+        standard = self.synonyms[variant.lower()]
+        # Standard forms are kept as written
+        return variant if standard == variant.lower() else standard
     
     def extract_quantity(self, text: str) -> Tuple[Optional[float], Optional[str]]:
         """Extract quantity from text"""
-        for pattern in self.qty_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        return self.quantity_cache.get_or_compute(text, lambda: self._extract_quantity(text))
+    
+    def _extract_quantity(self, text: str) -> Tuple[Optional[float], Optional[str]]:
+        for pattern, unit in self.qty_patterns:
+            match = pattern.search(text)
             if match:
-                qty = float(match.group(1))
-                unit = 'шт' if 'шт' in match.group(0).lower() else 'уп'
-                return qty, unit
+                return float(match.group(1)), unit
         
         return None, None
     
     def extract_parameters(self, text: str) -> Dict[str, str]:
         """Extract parameters from text"""
+        # Callers may mutate the result, so the cached dict is never handed out
+        return dict(self.params_cache.get_or_compute(text, lambda: self._extract_parameters(text)))
+    
+    def _extract_parameters(self, text: str) -> Dict[str, str]:
         params = {}
         
         # Extract diameter
-        diameter_match = re.search(r'[МM](\d+(?:\.\d+)?)', text, re.IGNORECASE)
+        diameter_match = self.diameter_re.search(text)
         if diameter_match:
             params['diameter'] = f"M{diameter_match.group(1)}"
         
         # Extract length
-        length_match = re.search(r'[МM]\d+(?:\.\d+)?[xх×*](\d+(?:\.\d+)?)', text, re.IGNORECASE)
+        length_match = self.length_re.search(text)
         if length_match:
             params['length'] = length_match.group(1)
         
         # Extract strength class
-        strength_match = re.search(r'кл\.пр\.(\d+\.\d+)', text, re.IGNORECASE)
+        strength_match = self.strength_re.search(text)
         if strength_match:
             params['strength_class'] = strength_match.group(1)
         
         # Extract standard
-        din_match = re.search(r'DIN\s*(\d+)', text, re.IGNORECASE)
+        din_match = self.din_re.search(text)
         if din_match:
             params['standard'] = f"DIN {din_match.group(1)}"
         
         # Extract coating
-        coating_match = re.search(r'(оцинк|цинк|латун|нержавеющий)', text, re.IGNORECASE)
+        coating_match = self.coating_re.search(text)
         if coating_match:
             coating = coating_match.group(1).lower()
             if coating in ['оцинк', 'цинк']:
@@ -166,8 +196,10 @@ class TextNormalizer:
 class TextParser:
     """Main text parser for different input types"""
     
-    def __init__(self):
-        self.normalizer = TextNormalizer()
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.normalizer = TextNormalizer(cache_size)
+        # line -> (normalized, qty_packs, qty_units, params)
+        self.line_cache = LRUCache(cache_size)
     
     def parse_text_input(self, text: str) -> List[ParsedLine]:
         """Parse text input into individual lines"""
@@ -175,7 +207,7 @@ class TextParser:
             return []
         
         # Split by common delimiters (comma removed to keep numbers like "4,0" intact)
-        lines = re.split(r'[\n;\t]+', text)
+        lines = LINE_SPLIT_RE.split(text)
 
         parsed_lines = []
         for i, line in enumerate(lines, 1):
@@ -184,31 +216,20 @@ class TextParser:
                 continue
 
             # Remove common bullet/list markers from the beginning of the line
-            line = re.sub(r'^[\-\*\u2022•]+\s*', '', line)
+            line = BULLET_RE.sub('', line)
 
-            # Normalize the line
-            normalized = self.normalizer.normalize_text(line)
-
-            # Extract quantity
-            qty, unit = self.normalizer.extract_quantity(line)
-
-            # Extract parameters
-            params = self.normalizer.extract_parameters(normalized)
-
-            # Calculate qty_units/qty_packs ensuring both variables are defined
-            qty_packs = None
-            qty_units = None
-            if qty and unit == 'шт':
-                qty_units = qty
-            elif qty and unit == 'уп':
-                qty_packs = qty
+            normalized, qty_packs, qty_units, params = self.line_cache.get_or_compute(
+                line, lambda: self._parse_line(line)
+            )
 
+            # ParsedLine is mutable (e.g. raw_text is rewritten for Excel rows),
+            # so every call gets a fresh instance and params dict
             parsed_line = ParsedLine(
                 raw_text=line,
                 normalized_text=normalized,
                 qty_packs=qty_packs,
                 qty_units=qty_units,
-                extracted_params=params
+                extracted_params=dict(params)
             )
             
             parsed_lines.append(parsed_line)
@@ -216,6 +237,36 @@ class TextParser:
         
         return parsed_lines
     
+    def _parse_line(self, line: str) -> Tuple[str, Optional[float], Optional[float], Dict[str, str]]:
+        """Run the normalization pipeline for a single cleaned line"""
+        # Normalize the line
+        normalized = self.normalizer.normalize_text(line)
+
+        # Extract quantity
+        qty, unit = self.normalizer.extract_quantity(line)
+
+        # Extract parameters
+        params = self.normalizer.extract_parameters(normalized)
+
+        # Calculate qty_units/qty_packs ensuring both variables are defined
+        qty_packs = None
+        qty_units = None
+        if qty and unit == 'шт':
+            qty_units = qty
+        elif qty and unit == 'уп':
+            qty_packs = qty
+
+        return normalized, qty_packs, qty_units, params
+    
+    def cache_stats(self) -> Dict[str, Dict]:
+        """Hit/miss statistics of all parser caches"""
+        return {
+            'lines': self.line_cache.stats(),
+            'normalize': self.normalizer.normalize_cache.stats(),
+            'parameters': self.normalizer.params_cache.stats(),
+            'quantity': self.normalizer.quantity_cache.stats(),
+        }
+    
     def parse_excel_input(self, excel_data: List[List[str]]) -> List[ParsedLine]:
         """Parse Excel input data"""
         parsed_lines = []
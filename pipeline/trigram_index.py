@@ -0,0 +1,79 @@
+"""
+Character trigram index for typo-tolerant word lookup
+"""
+
+import heapq
+import math
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+
+def trigrams(word: str) -> FrozenSet[str]:
+    """Trigrams of a word padded like pg_trgm: "  word " """
+    padded = f"  {(word or '').lower()} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def is_word(token: str) -> bool:
+    """Tokens worth correcting: letters only, at least 3 of them"""
+    return len(token) >= 3 and token.isalpha()
+
+
+class TrigramIndex:
+    """Inverted index trigram -> ids of vocabulary words
+
+    Similarity is trigram Jaccard: shared / (|query| + |word| - shared).
+    A word can only reach min_similarity if it shares at least
+    ceil(min_similarity * |query|) trigrams and its trigram count lies in
+    [min_similarity * |query|, |query| / min_similarity], so candidates are
+    filtered on the shared-trigram count and size before scoring.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words: List[str] = []
+        self.sizes: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        self._ids: Dict[str, int] = {}
+        for word in words:
+            self.add(word)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return (word or '').lower() in self._ids
+
+    def add(self, word: str):
+        """Add a word to the vocabulary (duplicates are ignored)"""
+        word = (word or '').lower()
+        if not word or word in self._ids:
+            return
+        word_id = len(self.words)
+        self._ids[word] = word_id
+        self.words.append(word)
+        grams = trigrams(word)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(word_id)
+
+    def search(self, word: str, k: int = 5, min_similarity: float = 0.3) -> List[Tuple[str, float]]:
+        """Top-k (word, similarity) with similarity >= min_similarity, best first"""
+        grams = trigrams(word)
+        min_overlap = max(1, math.ceil(min_similarity * len(grams)))
+        min_size = min_similarity * len(grams)
+        max_size = len(grams) / min_similarity if min_similarity > 0 else math.inf
+
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for word_id in self.postings.get(gram, ()):
+                shared[word_id] = shared.get(word_id, 0) + 1
+
+        scored = []
+        for word_id, overlap in shared.items():
+            size = self.sizes[word_id]
+            if overlap < min_overlap or not min_size <= size <= max_size:
+                continue
+            similarity = overlap / (len(grams) + size - overlap)
+            if similarity >= min_similarity:
+                scored.append((similarity, -word_id))
+        # Ties go to the word added first
+        return [(self.words[-word_id], similarity) for similarity, word_id in heapq.nlargest(k, scored)]
@@ -0,0 +1,181 @@
+"""
+Vectorized candidate scoring over the catalog index (optional NumPy)
+
+Scores every shortlisted item of a parsed line in one pass with the same
+arithmetic as MatchingEngine._calculate_similarity and _calculate_score,
+so results are identical to the scalar path. Without NumPy the engine
+keeps scoring item by item.
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pipeline.catalog_index import CatalogIndex, CONTAINS_SPEC_KEYS, SPEC_KEYS
+from shared.size_key import size_key
+
+try:
+    import numpy as np
+except ImportError:  # numpy опционален
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+def vector_scoring_available() -> bool:
+    return np is not None
+
+
+class VectorScorer:
+    """Catalog attributes encoded as NumPy arrays for one CatalogIndex
+
+    Each spec column is an int32 array of codes into the distinct values of
+    the attribute index (-1 if the item has no such spec); name token
+    counts and type membership are arrays too. Token
+    posting lists are converted lazily, on first use.
+    """
+
+    def __init__(self, index: CatalogIndex):
+        attributes = index.attributes
+        size = len(index)
+        self.index = index
+        self.name_lengths = np.fromiter((len(tokens) for tokens in index.name_tokens), dtype=np.int32, count=size)
+        self.codes: Dict[str, 'np.ndarray'] = {}
+        self.vocabulary: Dict[str, Dict] = {}
+        for key in SPEC_KEYS:
+            codes = np.full(size, -1, dtype=np.int32)
+            self.vocabulary[key] = {}
+            for code, (value, item_ids) in enumerate(attributes.values[key].items()):
+                self.vocabulary[key][value] = code
+                codes[np.fromiter(item_ids, dtype=np.int64, count=len(item_ids))] = code
+            self.codes[key] = codes
+        self.types = {
+            type_name: self._mask(item_ids, size) for type_name, item_ids in attributes.types.items()
+        }
+        self._postings: Dict[str, 'np.ndarray'] = {}
+
+    @staticmethod
+    def _mask(item_ids, size: int) -> 'np.ndarray':
+        mask = np.zeros(size, dtype=bool)
+        mask[np.fromiter(item_ids, dtype=np.int64, count=len(item_ids))] = True
+        return mask
+
+    def _posting(self, token: str) -> 'np.ndarray':
+        posting = self._postings.get(token)
+        if posting is None:
+            posting = np.asarray(self.index.postings.get(token, ()), dtype=np.int64)
+            self._postings[token] = posting
+        return posting
+
+    def _matching_codes(self, key: str, value) -> List[int]:
+        """Codes of the values that AttributeIndex.lookup would match"""
+        vocabulary = self.vocabulary[key]
+        if key in CONTAINS_SPEC_KEYS:
+            needle = (value or '').lower()
+            return [code for spec_value, code in vocabulary.items() if needle in spec_value]
+        if key == 'diameter':
+            value = (value or '').lower()
+        try:
+            code = vocabulary.get(value)
+        except TypeError:
+            code = None
+        return [] if code is None else [code]
+
+    def name_similarity(self, query_tokens: frozenset, item_ids: 'np.ndarray') -> 'np.ndarray':
+        """Jaccard similarity of query tokens and item name tokens"""
+        if not query_tokens:
+            return np.zeros(len(item_ids))
+        intersection = np.zeros(len(self.index), dtype=np.int32)
+        for token in query_tokens:
+            intersection[self._posting(token)] += 1
+        intersection = intersection[item_ids]
+        union = len(query_tokens) + self.name_lengths[item_ids] - intersection
+        return np.divide(intersection, union, out=np.zeros(len(item_ids)), where=union > 0)
+
+    def specs_similarity(self, params: Dict, item_ids: 'np.ndarray', weights: Dict[str, float]) -> 'np.ndarray':
+        """Weighted sum of spec matches, as MatchingEngine._calculate_indexed_specs_similarity"""
+        sized = np.zeros(len(item_ids), dtype=bool)
+        key = size_key(params.get('diameter'), params.get('length'))
+        if key is not None:
+            sized_ids = self.index.attributes.size_keys.get(key, ())
+            sized = np.isin(item_ids, np.fromiter(sized_ids, dtype=np.int64, count=len(sized_ids)))
+
+        score = np.zeros(len(item_ids))
+        for spec in SPEC_KEYS:
+            if spec in params:
+                hit = np.isin(self.codes[spec][item_ids], self._matching_codes(spec, params[spec]))
+            else:
+                hit = np.zeros(len(item_ids), dtype=bool)
+            if spec in ('diameter', 'length'):
+                hit = hit | sized
+            score = score + hit * weights[f'{spec}_match']
+        return score
+
+    def type_mask(self, text: str, item_ids: 'np.ndarray',
+                  type_patterns: Dict[str, List[str]]) -> 'np.ndarray':
+        """Items whose name matches the type named in text, as MatchingEngine._matches_type"""
+        for type_name, patterns in type_patterns.items():
+            if any(pattern in text for pattern in patterns):
+                mask = self.types.get(type_name)
+                if mask is None:
+                    # Index built without this type pattern: match names directly
+                    mask = np.fromiter(
+                        (any(pattern in (item.get('name', '') or '').lower() for pattern in patterns)
+                         for item in self.index.items),
+                        dtype=bool, count=len(self.index)
+                    )
+                    self.types[type_name] = mask
+                return mask[item_ids]
+        return np.ones(len(item_ids), dtype=bool)
+
+    def sku_mask(self, text: str, item_ids: 'np.ndarray') -> 'np.ndarray':
+        """Items whose SKU equals text, case-insensitive"""
+        return np.isin(item_ids, self.index.sku_ids.get(text.lower(), []))
+
+
+def get_vector_scorer(index: CatalogIndex) -> VectorScorer:
+    """Vector scorer of a catalog index, built on first use and kept with the index"""
+    if index.vector_scorer is None:
+        index.vector_scorer = VectorScorer(index)
+        logger.info(f"Vector scorer built for {len(index)} items")
+    return index.vector_scorer
+
+
+def top_k_positions(scores: 'np.ndarray', k: Optional[int]) -> 'np.ndarray':
+    """Positions of the k best scores in ascending order (ties go to lower positions)
+
+    Uses argpartition instead of a full sort; the chosen set is the same as
+    taking the first k of a stable sort by descending score.
+    """
+    if not k or len(scores) <= k:
+        return np.arange(len(scores))
+    cutoff = scores[np.argpartition(-scores, k - 1)[:k]].min()
+    above = np.flatnonzero(scores > cutoff)
+    ties = np.flatnonzero(scores == cutoff)[:k - len(above)]
+    return np.sort(np.concatenate([above, ties]))
+
+
+def score_shortlist(index: CatalogIndex, item_ids: Sequence[int], query_tokens: frozenset,
+                    params: Dict, normalized_text: str, weights: Dict[str, float],
+                    type_patterns: Dict[str, List[str]], threshold: float,
+                    top_k: Optional[int] = None,
+                    required_type: Optional[str] = None) -> List[Tuple[int, float]]:
+    """(item id, similarity) of shortlisted items above threshold, in item id order
+
+    Items not of required_type are dropped. With top_k only the items with
+    the best final score (see MatchingEngine._calculate_score) are kept.
+    """
+    scorer = get_vector_scorer(index)
+    ids = np.asarray(item_ids, dtype=np.int64)
+    similarity = scorer.name_similarity(query_tokens, ids) * 0.4
+    similarity = np.minimum(similarity + scorer.specs_similarity(params, ids, weights) * 0.6, 1.0)
+
+    keep = similarity > threshold
+    if required_type:
+        keep &= scorer.type_mask(required_type, ids, type_patterns)
+    ids, similarity = ids[keep], similarity[keep]
+    if top_k and len(ids) > top_k:
+        final = similarity * 0.7 + scorer.sku_mask(normalized_text, ids) * weights['ku_match']
+        final = np.where(scorer.type_mask(normalized_text, ids, type_patterns), np.minimum(final, 1.0), 0.0)
+        chosen = top_k_positions(final, top_k)
+        ids, similarity = ids[chosen], similarity[chosen]
+    return [(int(item_id), float(score)) for item_id, score in zip(ids, similarity)]
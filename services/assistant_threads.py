@@ -0,0 +1,185 @@
+"""
+Пул тредов ассистента (Assistants API): повторное использование, лимит и удаление
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Set
+
+from shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ThreadInfo:
+    """Тред в пуле"""
+    thread_id: str
+    key: Optional[Hashable]
+    runs: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class ThreadLease:
+    """Тред, выданный на один запуск; reusable=False - не возвращать его в пул"""
+    thread_id: str
+    reusable: bool = True
+
+
+class AssistantThreadManager:
+    """Выдает треды по ключу (chat_id) и возвращает их в пул после запуска
+
+    Тред ключа переиспользуется, пока он свободен (в треде не может идти два
+    запуска сразу), не простаивал дольше idle_ttl и прошел меньше max_runs
+    запусков; иначе он удаляется в фоне. Всего тредов (свободных и выданных)
+    не больше max_threads: при нехватке удаляется самый давно простаивающий
+    свободный тред, а если свободных нет - acquire ждет возврата.
+    """
+
+    def __init__(self, client: Any, max_threads: int = 50, idle_ttl: float = 600.0,
+                 max_runs: int = 20, metrics_prefix: str = 'assistant_threads'):
+        self.client = client
+        self.max_threads = max(1, max_threads)
+        self.idle_ttl = idle_ttl
+        self.max_runs = max_runs
+        self._threads: Dict[str, ThreadInfo] = {}
+        self._idle: Dict[Optional[Hashable], List[str]] = {}
+        self._leased: Set[str] = set()
+        self._reserved = 0
+        self._cond = asyncio.Condition()
+        self._deletes: Set[asyncio.Task] = set()
+
+        metrics = get_metrics()
+        self._create_ms = metrics.histogram(f'{metrics_prefix}.create_ms')
+        self._delete_ms = metrics.histogram(f'{metrics_prefix}.delete_ms')
+        self._created = metrics.counter(f'{metrics_prefix}.created')
+        self._reused = metrics.counter(f'{metrics_prefix}.reused')
+        self._deleted = metrics.counter(f'{metrics_prefix}.deleted')
+        self._delete_errors = metrics.counter(f'{metrics_prefix}.delete_errors')
+        metrics.gauge(f'{metrics_prefix}.idle', lambda: self.idle)
+        metrics.gauge(f'{metrics_prefix}.leased', lambda: len(self._leased))
+
+    def __len__(self) -> int:
+        return len(self._threads)
+
+    @property
+    def idle(self) -> int:
+        return sum(len(thread_ids) for thread_ids in self._idle.values())
+
+    async def acquire(self, key: Optional[Hashable] = None) -> str:
+        """Свободный тред ключа или новый"""
+        async with self._cond:
+            while True:
+                self._expire_idle()
+                thread_id = self._pop_idle(key)
+                if thread_id is not None:
+                    self._reused.inc()
+                    self._leased.add(thread_id)
+                    return thread_id
+                if len(self._threads) + self._reserved < self.max_threads:
+                    self._reserved += 1
+                    break
+                if not self._evict_oldest_idle():
+                    await self._cond.wait()
+
+        start = time.perf_counter()
+        try:
+            thread = await self.client.beta.threads.create()
+        except BaseException:
+            async with self._cond:
+                self._reserved -= 1
+                self._cond.notify()
+            raise
+        self._create_ms.observe((time.perf_counter() - start) * 1000)
+        self._created.inc()
+
+        async with self._cond:
+            self._reserved -= 1
+            self._threads[thread.id] = ThreadInfo(thread.id, key)
+            self._leased.add(thread.id)
+        return thread.id
+
+    async def release(self, thread_id: str, reusable: bool = True) -> None:
+        """Возвращает тред в пул или удаляет его (после max_runs запусков или если reusable=False)"""
+        async with self._cond:
+            self._leased.discard(thread_id)
+            info = self._threads.get(thread_id)
+            if info is not None:
+                info.runs += 1
+                info.last_used = time.monotonic()
+                if reusable and info.runs < self.max_runs:
+                    self._idle.setdefault(info.key, []).append(thread_id)
+                else:
+                    self._discard(thread_id)
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def lease(self, key: Optional[Hashable] = None):
+        """Тред на время блока; при исключении тред не возвращается в пул"""
+        lease = ThreadLease(await self.acquire(key))
+        try:
+            yield lease
+        except BaseException:
+            lease.reusable = False
+            raise
+        finally:
+            await asyncio.shield(self.release(lease.thread_id, lease.reusable))
+
+    async def close(self) -> None:
+        """Удаляет свободные треды и дожидается фоновых удалений"""
+        async with self._cond:
+            for thread_ids in list(self._idle.values()):
+                for thread_id in list(thread_ids):
+                    self._discard(thread_id)
+        if self._deletes:
+            await asyncio.gather(*self._deletes, return_exceptions=True)
+
+    def _pop_idle(self, key: Optional[Hashable]) -> Optional[str]:
+        thread_ids = self._idle.get(key)
+        if not thread_ids:
+            return None
+        thread_id = thread_ids.pop()
+        if not thread_ids:
+            del self._idle[key]
+        return thread_id
+
+    def _expire_idle(self) -> None:
+        deadline = time.monotonic() - self.idle_ttl
+        for thread_ids in list(self._idle.values()):
+            for thread_id in list(thread_ids):
+                if self._threads[thread_id].last_used < deadline:
+                    self._discard(thread_id)
+
+    def _evict_oldest_idle(self) -> bool:
+        idle = [self._threads[thread_id] for thread_ids in self._idle.values() for thread_id in thread_ids]
+        if not idle:
+            return False
+        self._discard(min(idle, key=lambda info: info.last_used).thread_id)
+        return True
+
+    def _discard(self, thread_id: str) -> None:
+        """Убирает тред из пула и удаляет его на стороне OpenAI в фоне"""
+        info = self._threads.pop(thread_id)
+        thread_ids = self._idle.get(info.key)
+        if thread_ids and thread_id in thread_ids:
+            thread_ids.remove(thread_id)
+            if not thread_ids:
+                del self._idle[info.key]
+        task = asyncio.create_task(self._delete(thread_id))
+        self._deletes.add(task)
+        task.add_done_callback(self._deletes.discard)
+
+    async def _delete(self, thread_id: str) -> None:
+        start = time.perf_counter()
+        try:
+            await self.client.beta.threads.delete(thread_id)
+            self._deleted.inc()
+        except Exception as e:
+            self._delete_errors.inc()
+            logger.warning(f"Не удалось удалить тред ассистента {thread_id}: {e}")
+        finally:
+            self._delete_ms.observe((time.perf_counter() - start) * 1000)
@@ -0,0 +1,163 @@
+"""
+Загрузка каталога: разбор названий SKU в структурированные поля и снимок каталога
+
+Поля считаются один раз при загрузке и хранятся в parts_catalog, чтобы
+поиск, ранжирование и Excel не разбирали названия регулярками на каждый
+запрос. Снимок - сжатый колоночный JSON для быстрого старта без Supabase.
+"""
+
+import gzip
+import json
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from services.local_search import normalize_str
+from shared.size_key import parse_size, size_keys_from_text
+
+logger = logging.getLogger(__name__)
+
+# Поля, вычисляемые при загрузке (колонки parts_catalog)
+DERIVED_FIELDS = ('diameter', 'length', 'size_keys', 'standard', 'strength_class', 'coating', 'name_normalized')
+
+# Колонки снимка каталога
+SNAPSHOT_COLUMNS = ('sku', 'name', 'type', 'pack_size', 'unit') + DERIVED_FIELDS
+SNAPSHOT_FORMAT = 1
+
+_DIN_RE = re.compile(r'DIN\s*(\d+)', re.IGNORECASE)
+_OTHER_STANDARD_RE = re.compile(r'(ГОСТ|ISO|EN)\s*(\d+)', re.IGNORECASE)
+_STRENGTH_RE = re.compile(r'кл\.пр\.(\d+\.\d+)', re.IGNORECASE)
+_STAINLESS_STRENGTH_RE = re.compile(r'([A-Z]\d+-\d+)')
+
+# Покрытие по ключевым словам названия (первое совпадение)
+_COATINGS = (
+    (re.compile(r'желт\w*\s+цинк|цинк\w*\s+желт|желт\.'), 'цинк желтый'),
+    (re.compile(r'оцинк|цинк'), 'цинк'),
+    (re.compile(r'нерж'), 'нержавеющая сталь'),
+    (re.compile(r'латун'), 'латунь'),
+    (re.compile(r'фосфат'), 'фосфат'),
+    (re.compile(r'\bral\b'), 'RAL'),
+)
+
+
+def extract_standard(name: Optional[str]) -> str:
+    """Стандарт из названия (DIN 933, ГОСТ 7798 и т.д.)"""
+    if not name:
+        return ""
+    din_match = _DIN_RE.search(name)
+    if din_match:
+        return f"DIN {din_match.group(1)}"
+    other_standards = _OTHER_STANDARD_RE.findall(name)
+    if other_standards:
+        return f"{other_standards[0][0]} {other_standards[0][1]}"
+    return ""
+
+
+def extract_strength_class(name: Optional[str]) -> str:
+    """Класс прочности из названия (кл.пр.8.8, A2-70 и т.д.)"""
+    if not name:
+        return ""
+    strength_match = _STRENGTH_RE.search(name)
+    if strength_match:
+        return f"кл.пр.{strength_match.group(1)}"
+    other_strength = _STAINLESS_STRENGTH_RE.search(name)
+    if other_strength:
+        return other_strength.group(1)
+    return ""
+
+
+def extract_coating(name: Optional[str]) -> str:
+    """Покрытие или материал из названия ("цинк", "цинк желтый", ...)"""
+    name = (name or '').lower()
+    for pattern, coating in _COATINGS:
+        if pattern.search(name):
+            return coating
+    return ""
+
+
+def parse_catalog_fields(name: Optional[str]) -> Dict[str, Any]:
+    """Структурированные поля позиции по ее названию"""
+    diameter, length = parse_size(name)
+    return {
+        'diameter': diameter,
+        'length': length,
+        'size_keys': size_keys_from_text(name),
+        'standard': extract_standard(name),
+        'strength_class': extract_strength_class(name),
+        'coating': extract_coating(name),
+        'name_normalized': normalize_str(name),
+    }
+
+
+def prepare_catalog_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Строка parts_catalog: исходные поля SKU и вычисленные поля"""
+    prepared = {
+        'sku': str(row.get('sku', '')),
+        'name': row.get('name', '') or '',
+        'type': row.get('type') or row.get('name', '') or '',
+        'pack_size': row.get('pack_size'),
+        'unit': row.get('unit') or 'шт',
+    }
+    prepared.update(parse_catalog_fields(prepared['name']))
+    return prepared
+
+
+def prepare_catalog(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Готовит каталог к загрузке; повторяющиеся SKU схлопываются (последний побеждает)"""
+    prepared: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        item = prepare_catalog_row(row)
+        if item['sku']:
+            prepared[item['sku']] = item
+    return list(prepared.values())
+
+
+def stale_catalog_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Пересчитанные строки parts_catalog, у которых вычисленные поля расходятся с названием"""
+    stale = []
+    for row in rows:
+        prepared = prepare_catalog_row(row)
+        if any(row.get(field) != prepared[field] for field in DERIVED_FIELDS):
+            stale.append(prepared)
+    return stale
+
+
+def write_snapshot(rows: List[Dict[str, Any]], path: str, version: Any = None) -> None:
+    """Пишет снимок каталога: gzip JSON по колонкам"""
+    snapshot = {
+        'format': SNAPSHOT_FORMAT,
+        'version': version,
+        'count': len(rows),
+        'columns': {column: [row.get(column) for row in rows] for column in SNAPSHOT_COLUMNS},
+    }
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    logger.info(f"Снимок каталога записан: {path} ({len(rows)} позиций)")
+
+
+def read_snapshot_columns(path: str) -> Dict[str, Any]:
+    """Читает снимок каталога как есть (колонки и метаданные)"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    if snapshot.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"Неподдерживаемый формат снимка каталога: {snapshot.get('format')}")
+    return snapshot
+
+
+def read_snapshot(path: str) -> List[Dict[str, Any]]:
+    """Читает снимок каталога как список строк parts_catalog"""
+    columns = read_snapshot_columns(path)['columns']
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+
+
+def upload_catalog(client, rows: List[Dict[str, Any]], table: str = 'parts_catalog',
+                   batch_size: int = 500) -> int:
+    """Загружает строки в parts_catalog пачками (upsert по sku)"""
+    uploaded = 0
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        client.table(table).upsert(chunk, on_conflict='sku').execute()
+        uploaded += len(chunk)
+        logger.info(f"Загружено {uploaded}/{len(rows)} позиций")
+    return uploaded
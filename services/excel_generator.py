@@ -10,6 +10,7 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from config import MAX_EXCEL_ROWS
+from services.catalog_ingest import extract_standard, extract_strength_class
 
 logger = logging.getLogger(__name__)
 
@@ -180,12 +181,12 @@ class ExcelGenerator:
             unit = item.get('unit', 'шт')
             self.worksheet.cell(row=row, column=15, value=unit)
             
-            # Стандарт
-            standard = self._extract_standard(name)
+            # Стандарт (посчитан при загрузке каталога; для старых строк разбираем название)
+            standard = item.get('standard') or self._extract_standard(name)
             self.worksheet.cell(row=row, column=16, value=standard)
             
             # Класс прочности
-            strength_class = self._extract_strength_class(name)
+            strength_class = item.get('strength_class') or self._extract_strength_class(name)
             self.worksheet.cell(row=row, column=17, value=strength_class)
             
             # Статус
@@ -296,39 +297,11 @@ class ExcelGenerator:
 
     def _extract_standard(self, name: str) -> str:
         """Извлекает стандарт из названия (DIN 933, DIN 603 и т.д.)"""
-        if not name:
-            return ""
-        
-        import re
-        # Ищем DIN стандарты
-        din_match = re.search(r'DIN\s*(\d+)', name, re.IGNORECASE)
-        if din_match:
-            return f"DIN {din_match.group(1)}"
-        
-        # Ищем другие стандарты
-        other_standards = re.findall(r'(ГОСТ|ISO|EN)\s*(\d+)', name, re.IGNORECASE)
-        if other_standards:
-            return f"{other_standards[0][0]} {other_standards[0][1]}"
-        
-        return ""
+        return extract_standard(name)
 
     def _extract_strength_class(self, name: str) -> str:
         """Извлекает класс прочности из названия (кл.пр.8.8, A2-70 и т.д.)"""
-        if not name:
-            return ""
-        
-        import re
-        # Ищем класс прочности (кл.пр.8.8, кл.пр.10.9)
-        strength_match = re.search(r'кл\.пр\.(\d+\.\d+)', name, re.IGNORECASE)
-        if strength_match:
-            return f"кл.пр.{strength_match.group(1)}"
-        
-        # Ищем другие обозначения прочности (A2-70, A4-80)
-        other_strength = re.search(r'([A-Z]\d+-\d+)', name)
-        if other_strength:
-            return other_strength.group(1)
-        
-        return ""
+        return extract_strength_class(name)
 
     async def generate_search_results_excel(self, search_results: list, user_intent: dict, original_query: str) -> str:
         """Генерирует Excel файл с результатами поиска"""
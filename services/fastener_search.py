@@ -0,0 +1,94 @@
+"""
+Клиент batch-контракта Edge Function fastener-search
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.http import get_http_session
+
+logger = logging.getLogger(__name__)
+
+FASTENER_SEARCH_PATH = '/functions/v1/fastener-search'
+
+# Максимум позиций в одном запросе (MAX_BATCH_SIZE в index.ts)
+MAX_BATCH_SIZE = 50
+
+
+class BatchSearchError(RuntimeError):
+    """Edge Function не поддерживает batch-контракт или вернула ошибку"""
+
+
+async def fastener_search_batch(supabase_url: str, supabase_key: str,
+                                queries: List[Tuple[str, Dict[str, Any]]],
+                                search_cache=None,
+                                batch_size: int = MAX_BATCH_SIZE) -> List[Optional[List[Dict]]]:
+    """Ищет несколько позиций минимальным числом HTTP-запросов
+
+    Возвращает списки результатов в порядке queries. None означает, что
+    позиция не найдена в кэше и не была разрешена batch-вызовом (ошибка
+    позиции или всего запроса) - вызывающий код повторяет ее поштучно.
+    """
+    results: List[Optional[List[Dict]]] = [None] * len(queries)
+
+    pending = []
+    for position, (search_query, user_intent) in enumerate(queries):
+        if search_cache is not None:
+            cached = await search_cache.get(search_query, user_intent)
+            if cached is not None:
+                results[position] = cached
+                continue
+        pending.append(position)
+
+    if not pending:
+        return results
+
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    logger.info(f"Batch-поиск: {len(queries)} позиций, {len(pending)} к Edge Function в {len(chunks)} запрос(ах)")
+
+    url = f"{supabase_url}{FASTENER_SEARCH_PATH}"
+    headers = {
+        "Authorization": f"Bearer {supabase_key}",
+        "Content-Type": "application/json"
+    }
+
+    async def run_chunk(chunk: List[int]) -> None:
+        payload = {
+            'queries': [
+                {'search_query': queries[position][0], 'user_intent': queries[position][1]}
+                for position in chunk
+            ]
+        }
+        try:
+            batch_results = await _post_batch(url, headers, payload, len(chunk))
+        except Exception as e:
+            logger.error(f"Batch-вызов Edge Function не удался ({len(chunk)} позиций): {e}")
+            return
+
+        for position, entry in zip(chunk, batch_results):
+            if not isinstance(entry, dict) or 'error' in entry:
+                logger.warning(f"Batch-позиция '{queries[position][0]}' вернула ошибку: {entry}")
+                continue
+            results[position] = entry.get('results', [])
+            if search_cache is not None:
+                await search_cache.set(queries[position][0], queries[position][1], results[position])
+
+    await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+    return results
+
+
+async def _post_batch(url: str, headers: Dict[str, str], payload: Dict, expected: int) -> List[Any]:
+    session = await get_http_session()
+    async with session.post(url, json=payload, headers=headers) as response:
+        if response.status != 200:
+            error_text = await response.text()
+            raise BatchSearchError(f"Edge Function error {response.status}: {error_text}")
+        data = await response.json()
+
+    batch_results = data.get('batch_results')
+    # Старая версия функции отвечает на batch-запрос одиночным {"results": [...]}
+    if not isinstance(batch_results, list) or len(batch_results) != expected:
+        raise BatchSearchError("Edge Function не поддерживает batch-контракт")
+    return batch_results
@@ -0,0 +1,163 @@
+"""
+Постоянный кэш решений GPT-валидации (SQLite)
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Ключей в одном SELECT ... IN (лимит параметров SQLite - 999)
+LOOKUP_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS gpt_decisions (
+    key TEXT PRIMARY KEY,
+    decision TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    reason TEXT,
+    chosen_ku TEXT,
+    catalog_version TEXT,
+    created_at REAL NOT NULL
+)
+"""
+
+
+def make_decision_key(normalized_text: str, params: Optional[Dict], kus: Iterable[str]) -> str:
+    """Ключ кэша: хэш нормализованной строки, параметров и отсортированных КУ кандидатов"""
+    payload = json.dumps(
+        [normalized_text or '', params or {}, sorted(str(ku) for ku in kus)],
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class GPTDecisionCache:
+    """Кэш решений GPT с TTL и инвалидацией при изменении каталога
+
+    Запись действительна, пока не истек TTL и версия каталога, с которой
+    она была получена, совпадает с текущей. При смене версии устаревшие
+    записи удаляются.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, metrics_prefix: str = 'gpt_cache'):
+        self.path = path
+        self.ttl = ttl
+        self.catalog_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+        metrics = get_metrics()
+        self._hits = metrics.counter(f'{metrics_prefix}.hits')
+        self._misses = metrics.counter(f'{metrics_prefix}.misses')
+        metrics.gauge(f'{metrics_prefix}.hit_rate', lambda: round(self.hit_rate, 4))
+
+    @property
+    def hit_rate(self) -> float:
+        total = self._hits.value + self._misses.value
+        return self._hits.value / total if total else 0.0
+
+    def set_catalog_version(self, version: Any) -> None:
+        """Запоминает текущую версию каталога и удаляет записи других версий"""
+        version = None if version is None else str(version)
+        if version == self.catalog_version:
+            return
+        self.catalog_version = version
+        if version is None:
+            return
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM gpt_decisions WHERE catalog_version IS NOT ?", (version,)
+            ).rowcount
+            self._conn.commit()
+        if deleted:
+            logger.info(f"GPT decision cache: dropped {deleted} entries from previous catalog version")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Возвращает сохраненное решение или None"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Возвращает сохраненные решения по ключам (ключи без решения пропускаются)"""
+        keys = list(dict.fromkeys(keys))
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                rows += self._conn.execute(
+                    "SELECT key, decision, confidence, reason, chosen_ku, catalog_version, created_at "
+                    f"FROM gpt_decisions WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+
+        found = {}
+        now = time.time()
+        for key, decision, confidence, reason, chosen_ku, catalog_version, created_at in rows:
+            if now - created_at < self.ttl and catalog_version == self.catalog_version:
+                found[key] = {
+                    'decision': decision,
+                    'confidence': confidence,
+                    'reason': reason,
+                    'chosen_ku': chosen_ku,
+                }
+        self._hits.inc(len(found))
+        self._misses.inc(len(keys) - len(found))
+        return found
+
+    def put(self, key: str, decision: str, confidence: float, reason: str,
+            chosen_ku: Optional[str] = None) -> None:
+        self.put_many([(key, decision, confidence, reason, chosen_ku)])
+
+    def put_many(self, entries: Iterable[Tuple[str, str, float, str, Optional[str]]]) -> None:
+        """Сохраняет решения (key, decision, confidence, reason, chosen_ku) одной транзакцией"""
+        now = time.time()
+        rows = [(*entry, self.catalog_version, now) for entry in entries]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO gpt_decisions VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Удаляет записи с истекшим TTL"""
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM gpt_decisions WHERE created_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM gpt_decisions")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# Глобальный кэш решений GPT
+_gpt_decision_cache = None
+
+def get_gpt_decision_cache() -> Optional[GPTDecisionCache]:
+    """Получает глобальный кэш решений GPT (None, если кэш отключен)"""
+    global _gpt_decision_cache
+    if _gpt_decision_cache is None:
+        from config import GPT_CACHE_PATH, GPT_CACHE_TTL
+        if not GPT_CACHE_PATH:
+            return None
+        try:
+            _gpt_decision_cache = GPTDecisionCache(GPT_CACHE_PATH, ttl=GPT_CACHE_TTL)
+        except sqlite3.Error as e:
+            logger.warning(f"GPT decision cache disabled: {e}")
+            return None
+    return _gpt_decision_cache
@@ -3,6 +3,7 @@ GPT validation service for uncertain matches
 Based on the comprehensive specification
 """
 
+import asyncio
 import logging
 import json
 from typing import List, Dict, Optional, Tuple
@@ -10,9 +11,21 @@ from dataclasses import dataclass
 from pipeline.matching_engine import MatchCandidate
 from pipeline.text_parser import ParsedLine
 from services.openai_service import OpenAIService
+from services.gpt_decision_cache import GPTDecisionCache, make_decision_key, get_gpt_decision_cache
 
 logger = logging.getLogger(__name__)
 
+# Batch splitting limits: lines per prompt and estimated prompt tokens
+DEFAULT_BATCH_MAX_LINES = 20
+DEFAULT_BATCH_TOKEN_BUDGET = 6000
+
+# Response tokens reserved per line in a batch
+BATCH_RESPONSE_TOKENS_PER_LINE = 150
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate for mixed Cyrillic/Latin text (~3 chars per token)"""
+    return len(text) // 3 + 1
+
 @dataclass
 class GPTValidationResult:
     """GPT validation result"""
@@ -24,9 +37,19 @@ class GPTValidationResult:
 class GPTValidator:
     """GPT validation service for uncertain matches"""
     
-    def __init__(self):
+    def __init__(self, decision_cache: Optional[GPTDecisionCache] = None,
+                 batch_max_lines: int = DEFAULT_BATCH_MAX_LINES,
+                 batch_token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET):
         self.openai_service = OpenAIService()
         self.accept_confidence_threshold = 0.8
+        self.decision_cache = decision_cache
+        self.batch_max_lines = batch_max_lines
+        self.batch_token_budget = batch_token_budget
+    
+    def set_catalog_version(self, version) -> None:
+        """Invalidate cached decisions made against another catalog version"""
+        if self.decision_cache is not None:
+            self.decision_cache.set_catalog_version(version)
     
     async def validate_candidates(self, parsed_line: ParsedLine, 
                                 candidates: List[MatchCandidate]) -> GPTValidationResult:
@@ -39,6 +62,10 @@ class GPTValidator:
                     reason='No candidates provided'
                 )
 
+            cache_key, cached = await self._lookup_cache(parsed_line, candidates)
+            if cached is not None:
+                return cached
+
             logger.info(
                 f"Sending line '{parsed_line.raw_text}' with {len(candidates)} candidates to GPT"
             )
@@ -54,8 +81,12 @@ class GPTValidator:
                 max_tokens=500
             )
             
-            # Parse response
-            result = self._parse_gpt_response(response)
+            # Parse response; only well-formed answers are cached
+            try:
+                result = self._decode_gpt_response(response)
+                await self._store_cache([(cache_key, result)])
+            except Exception:
+                result = self._parse_gpt_response(response)
             
             logger.info(
                 f"GPT validation result: {result.decision} (confidence: {result.confidence}) reason: {result.reason}"
@@ -71,11 +102,157 @@ class GPTValidator:
                 reason=f'Error: {str(e)}'
             )
     
-    def _build_validation_prompt(self, parsed_line: ParsedLine, 
-                               candidates: List[MatchCandidate]) -> str:
-        """Build validation prompt for GPT"""
+    def _cache_key(self, parsed_line: ParsedLine, candidates: List[MatchCandidate]) -> Optional[str]:
+        """Decision cache key of a line; None when caching is disabled"""
+        if self.decision_cache is None:
+            return None
+        return make_decision_key(
+            parsed_line.normalized_text,
+            parsed_line.extracted_params,
+            (candidate.ku for candidate in candidates)
+        )
+    
+    async def _lookup_cache(self, parsed_line: ParsedLine,
+                            candidates: List[MatchCandidate]) -> Tuple[Optional[str], Optional[GPTValidationResult]]:
+        """Return (cache key, cached result); both None when caching is disabled"""
+        cache_key = self._cache_key(parsed_line, candidates)
+        if cache_key is None:
+            return None, None
+        cached = await self._read_cache([cache_key])
+        return cache_key, self._cached_result(parsed_line, cached.get(cache_key))
+    
+    async def _read_cache(self, keys: List[str]) -> Dict[str, Dict]:
+        """Look up cached decisions in a worker thread; a failed read counts as a miss"""
+        try:
+            return await asyncio.to_thread(self.decision_cache.get_many, keys)
+        except Exception as e:
+            logger.error(f"GPT decision cache read failed, treating as miss: {e}")
+            return {}
+    
+    def _cached_result(self, parsed_line: ParsedLine, cached: Optional[Dict]) -> Optional[GPTValidationResult]:
+        if cached is None:
+            return None
+        logger.info(f"GPT decision cache hit for line '{parsed_line.raw_text}': {cached['decision']}")
+        return GPTValidationResult(**cached)
+    
+    async def _store_cache(self, entries: List[Tuple[Optional[str], GPTValidationResult]]) -> None:
+        """Save (cache key, result) pairs in one transaction, in a worker thread"""
+        rows = [
+            (cache_key, result.decision, result.confidence, result.reason, result.chosen_ku)
+            for cache_key, result in entries if cache_key is not None
+        ]
+        if not rows:
+            return
+        try:
+            await asyncio.to_thread(self.decision_cache.put_many, rows)
+        except Exception as e:
+            # The decision itself is still valid; only caching it failed
+            logger.error(f"GPT decision cache write failed for {len(rows)} entries: {e}")
+    
+    async def validate_batch(self, lines: List[Tuple[ParsedLine, List[MatchCandidate]]]) -> List[GPTValidationResult]:
+        """Validate many lines with as few GPT calls as possible
         
-        # Format candidates for prompt
+        Lines are packed into prompts bounded by batch_max_lines and
+        batch_token_budget; prompts are sent concurrently. Lines missing from
+        a batch answer (or with a KU outside their own candidates) fall back
+        to validate_candidates. Results are returned in input order.
+        """
+        results: List[Optional[GPTValidationResult]] = [None] * len(lines)
+        pending = []  # (position, cache key)
+        
+        keys = {}
+        for position, (parsed_line, candidates) in enumerate(lines):
+            if not candidates:
+                results[position] = GPTValidationResult(
+                    decision='unsure',
+                    confidence=0.0,
+                    reason='No candidates provided'
+                )
+                continue
+            keys[position] = self._cache_key(parsed_line, candidates)
+        
+        # One SQLite lookup for the whole batch, off the event loop
+        cached = {}
+        if self.decision_cache is not None and keys:
+            cached = await self._read_cache(list(keys.values()))
+        for position, cache_key in keys.items():
+            result = self._cached_result(lines[position][0], cached.get(cache_key))
+            if result is not None:
+                results[position] = result
+            else:
+                pending.append((position, cache_key))
+        
+        batches = self._split_batches(lines, pending)
+        if batches:
+            logger.info(f"Sending {len(pending)} lines to GPT in {len(batches)} batch(es)")
+        
+        batch_results = await asyncio.gather(*(self._validate_chunk(lines, batch) for batch in batches))
+        
+        fallback = []
+        decided = []
+        for batch, decoded in zip(batches, batch_results):
+            for (position, cache_key), result in zip(batch, decoded):
+                if result is None:
+                    fallback.append(position)
+                else:
+                    decided.append((cache_key, result))
+                    results[position] = result
+        await self._store_cache(decided)
+        
+        if fallback:
+            logger.info(f"Per-line GPT validation for {len(fallback)} line(s)")
+            fallback_results = await asyncio.gather(*(
+                self.validate_candidates(*lines[position]) for position in fallback
+            ))
+            for position, result in zip(fallback, fallback_results):
+                results[position] = result
+        
+        return results
+    
+    def _split_batches(self, lines: List[Tuple[ParsedLine, List[MatchCandidate]]],
+                       pending: List[Tuple[int, Optional[str]]]) -> List[List[Tuple[int, Optional[str]]]]:
+        """Split pending lines into batches within the line and token budgets"""
+        header_tokens = estimate_tokens(self._build_batch_prompt([]))
+        batches = []
+        current, current_tokens = [], header_tokens
+        
+        for entry in pending:
+            parsed_line, candidates = lines[entry[0]]
+            line_tokens = (estimate_tokens(self._format_batch_line(1, parsed_line, candidates))
+                           + BATCH_RESPONSE_TOKENS_PER_LINE)
+            if current and (len(current) >= self.batch_max_lines
+                            or current_tokens + line_tokens > self.batch_token_budget):
+                batches.append(current)
+                current, current_tokens = [], header_tokens
+            current.append(entry)
+            current_tokens += line_tokens
+        
+        if current:
+            batches.append(current)
+        return batches
+    
+    async def _validate_chunk(self, lines: List[Tuple[ParsedLine, List[MatchCandidate]]],
+                              batch: List[Tuple[int, Optional[str]]]) -> List[Optional[GPTValidationResult]]:
+        """Validate one batch; None marks lines that need per-line fallback"""
+        chunk = [lines[position] for position, _ in batch]
+        if len(chunk) == 1:
+            # A single line goes through the regular single-line prompt
+            return [None]
+        
+        try:
+            response = await self.openai_service.call_gpt(
+                prompt=self._build_batch_prompt(chunk),
+                model="gpt-4o-mini",
+                temperature=0.1,
+                max_tokens=BATCH_RESPONSE_TOKENS_PER_LINE * len(chunk)
+            )
+            return self._parse_batch_response(response, chunk)
+        except Exception as e:
+            logger.error(f"Error in batched GPT validation: {e}")
+            return [None] * len(chunk)
+    
+    def _format_candidates(self, candidates: List[MatchCandidate]) -> str:
+        """Format candidates for prompt"""
         candidates_text = []
         for i, candidate in enumerate(candidates, 1):
             candidate_info = f"{i}. KU: {candidate.ku}\n"
@@ -86,7 +263,93 @@ class GPTValidator:
             candidate_info += f"   Source: {candidate.source}\n"
             candidates_text.append(candidate_info)
         
-        candidates_str = "\n".join(candidates_text)
+        return "\n".join(candidates_text)
+    
+    def _format_batch_line(self, number: int, parsed_line: ParsedLine,
+                           candidates: List[MatchCandidate]) -> str:
+        """Format one line of a batch prompt"""
+        return f"""
+=== СТРОКА {number} ===
+ЗАПРОС ПОЛЬЗОВАТЕЛЯ: {parsed_line.raw_text}
+НОРМАЛИЗОВАННЫЙ ЗАПРОС: {parsed_line.normalized_text}
+ИЗВЛЕЧЕННЫЕ ПАРАМЕТРЫ: {json.dumps(parsed_line.extracted_params or {}, ensure_ascii=False)}
+КАНДИДАТЫ:
+{self._format_candidates(candidates)}"""
+    
+    def _build_batch_prompt(self, chunk: List[Tuple[ParsedLine, List[MatchCandidate]]]) -> str:
+        """Build a validation prompt covering several lines"""
+        lines_str = "\n".join(
+            self._format_batch_line(number, parsed_line, candidates)
+            for number, (parsed_line, candidates) in enumerate(chunk, 1)
+        )
+        
+        return f"""
+Вы - эксперт по крепежным изделиям. Для каждой строки запроса пользователя нужно выбрать наиболее подходящий вариант из списка кандидатов этой строки.
+{lines_str}
+
+ИНСТРУКЦИИ:
+1. Внимательно проанализируйте каждую строку запроса и каждый её кандидат
+2. Учитывайте тип изделия (болт/винт/анкер/гайка и т.д.)
+3. Учитывайте диаметр и длину
+4. Учитывайте материал и покрытие
+5. Учитывайте стандарты (DIN, ГОСТ, ISO)
+6. Учитывайте специальные признаки (с крюком, с насечками, класс прочности и т.д.)
+7. НЕ придумывайте значения, которых нет в данных
+8. Выбирайте KU только из кандидатов той же строки
+
+ОТВЕТ ДОЛЖЕН БЫТЬ JSON-МАССИВОМ С ОДНИМ ОБЪЕКТОМ НА КАЖДУЮ СТРОКУ:
+[
+    {{
+        "line": <номер_строки>,
+        "decision": "<KU_код_выбранного_кандидата_или_unsure>",
+        "confidence": <число_от_0_до_1>,
+        "reason": "Объяснение выбора"
+    }}
+]
+
+Если ни один кандидат строки не подходит достаточно хорошо, используйте "unsure" в качестве решения.
+"""
+    
+    def _parse_batch_response(self, response: str,
+                              chunk: List[Tuple[ParsedLine, List[MatchCandidate]]]) -> List[Optional[GPTValidationResult]]:
+        """Parse a JSON array answer; lines without a valid entry are None"""
+        results: List[Optional[GPTValidationResult]] = [None] * len(chunk)
+        try:
+            json_start = response.find('[')
+            json_end = response.rfind(']') + 1
+            if json_start == -1 or json_end == 0:
+                raise ValueError("No JSON array found in response")
+            entries = json.loads(response[json_start:json_end])
+            if not isinstance(entries, list):
+                raise ValueError("Response is not a JSON array")
+        except Exception as e:
+            logger.error(f"Error parsing batched GPT response: {e}")
+            logger.error(f"Response was: {response}")
+            return results
+        
+        for entry in entries:
+            try:
+                position = int(entry['line']) - 1
+                if not 0 <= position < len(chunk) or results[position] is not None:
+                    continue
+                result = self._decode_gpt_response(json.dumps(entry, ensure_ascii=False))
+            except Exception as e:
+                logger.warning(f"Skipping malformed batch entry {entry!r}: {e}")
+                continue
+            
+            kus = {candidate.ku for candidate in chunk[position][1]}
+            if result.chosen_ku is not None and result.chosen_ku not in kus:
+                logger.warning(f"Batch answer for line {position + 1} chose unknown KU {result.chosen_ku}")
+                continue
+            results[position] = result
+        
+        return results
+    
+    def _build_validation_prompt(self, parsed_line: ParsedLine, 
+                               candidates: List[MatchCandidate]) -> str:
+        """Build validation prompt for GPT"""
+        
+        candidates_str = self._format_candidates(candidates)
         
         prompt = f"""
 Вы - эксперт по крепежным изделиям. Вам нужно выбрать наиболее подходящий вариант из списка кандидатов для запроса пользователя.
@@ -124,37 +387,41 @@ class GPTValidator:
         
         return prompt
     
+    def _decode_gpt_response(self, response: str) -> GPTValidationResult:
+        """Decode GPT response JSON, raising on malformed output"""
+        # Try to extract JSON from response
+        json_start = response.find('{')
+        json_end = response.rfind('}') + 1
+        
+        if json_start == -1 or json_end == 0:
+            raise ValueError("No JSON found in response")
+        
+        json_str = response[json_start:json_end]
+        data = json.loads(json_str)
+        
+        decision = data.get('decision', 'unsure')
+        confidence = float(data.get('confidence', 0.0))
+        reason = data.get('reason', 'No reason provided')
+        
+        # Validate confidence range
+        confidence = max(0.0, min(1.0, confidence))
+        
+        # Extract chosen KU if decision is not 'unsure'
+        chosen_ku = None
+        if decision != 'unsure':
+            chosen_ku = decision
+        
+        return GPTValidationResult(
+            decision=decision,
+            confidence=confidence,
+            reason=reason,
+            chosen_ku=chosen_ku
+        )
+    
     def _parse_gpt_response(self, response: str) -> GPTValidationResult:
         """Parse GPT response"""
         try:
-            # Try to extract JSON from response
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            
-            if json_start == -1 or json_end == 0:
-                raise ValueError("No JSON found in response")
-            
-            json_str = response[json_start:json_end]
-            data = json.loads(json_str)
-            
-            decision = data.get('decision', 'unsure')
-            confidence = float(data.get('confidence', 0.0))
-            reason = data.get('reason', 'No reason provided')
-            
-            # Validate confidence range
-            confidence = max(0.0, min(1.0, confidence))
-            
-            # Extract chosen KU if decision is not 'unsure'
-            chosen_ku = None
-            if decision != 'unsure':
-                chosen_ku = decision
-            
-            return GPTValidationResult(
-                decision=decision,
-                confidence=confidence,
-                reason=reason,
-                chosen_ku=chosen_ku
-            )
+            return self._decode_gpt_response(response)
             
         except Exception as e:
             logger.error(f"Error parsing GPT response: {e}")
@@ -180,6 +447,15 @@ class GPTValidator:
             return result.chosen_ku, 'ok', 'gpt'
         else:
             return None, 'needs_review', 'gpt'
+    
+    async def validate_lines(self, lines: List[Tuple[ParsedLine, List[MatchCandidate]]]) -> List[Tuple[Optional[str], str, str]]:
+        """Batched counterpart of validate_single_line"""
+        results = await self.validate_batch(lines)
+        return [
+            (result.chosen_ku, 'ok', 'gpt') if self.should_accept_gpt_decision(result)
+            else (None, 'needs_review', 'gpt')
+            for result in results
+        ]
 
 # Global GPT validator instance
 _gpt_validator = None
@@ -188,5 +464,5 @@ def get_gpt_validator() -> GPTValidator:
     """Get global GPT validator instance"""
     global _gpt_validator
     if _gpt_validator is None:
-        _gpt_validator = GPTValidator()
+        _gpt_validator = GPTValidator(get_gpt_decision_cache())
     return _gpt_validator
@@ -0,0 +1,386 @@
+"""
+Локальный поиск по каталогу в памяти: порт ранжирования Edge Function fastener-search
+
+Каскад шагов 1-5 и расчет probability_percent повторяют
+supabase/functions/fastener-search/index.ts. Полнотекстовый поиск по типу
+(textSearch по search_vector) приближен поиском по основам слов названия,
+размеры сравниваются по каноническим ключам (shared/size_key.py).
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from shared.size_key import item_size_keys, size_key
+
+logger = logging.getLogger(__name__)
+
+# Режимы LOCAL_SEARCH_MODE
+MODE_OFF = 'off'
+MODE_PRIMARY = 'primary'
+MODE_FALLBACK = 'fallback'
+
+# Максимум результатов одного шага каскада (limit(20) в index.ts)
+STEP_LIMIT = 20
+
+_X_RE = re.compile(r'[×хx]')
+_SPACES_RE = re.compile(r'\s+')
+_DIN_RE = re.compile(r'din\s*([0-9]+)')
+_ZINC_RE = re.compile(r'оцинк[а-я]*')
+_WORD_RE = re.compile(r'[0-9a-zа-яё]+')
+
+# Окончания, отбрасываемые при грубом стемминге (russian config в Postgres)
+_ENDINGS = ('ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ов', 'ев', 'ей', 'ой', 'ый', 'ий', 'ая', 'яя',
+            'ое', 'ее', 'ые', 'ие', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях',
+            'а', 'я', 'ы', 'и', 'о', 'е', 'у', 'ю', 'ь')
+
+
+def normalize_str(s: Any) -> str:
+    """normalizeStr из index.ts"""
+    if not s:
+        return ''
+    s = _X_RE.sub('x', str(s).lower().strip())
+    s = _SPACES_RE.sub(' ', s)
+    s = _DIN_RE.sub(r'din\1', s)
+    return _ZINC_RE.sub('цинк', s)
+
+
+def build_tokens(user_intent: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Токены ранжирования (RankingTokens) из user_intent"""
+    user_intent = user_intent or {}
+
+    type_tok = normalize_str(user_intent['type']) if user_intent.get('type') else None
+
+    std_toks = []
+    if user_intent.get('standard'):
+        standard = str(user_intent['standard']).lower()
+        std_toks.append(standard)
+        if 'din' in standard:
+            std_toks.append(_SPACES_RE.sub('', standard))
+            std_toks.append(_SPACES_RE.sub(' ', standard))
+
+    size_tok = size_key(user_intent.get('diameter'), user_intent.get('length'))
+
+    coat_toks = []
+    if user_intent.get('coating'):
+        coating = str(user_intent['coating']).lower()
+        coat_toks.append(coating)
+        if 'цинк' in coating:
+            coat_toks.extend(['цинк', 'оцинк', 'оцинкованный'])
+
+    return {'type': type_tok, 'standard': std_toks, 'size': size_tok, 'coating': coat_toks}
+
+
+def _size_hit(item: Dict[str, Any], tokens: Dict[str, Any]) -> bool:
+    return tokens['size'] is not None and tokens['size'] in item_size_keys(item)
+
+
+def _normalized_name(item: Dict[str, Any]) -> str:
+    # name_normalized считается при загрузке каталога (services/catalog_ingest.py)
+    return item.get('name_normalized') or normalize_str(item.get('name'))
+
+
+def get_match_reason(item: Dict[str, Any], tokens: Dict[str, Any]) -> str:
+    n = _normalized_name(item)
+    type_tok = tokens['type']
+    size_hit = _size_hit(item, tokens)
+
+    if type_tok and type_tok in n and size_hit:
+        return 'Точное совпадение типа и размеров'
+    if type_tok and type_tok in n:
+        return 'Совпадение типа детали'
+    if any(t in n for t in tokens['standard']):
+        return 'Совпадение стандарта'
+    if size_hit:
+        return 'Совпадение размеров'
+    return 'Частичное совпадение по названию'
+
+
+def analyze_matches(item: Dict[str, Any], tokens: Dict[str, Any]) -> Dict[str, Any]:
+    """Детальный анализ совпадений (analyzeMatches из index.ts)"""
+    n = _normalized_name(item)
+    analysis = {
+        'type_match': False,
+        'standard_match': False,
+        'size_match': False,
+        'coating_match': False,
+        'matched_tokens': [],
+        'explanation': [],
+    }
+
+    type_tok = tokens['type']
+    if type_tok and type_tok in n:
+        analysis['type_match'] = True
+        analysis['matched_tokens'].append(type_tok)
+        analysis['explanation'].append(f'✅ Совпадение типа: "{type_tok}"')
+
+    matched_standards = [t for t in tokens['standard'] if t in n]
+    if matched_standards:
+        analysis['standard_match'] = True
+        analysis['matched_tokens'].extend(matched_standards)
+        analysis['explanation'].append(f'✅ Совпадение стандарта: "{", ".join(matched_standards)}"')
+
+    # Размеры сравниваются по каноническим ключам
+    if _size_hit(item, tokens):
+        analysis['size_match'] = True
+        analysis['matched_tokens'].append(tokens['size'])
+        analysis['explanation'].append(f'✅ Совпадение размеров: "{tokens["size"]}"')
+
+    matched_coatings = [t for t in tokens['coating'] if normalize_str(t) in n]
+    if matched_coatings:
+        analysis['coating_match'] = True
+        analysis['matched_tokens'].extend(matched_coatings)
+        analysis['explanation'].append(f'✅ Совпадение покрытия: "{", ".join(matched_coatings)}"')
+
+    return analysis
+
+
+def calculate_probability(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """probability_percent с весами (calculateProbability из index.ts)"""
+    weights = {'type': 25, 'standard': 40, 'size': 30, 'coating': 15}
+    type_match = analysis['type_match']
+    standard_match = analysis['standard_match']
+    size_match = analysis['size_match']
+    coating_match = analysis['coating_match']
+
+    total = 0
+    explanation = list(analysis['explanation'])
+
+    if type_match:
+        total += weights['type']
+        explanation.append(f"📊 Вклад типа: +{weights['type']}%")
+    if standard_match:
+        total += weights['standard']
+        explanation.append(f"📊 Вклад стандарта: +{weights['standard']}%")
+    if size_match:
+        total += weights['size']
+        explanation.append(f"📊 Вклад размеров: +{weights['size']}%")
+    if coating_match:
+        total += weights['coating']
+        explanation.append(f"📊 Вклад покрытия: +{weights['coating']}%")
+
+    # Бонусы за комбинации
+    if standard_match and size_match:
+        total += 15
+        explanation.append('🎯 Бонус за стандарт + размеры: +15%')
+    if type_match and size_match:
+        total += 10
+        explanation.append('🎯 Бонус за тип + размеры: +10%')
+    if type_match and standard_match and size_match:
+        total += 20
+        explanation.append('🎯 Бонус за полное совпадение: +20%')
+
+    # Ограничения
+    if standard_match and size_match:
+        total = max(total, 80)
+        if total > 80:
+            explanation.append('🔒 Минимальная вероятность для стандарт+размеры: 80%')
+    elif type_match and not size_match and not standard_match:
+        total = min(total, 40)
+        explanation.append('🔒 Максимальная вероятность для только типа: 40%')
+    elif coating_match and not type_match and not size_match and not standard_match:
+        total = min(total, 20)
+        explanation.append('🔒 Максимальная вероятность для только покрытия: 20%')
+
+    probability = max(0, min(100, round(total)))
+    explanation.append(f'📈 Итоговая вероятность: {probability}%')
+
+    return {'probability': probability, 'explanation': '\n'.join(explanation)}
+
+
+def rank_results(results: List[Dict], tokens: Dict[str, Any], search_query: str) -> List[Dict]:
+    """Ранжирование (rankResults из index.ts); сортировка устойчивая, как Array.sort"""
+    ranked = []
+    for item in results:
+        analysis = analyze_matches(item, tokens)
+        probability = calculate_probability(analysis)
+        ranked.append({
+            **item,
+            'relevance_score': probability['probability'],
+            'probability_percent': probability['probability'],
+            'match_reason': get_match_reason(item, tokens),
+            'explanation': probability['explanation'],
+            'matched_tokens': analysis['matched_tokens'],
+            'search_query': search_query,
+            'full_query': search_query,
+        })
+    ranked.sort(key=lambda r: r['probability_percent'], reverse=True)
+    return ranked
+
+
+def _stem(word: str) -> str:
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+class LocalSearchEngine:
+    """Каскадный поиск с ранжированием fastener-search по каталогу в памяти"""
+
+    def __init__(self, rows: Sequence[Mapping[str, Any]], version: Any = None,
+                 to_row: Optional[Callable[[Any], Dict[str, Any]]] = None):
+        self.rows = rows
+        self.version = version
+        # Преобразование выбранных позиций в строки ответа (для снимка каталога)
+        self.to_row = to_row
+        # Нормализованные названия и основы слов считаются один раз на каталог
+        self._names = [row.get('name_normalized') or normalize_str(row.get('name')) for row in rows]
+        self._lower_names = [(row.get('name') or '').lower() for row in rows]
+        self._stems = [frozenset(_stem(word) for word in _WORD_RE.findall(name)) for name in self._names]
+        self._size_keys = [frozenset(item_size_keys(row)) for row in rows]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _select(self, predicate) -> List[Dict[str, Any]]:
+        selected = []
+        for position, row in enumerate(self.rows):
+            if predicate(position):
+                selected.append(row)
+                if len(selected) >= STEP_LIMIT:
+                    break
+        return selected
+
+    def _has_type(self, position: int, type_stems: List[str]) -> bool:
+        stems = self._stems[position]
+        return all(any(stem.startswith(type_stem) for stem in stems) for type_stem in type_stems)
+
+    def _has_size(self, position: int, key: str) -> bool:
+        return key in self._size_keys[position]
+
+    def search(self, search_query: str, user_intent: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Поиск одной позиции: ответ в формате searchOne из index.ts"""
+        tokens = build_tokens(user_intent)
+        type_stems = [_stem(word) for word in _WORD_RE.findall(tokens['type'] or '')]
+        size_tok = tokens['size']
+
+        results: List[Dict[str, Any]] = []
+
+        # Шаг 1: тип + размеры
+        if type_stems and size_tok:
+            results = self._select(lambda p: self._has_type(p, type_stems) and self._has_size(p, size_tok))
+
+        # Шаг 2: только тип
+        if not results and type_stems:
+            results = self._select(lambda p: self._has_type(p, type_stems))
+
+        # Шаг 3: только размер
+        if not results and size_tok:
+            results = self._select(lambda p: self._has_size(p, size_tok))
+
+        # Шаг 4: стандарт (ILIKE по названию)
+        if not results and tokens['standard']:
+            results = self._select(lambda p: any(t in self._lower_names[p] for t in tokens['standard']))
+
+        # Шаг 5: покрытие (ILIKE по названию)
+        if not results and tokens['coating']:
+            results = self._select(lambda p: any(t in self._lower_names[p] for t in tokens['coating']))
+
+        if self.to_row is not None:
+            results = [self.to_row(item) for item in results]
+        ranked = rank_results(results, tokens, search_query)
+        return {
+            'results': ranked,
+            'search_metadata': {
+                'query_type': 'simple' if (user_intent or {}).get('is_simple_parsed') else 'complex',
+                'total_results': len(ranked),
+                'search_time_ms': int(time.time() * 1000),
+                'used_fallback': False,
+                'engine': 'local',
+            },
+        }
+
+
+def load_catalog_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Читает каталог из normalized_skus.jsonl"""
+    rows = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+    return rows
+
+
+def catalog_item_row(item) -> Dict[str, Any]:
+    """Строка в формате parts_catalog из позиции снимка каталога (pipeline/catalog_store.py)"""
+    row = {
+        'sku': item['sku'],
+        'name': item['name'],
+        'pack_size': item['pack_qty'],
+        'price': item['price'],
+        'unit': item['unit'],
+    }
+    row.update(item['specs_json'])
+    if item['size_keys'] is not None:
+        row['size_keys'] = list(item['size_keys'])
+    return row
+
+
+# Глобальный локальный поисковик
+_local_search_engine = None
+_checked_at: Optional[float] = None
+_load_lock: Optional[asyncio.Lock] = None
+
+async def get_local_search_engine() -> Optional[LocalSearchEngine]:
+    """Получает локальный поисковик (None, если каталог недоступен)
+
+    Каталог из Supabase берется из общего снимка кэша каталога
+    (pipeline/catalog_cache.py) и пересобирается при смене снимка, проверка
+    не чаще раза в LOCAL_SEARCH_REFRESH секунд.
+    """
+    global _local_search_engine, _checked_at, _load_lock
+    from config import LOCAL_SEARCH_SOURCE, LOCAL_SEARCH_REFRESH
+
+    def is_fresh() -> bool:
+        if _checked_at is None:
+            return False
+        if _local_search_engine is not None and LOCAL_SEARCH_SOURCE != 'supabase':
+            return True
+        return time.monotonic() - _checked_at < LOCAL_SEARCH_REFRESH
+
+    if is_fresh():
+        return _local_search_engine
+
+    if _load_lock is None:
+        _load_lock = asyncio.Lock()
+    async with _load_lock:
+        if is_fresh():
+            return _local_search_engine
+        try:
+            if LOCAL_SEARCH_SOURCE == 'supabase':
+                from pipeline.processing_pipeline import get_processing_pipeline
+                catalog = await get_processing_pipeline().catalog_cache.get()
+                if catalog and catalog.items and (_local_search_engine is None or _local_search_engine.rows is not catalog.items):
+                    # Основы слов и ключи размеров считаются в отдельном потоке
+                    _local_search_engine = await asyncio.to_thread(
+                        LocalSearchEngine, catalog.items, catalog.version, catalog_item_row
+                    )
+            elif LOCAL_SEARCH_SOURCE.endswith('.json.gz'):
+                from services.catalog_ingest import read_snapshot
+                _local_search_engine = LocalSearchEngine(read_snapshot(LOCAL_SEARCH_SOURCE))
+            else:
+                _local_search_engine = LocalSearchEngine(load_catalog_jsonl(LOCAL_SEARCH_SOURCE))
+            if _local_search_engine is not None:
+                logger.info(f"Локальный поиск: каталог {len(_local_search_engine)} позиций")
+        except Exception as e:
+            logger.error(f"Не удалось загрузить каталог для локального поиска: {e}")
+        _checked_at = time.monotonic()
+    return _local_search_engine
+
+
+async def local_search(search_query: str, user_intent: Optional[Dict[str, Any]] = None) -> Optional[List[Dict]]:
+    """Результаты локального поиска или None, если локальный каталог недоступен"""
+    engine = await get_local_search_engine()
+    if engine is None:
+        return None
+    return engine.search(search_query, user_intent)['results']
+
+
+def local_search_mode() -> str:
+    from config import LOCAL_SEARCH_MODE
+    return LOCAL_SEARCH_MODE if LOCAL_SEARCH_MODE in (MODE_PRIMARY, MODE_FALLBACK) else MODE_OFF
@@ -8,6 +8,7 @@ import re
 from telegram import Message
 from services.openai_service import OpenAIService
 from services.media_processor import MediaProcessor
+from services.rule_parser import get_rule_parser
 from config import MAX_FILE_SIZE
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,7 @@ class MessageProcessor:
     def __init__(self, bot=None):
         self.openai_service = OpenAIService()
         self.media_processor = MediaProcessor()
+        self.rule_parser = get_rule_parser()
         self.bot = bot
     
     async def process_message(self, message: Message) -> dict:
@@ -49,17 +51,7 @@ class MessageProcessor:
         need_gpt, reason, basic_intent = self._analyze_query_complexity(text)
 
         if need_gpt:
-            logger.info(f"🔍 Встроенный SmartParser: ИИ ассистент необходим для: {reason}")
-            assistant_result = await self.openai_service.analyze_with_assistant(text)
-            logger.info(f"Ассистент анализ успешен: {assistant_result}")
-
-            if isinstance(assistant_result, dict) and 'items' in assistant_result:
-                if assistant_result['items'] and len(assistant_result['items']) > 0:
-                    user_intent = {'is_multiple_order': True, 'items': assistant_result['items']}
-                else:
-                    user_intent = {}
-            else:
-                user_intent = assistant_result
+            user_intent = await self._analyze_lines(text, reason, getattr(message, 'chat_id', None))
         else:
             logger.info(f"🔍 Встроенный SmartParser: GPT НЕ нужен: {reason}")
             user_intent = basic_intent
@@ -78,6 +70,62 @@ class MessageProcessor:
             'user_intent': user_intent
         }
 
+    async def _analyze_lines(self, text: str, reason: str, chat_id=None):
+        """Разбирает строки правилами, ассистенту отправляет только неуверенные строки"""
+        parsed = self.rule_parser.parse(text)
+        uncertain = [line for line in parsed if not line.confident]
+
+        if len(uncertain) == len(parsed):
+            logger.info(f"🔍 Встроенный SmartParser: ИИ ассистент необходим для: {reason}")
+            return await self._analyze_with_assistant(text, chat_id)
+
+        logger.info(f"🔍 Локальный разбор: {len(parsed) - len(uncertain)} из {len(parsed)} строк без GPT")
+        if not uncertain:
+            return {'is_multiple_order': True, 'items': [line.item for line in parsed]}
+
+        assistant_result = await self.openai_service.analyze_with_assistant(
+            '\n'.join(line.line for line in uncertain), chat_id=chat_id
+        )
+        logger.info(f"Ассистент анализ успешен: {assistant_result}")
+        gpt_items = self._assistant_items(assistant_result)
+
+        if not gpt_items:
+            # Ассистент не ответил - берем локальный разбор строк, в которых есть хотя бы тип
+            items = [line.item for line in parsed if line.confident or line.item['type'] != 'неизвестно']
+        elif len(gpt_items) == len(uncertain):
+            # Позиции ассистента встают на места своих строк
+            answers = iter(gpt_items)
+            items = [line.item if line.confident else next(answers) for line in parsed]
+        else:
+            # Позиции не сопоставить со строками - ассистент разбирает сообщение целиком
+            logger.info(f"Ассистент вернул {len(gpt_items)} позиций на {len(uncertain)} строк, разбираем сообщение целиком")
+            return await self._analyze_with_assistant(text, chat_id)
+
+        return {'is_multiple_order': True, 'items': items}
+
+    async def _analyze_with_assistant(self, text: str, chat_id=None):
+        """Разбор всего сообщения ассистентом"""
+        assistant_result = await self.openai_service.analyze_with_assistant(text, chat_id=chat_id)
+        logger.info(f"Ассистент анализ успешен: {assistant_result}")
+
+        if isinstance(assistant_result, dict) and 'items' in assistant_result:
+            if assistant_result['items'] and len(assistant_result['items']) > 0:
+                return {'is_multiple_order': True, 'items': assistant_result['items']}
+            return {}
+        return assistant_result
+
+    @staticmethod
+    def _assistant_items(assistant_result) -> list:
+        """Позиции из ответа ассистента (объект, массив или {'items': [...]})"""
+        if isinstance(assistant_result, dict) and 'items' in assistant_result:
+            items = assistant_result['items'] or []
+        elif isinstance(assistant_result, list):
+            items = assistant_result
+        else:
+            items = [assistant_result]
+        return [item for item in items
+                if isinstance(item, dict) and item.get('type') not in (None, 'неизвестно', 'unknown')]
+
     async def _process_voice_message(self, message: Message) -> dict:
         """Обрабатывает голосовое сообщение"""
         try:
@@ -2,25 +2,120 @@
 Сервис для работы с OpenAI GPT
 """
 
+import asyncio
 import logging
 import json
+import time
+from typing import Any, Dict, Optional, Tuple
 from openai import AsyncOpenAI
-from config import OPENAI_API_KEY, OPENAI_MODEL
+from config import (OPENAI_API_KEY, OPENAI_MODEL, ASSISTANT_RUN_MODE, ASSISTANT_RUN_TIMEOUT,
+                    ASSISTANT_POLL_INITIAL, ASSISTANT_POLL_MAX, ASSISTANT_MAX_THREADS,
+                    ASSISTANT_THREAD_IDLE_TTL, ASSISTANT_THREAD_MAX_RUNS)
+from services.assistant_threads import AssistantThreadManager
+from shared.metrics import get_metrics
 from utils.prompt_loader import PromptLoader
 
 logger = logging.getLogger(__name__)
 
+# Статусы, в которых запуск ассистента еще выполняется, и окончательные статусы
+ACTIVE_RUN_STATUSES = ('queued', 'in_progress')
+FINISHED_RUN_STATUSES = ('completed', 'failed', 'cancelled', 'expired', 'incomplete')
+
+# Во сколько раз растет пауза между опросами запуска
+POLL_BACKOFF = 1.5
+
+
+# Клиент и пул тредов ассистента, общие для всех OpenAIService процесса:
+# ASSISTANT_MAX_THREADS ограничивает число тредов на весь процесс
+_openai_client: Optional[AsyncOpenAI] = None
+_thread_manager: Optional[AssistantThreadManager] = None
+
+def get_openai_client() -> AsyncOpenAI:
+    """Получает общий клиент OpenAI"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            default_headers={"OpenAI-Beta": "assistants=v2"}
+        )
+    return _openai_client
+
+def get_thread_manager() -> AssistantThreadManager:
+    """Получает общий пул тредов ассистента"""
+    global _thread_manager
+    if _thread_manager is None:
+        _thread_manager = AssistantThreadManager(
+            get_openai_client(), ASSISTANT_MAX_THREADS, ASSISTANT_THREAD_IDLE_TTL, ASSISTANT_THREAD_MAX_RUNS
+        )
+    return _thread_manager
+
+async def close_thread_manager() -> None:
+    """Удаляет свободные треды общего пула (вызывать при остановке процесса)"""
+    global _thread_manager
+    if _thread_manager is not None:
+        manager, _thread_manager = _thread_manager, None
+        await manager.close()
+
+
+class RunTimer:
+    """Время, которое запуск ассистента провел в каждом статусе (по наблюдаемым переходам)"""
+
+    def __init__(self):
+        self.run_id: Optional[str] = None
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {status: 0.0 for status in ACTIVE_RUN_STATUSES}
+        self._status: Optional[str] = None
+        self._since = self.started
+
+    def observe(self, run_id: Optional[str], status: Optional[str]) -> None:
+        now = time.perf_counter()
+        self.run_id = run_id or self.run_id
+        if status != self._status:
+            if self._status in self.durations:
+                self.durations[self._status] += now - self._since
+            self._status, self._since = status, now
+
+    def finish(self) -> None:
+        """Закрывает текущий статус (если запуск прерван, пока он выполнялся)"""
+        self.observe(None, None)
+
+
 class OpenAIService:
     """Сервис для работы с OpenAI API"""
     
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=OPENAI_API_KEY,
-            default_headers={"OpenAI-Beta": "assistants=v2"}
-        )
+        self.client = get_openai_client()
         self.model = OPENAI_MODEL
         self.assistant_id = "asst_HjGYPyU5L7uTWZA8q4mHUhGA"  # ID вашего ассистента
         self.prompt_loader = PromptLoader()
+        
+        # Запуск ассистента: режим (stream/poll), дедлайн и паузы опроса
+        self.run_mode = ASSISTANT_RUN_MODE
+        self.run_timeout = ASSISTANT_RUN_TIMEOUT
+        self.poll_initial = ASSISTANT_POLL_INITIAL
+        self.poll_max = ASSISTANT_POLL_MAX
+        
+        # Свой пул тредов, только если клиент заменен (тесты, другой API)
+        self._threads: Optional[AssistantThreadManager] = None
+        
+        metrics = get_metrics()
+        self._run_ms = metrics.histogram('assistant.run_ms')
+        self._queued_ms = metrics.histogram('assistant.queued_ms')
+        self._in_progress_ms = metrics.histogram('assistant.in_progress_ms')
+        self._polls = metrics.counter('assistant.polls')
+        self._timeouts = metrics.counter('assistant.timeouts')
+        self._failed_runs = metrics.counter('assistant.failed')
+    
+    @property
+    def threads(self) -> AssistantThreadManager:
+        """Пул тредов ассистента: общий для общего клиента, иначе свой для клиента"""
+        if self.client is _openai_client:
+            return get_thread_manager()
+        if self._threads is None or self._threads.client is not self.client:
+            self._threads = AssistantThreadManager(
+                self.client, ASSISTANT_MAX_THREADS, ASSISTANT_THREAD_IDLE_TTL, ASSISTANT_THREAD_MAX_RUNS
+            )
+        return self._threads
     
     async def analyze_user_intent(self, text: str) -> dict:
         """Анализирует намерение пользователя и извлекает параметры поиска"""
@@ -113,8 +208,12 @@ class OpenAIService:
             # Возвращаем базовый запрос
             return f"{user_intent.get('type', 'деталь')} {user_intent.get('diameter', '')} {user_intent.get('length', '')}"
 
-    async def analyze_with_assistant(self, text: str) -> dict:
-        """Анализирует намерение пользователя через ассистента с векторным хранилищем (Assistants API v2)."""
+    async def analyze_with_assistant(self, text: str, chat_id: Optional[Any] = None) -> dict:
+        """Анализирует намерение пользователя через ассистента с векторным хранилищем (Assistants API v2).
+        
+        Тред берется из пула по chat_id; сообщение передается вместе с запуском,
+        и запуск видит только его, поэтому прошлые запросы чата на ответ не влияют.
+        """
         try:
             # Import enhanced logging
             try:
@@ -130,38 +229,25 @@ class OpenAIService:
             log_gpt_request(text)
             logger.info(f"Анализ через ассистента с векторным хранилищем: {text[:100]}...")
 
-            # Создаем thread (заголовок v2 задан на клиенте через default_headers)
-            thread = await self.client.beta.threads.create()
-
-            # Добавляем сообщение
-            await self.client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=f"Проанализируй запрос крепежа и извлеки параметры:\n\n{text}"
-            )
-
-            # Запускаем ассистента
-            run = await self.client.beta.threads.runs.create(
-                thread_id=thread.id,
-                assistant_id=self.assistant_id
-            )
-
-            # Ждем завершения
-            import asyncio
-            while run.status in ['queued', 'in_progress']:
-                await asyncio.sleep(1)
-                run = await self.client.beta.threads.runs.retrieve(
-                    thread_id=thread.id,
-                    run_id=run.id
+            # Берем тред из пула (заголовок v2 задан на клиенте через default_headers)
+            async with self.threads.lease(chat_id) as thread:
+                # Запускаем ассистента с сообщением и ждем завершения (не дольше дедлайна)
+                status, assistant_message = await self.run_assistant(
+                    thread.thread_id,
+                    content=f"Проанализируй запрос крепежа и извлеки параметры:\n\n{text}"
                 )
 
-            if run.status == 'completed':
-                # Получаем ответ
-                messages = await self.client.beta.threads.messages.list(
-                    thread_id=thread.id
-                )
+                if status == 'completed' and assistant_message is None:
+                    # Получаем ответ
+                    messages = await self.client.beta.threads.messages.list(
+                        thread_id=thread.thread_id
+                    )
+                    assistant_message = messages.data[0].content[0].text.value
+                
+                # После прерванного запуска тред может быть еще занят - в пул его не возвращаем
+                thread.reusable = status in FINISHED_RUN_STATUSES
 
-                assistant_message = messages.data[0].content[0].text.value
+            if status == 'completed':
                 logger.info(f"Ответ ассистента: {assistant_message}")
 
                 # Парсим JSON
@@ -178,13 +264,94 @@ class OpenAIService:
                     logger.error(f"Ответ ассистента: {assistant_message}")
                     return {'type': 'неизвестно', 'confidence': 0.1}
             else:
-                logger.error(f"Ассистент завершился с ошибкой: {run.status}")
+                logger.error(f"Ассистент завершился с ошибкой: {status}")
                 return {'type': 'неизвестно', 'confidence': 0.1}
 
         except Exception as e:
             logger.error(f"Ошибка при работе с ассистентом: {e}")
             return {'type': 'неизвестно', 'confidence': 0.1}
     
+    async def run_assistant(self, thread_id: str, content: Optional[str] = None,
+                            timeout: Optional[float] = None) -> Tuple[str, Optional[str]]:
+        """Запускает ассистента в треде и ждет окончания запуска
+        
+        content добавляется в тред вместе с запуском (без отдельного
+        messages.create), и запуск видит только это сообщение.
+        
+        Возвращает (статус, текст ответа). Текст есть только в режиме stream -
+        он приходит в событиях; в режиме poll его нужно запросить отдельно.
+        По истечении дедлайна (или при отмене задачи) запуск отменяется и на
+        стороне OpenAI, статус - 'timeout'.
+        """
+        timer = RunTimer()
+        runner = self._stream_run if self.run_mode == 'stream' else self._poll_run
+        run_params = {'thread_id': thread_id, 'assistant_id': self.assistant_id}
+        if content is not None:
+            run_params['additional_messages'] = [{'role': 'user', 'content': content}]
+            run_params['truncation_strategy'] = {'type': 'last_messages', 'last_messages': 1}
+        try:
+            status, text = await asyncio.wait_for(runner(run_params, timer), timeout or self.run_timeout)
+        except asyncio.TimeoutError:
+            self._timeouts.inc()
+            logger.error(f"Ассистент не ответил за {timeout or self.run_timeout} с, отменяем запуск {timer.run_id}")
+            await self._cancel_run(thread_id, timer.run_id)
+            status, text = 'timeout', None
+        except asyncio.CancelledError:
+            await asyncio.shield(self._cancel_run(thread_id, timer.run_id))
+            raise
+        finally:
+            timer.finish()
+            self._run_ms.observe((time.perf_counter() - timer.started) * 1000)
+            self._queued_ms.observe(timer.durations['queued'] * 1000)
+            self._in_progress_ms.observe(timer.durations['in_progress'] * 1000)
+        
+        if status != 'completed':
+            self._failed_runs.inc()
+        logger.info(f"Запуск ассистента {timer.run_id}: {status}, в очереди "
+                    f"{timer.durations['queued'] * 1000:.0f} мс, выполнение {timer.durations['in_progress'] * 1000:.0f} мс")
+        return status, text
+    
+    async def _stream_run(self, run_params: Dict, timer: RunTimer) -> Tuple[str, Optional[str]]:
+        """Запуск со stream=True: статусы и ответ приходят событиями SSE, без опроса"""
+        stream = await self.client.beta.threads.runs.create(**run_params, stream=True)
+        status, text = 'incomplete', None
+        async with stream:
+            async for event in stream:
+                if event.event.startswith('thread.run.') and not event.event.startswith('thread.run.step.'):
+                    timer.observe(event.data.id, event.data.status)
+                    status = event.data.status
+                elif event.event == 'thread.message.completed' and event.data.role == 'assistant':
+                    text = event.data.content[0].text.value
+                elif event.event == 'error':
+                    logger.error(f"Ошибка в потоке ассистента: {event.data}")
+                    status = 'failed'
+        return status, text
+    
+    async def _poll_run(self, run_params: Dict, timer: RunTimer) -> Tuple[str, Optional[str]]:
+        """Запуск с опросом runs.retrieve; пауза растет от poll_initial до poll_max"""
+        run = await self.client.beta.threads.runs.create(**run_params)
+        timer.observe(run.id, run.status)
+        delay = self.poll_initial
+        while run.status in ACTIVE_RUN_STATUSES:
+            await asyncio.sleep(delay)
+            delay = min(delay * POLL_BACKOFF, self.poll_max)
+            run = await self.client.beta.threads.runs.retrieve(
+                thread_id=run_params['thread_id'],
+                run_id=run.id
+            )
+            self._polls.inc()
+            timer.observe(run.id, run.status)
+        return run.status, None
+    
+    async def _cancel_run(self, thread_id: str, run_id: Optional[str]) -> None:
+        """Отменяет запуск, чтобы он не продолжал тратить токены после дедлайна"""
+        if run_id is None:
+            return
+        try:
+            await self.client.beta.threads.runs.cancel(run_id=run_id, thread_id=thread_id)
+        except Exception as e:
+            logger.warning(f"Не удалось отменить запуск ассистента {run_id}: {e}")
+    
     async def call_gpt(self, prompt: str, model: str = "gpt-4o-mini", 
                       temperature: float = 0.1, max_tokens: int = 500) -> str:
         """Generic GPT call method for validation and other tasks"""
@@ -0,0 +1,277 @@
+"""
+Локальный разбор строк заказа правилами, без ассистента
+
+Параметры строки берутся из TextNormalizer.extract_parameters, тип изделия -
+по словарю алиасов (Source/aliases.jsonl). Позиции возвращаются в формате
+ответа ассистента (prompts/assistant_prompt.json) с оценкой уверенности:
+ассистенту отправляются только строки, уверенность которых ниже порога.
+"""
+
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from pipeline.text_parser import DEFAULT_CACHE_SIZE, ParsedLine, TextParser, get_text_parser
+from shared.cache import LRUCache
+from shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Вклад найденных частей строки в уверенность и штраф за каждое неразобранное слово
+TYPE_SCORE = 0.5
+SIZE_SCORE = 0.3
+PARTIAL_SIZE_SCORE = 0.1
+QUANTITY_SCORE = 0.1
+DETAIL_SCORE = 0.05
+UNKNOWN_PENALTY = 0.15
+
+# Типы, размер которых задается одним диаметром
+DIAMETER_ONLY_TYPES = {'гайка', 'шайба'}
+
+# Слова, которые не несут параметров
+STOP_WORDS = {'мм', 'с', 'и', 'по', 'x'}
+
+# Словарь на случай, если Source/aliases.jsonl недоступен
+DEFAULT_ALIASES = [
+    {'alias': alias, 'maps_to': {'type': alias.capitalize()}}
+    for alias in ('болт', 'винт', 'гайка', 'шайба', 'анкер', 'саморез', 'шуруп', 'дюбель')
+]
+
+# Окончания, отбрасываемые у слов алиаса (болты, гайки, анкера, шайбу...)
+_ENDINGS = ('ого', 'его', 'ая', 'яя', 'ой', 'ый', 'ий', 'ое', 'ее', 'ые', 'ие',
+            'а', 'я', 'ы', 'и', 'о', 'е', 'у', 'ю', 'й', 'ь')
+
+_DECIMAL_COMMA_RE = re.compile(r'(\d),(\d)')
+_METRIC_RE = re.compile(r'(?<![a-zа-яё\d])[mм]\d+(?:\.\d+)?(?:x\d+(?:\.\d+)?)*')
+_PLAIN_SIZE_RE = re.compile(r'(?<![a-zа-яё\d.])(\d+(?:\.\d+)?)((?:x\d+(?:\.\d+)?)+)')
+_LENGTH_MM_RE = re.compile(r'(?<![a-zа-яё\d.])(\d+(?:\.\d+)?)\s*мм')
+_QUANTITY_RE = re.compile(r'\d+\s*(?:шт|уп)[а-яё]*')
+_DETAIL_RE = re.compile(r'din\s*\d+|кл\.пр\.\d+\.\d+')
+_MATERIAL_RE = re.compile(r'(?<![a-zа-яё])(оцинк|цинк|латун|нерж|стал)[а-яё]*')
+_TOKEN_RE = re.compile(r'[a-zа-яё]+|\d+(?:\.\d+)?')
+
+# Основа слова -> материал в ответе ассистента (оцинковка идет в coating)
+MATERIALS = {'латун': 'латунь', 'нерж': 'нержавеющая сталь', 'стал': 'сталь'}
+
+
+@dataclass
+class RuleParsedLine:
+    """Строка заказа и ее позиция; confident=False - строку разбирает ассистент"""
+    line: str
+    item: Dict[str, Any]
+    confident: bool
+
+
+def _stem(word: str) -> str:
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def _alias_pattern(alias: str) -> str:
+    """Регулярное выражение алиаса, допускающее окончания слов"""
+    words = []
+    for word in re.split(r'[\s\-]+', alias.lower().strip()):
+        stem = _stem(word)
+        words.append(re.escape(stem) + ('[а-яё]{0,4}' if stem != word or len(word) >= 4 else ''))
+    return r'[\s\-]+'.join(words)
+
+
+def _alias_qualifier(alias: str, item_type: str) -> Optional[str]:
+    """Слова алиаса сверх названия типа ('анкер клиновой' -> 'клиновой'), кроме материала"""
+    type_stems = [_stem(word) for word in item_type.lower().split()]
+
+    def is_type_word(word: str) -> bool:
+        stem = _stem(word)
+        return any(stem.startswith(type_stem) or type_stem.startswith(stem) for type_stem in type_stems)
+
+    words = [word.strip('()') for word in re.split(r'[\s\-]+', alias.lower().strip())]
+    extra = [word for word in words if word and not is_type_word(word) and not _MATERIAL_RE.fullmatch(word)]
+    return ' '.join(extra) if any(word not in STOP_WORDS for word in extra) else None
+
+
+def _maps_to(row: Dict[str, Any]) -> Dict[str, Any]:
+    maps_to = row.get('maps_to', row)
+    if isinstance(maps_to, str):
+        try:
+            maps_to = json.loads(maps_to)
+        except ValueError:
+            return {}
+    if isinstance(maps_to, list):
+        maps_to = maps_to[0] if maps_to else {}
+    return maps_to if isinstance(maps_to, dict) else {}
+
+
+def load_alias_rows(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Строки словаря алиасов (alias + maps_to) из jsonl"""
+    if path is None:
+        from config import SOURCE_FILES
+        path = SOURCE_FILES.get('aliases')
+    if not path:
+        return DEFAULT_ALIASES
+    rows = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(json.loads(line))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось загрузить алиасы из {path}: {e}")
+        return DEFAULT_ALIASES
+    return rows
+
+
+def _number(value: str) -> str:
+    return value[:-2] if value.endswith('.0') else value
+
+
+class RuleParser:
+    """Разбор строк заказа без ассистента
+
+    Уверенность строки складывается из найденных типа, размера, количества и
+    стандарта/покрытия; каждое слово или число, которое правила не объяснили,
+    ее снижает. Так строки со свободным текстом, несколькими типами или
+    размерами, незнакомыми единицами уходят ассистенту.
+    """
+
+    def __init__(self, aliases: Optional[List[Dict[str, Any]]] = None,
+                 min_confidence: Optional[float] = None,
+                 parser: Optional[TextParser] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        if min_confidence is None:
+            from config import RULE_PARSER_MIN_CONFIDENCE
+            min_confidence = RULE_PARSER_MIN_CONFIDENCE
+        self.min_confidence = min_confidence
+        self.parser = parser or get_text_parser()
+        # Строка -> позиция; позиции изменяемые, наружу отдаются копии
+        self.item_cache = LRUCache(cache_size)
+
+        # Паттерн алиаса -> (тип, подтип); длинные алиасы проверяются первыми
+        self._aliases: Dict[str, Tuple[str, Optional[str]]] = {}
+        for row in load_alias_rows() if aliases is None else aliases:
+            maps_to = _maps_to(row)
+            alias = row.get('alias')
+            if alias and maps_to.get('type'):
+                # Подтип из словаря, иначе - уточняющие слова алиаса, как их вернул бы
+                # ассистент ('анкер с кольцом' -> 'с кольцом')
+                subtype = (maps_to.get('subtype') or _alias_qualifier(alias, maps_to['type'])
+                           or maps_to.get('feature'))
+                self._aliases.setdefault(_alias_pattern(alias), (maps_to['type'].lower(), subtype))
+        self._patterns = sorted(self._aliases, key=len, reverse=True)
+        self._alias_re = re.compile(
+            '(?<![a-zа-яё])(?:' + '|'.join(f'({pattern})' for pattern in self._patterns) + ')(?![a-zа-яё])'
+        ) if self._patterns else None
+
+        metrics = get_metrics()
+        self._local_lines = metrics.counter('rule_parser.local_lines')
+        self._gpt_lines = metrics.counter('rule_parser.gpt_lines')
+        self._parse_ms = metrics.histogram('rule_parser.parse_ms', (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50))
+
+    def parse(self, text: str) -> List[RuleParsedLine]:
+        """Разбирает строки текста; неуверенные строки помечаются для ассистента"""
+        start = time.perf_counter()
+        result = []
+        for parsed_line in self.parser.parse_text_input(text):
+            item = self._cached_item(parsed_line)
+            confident = item['confidence'] >= self.min_confidence
+            (self._local_lines if confident else self._gpt_lines).inc()
+            result.append(RuleParsedLine(parsed_line.raw_text, item, confident))
+        self._parse_ms.observe((time.perf_counter() - start) * 1000)
+        return result
+
+    def parse_line(self, line: str) -> Optional[Dict[str, Any]]:
+        """Позиция одной строки (None для пустой строки)"""
+        parsed_lines = self.parser.parse_text_input(line)
+        return self._cached_item(parsed_lines[0]) if parsed_lines else None
+
+    def _cached_item(self, parsed_line: ParsedLine) -> Dict[str, Any]:
+        return dict(self.item_cache.get_or_compute(parsed_line.raw_text, lambda: self._parse_line(parsed_line)))
+
+    def _parse_line(self, parsed_line: ParsedLine) -> Dict[str, Any]:
+        text = _DECIMAL_COMMA_RE.sub(r'\1.\2', parsed_line.normalized_text).lower()
+        params = (self.parser.normalizer.extract_parameters(text)
+                  if text != parsed_line.normalized_text.lower() else dict(parsed_line.extracted_params))
+        rest = text
+        unknown = 0
+
+        # Тип: первый найденный алиас, алиасы других типов - неразобранные слова
+        item_type, subtype = None, None
+        if self._alias_re is not None:
+            parts, end = [], 0
+            for match in self._alias_re.finditer(text):
+                match_type, match_subtype = self._aliases[self._patterns[match.lastindex - 1]]
+                if item_type is None:
+                    item_type, subtype = match_type, match_subtype
+                elif match_type != item_type:
+                    unknown += 1
+                parts.append(text[end:match.start()])
+                end = match.end()
+            rest = ' '.join(parts + [text[end:]])
+
+        # Размер: метрический (M8x40) или как написано (4,2х90 -> 4.2 и 90), но один
+        diameter, length = params.get('diameter'), params.get('length')
+        metric, plain = _METRIC_RE.findall(rest), _PLAIN_SIZE_RE.findall(rest)
+        if plain and not metric:
+            parts = [plain[0][0]] + plain[0][1].split('x')[1:]
+            diameter, length = 'x'.join(parts[:-1]), parts[-1]
+        unknown += max(len(metric) + len(plain) - 1, 0)
+        rest = _PLAIN_SIZE_RE.sub(' ', _METRIC_RE.sub(' ', rest))
+        if diameter and not length:
+            length_match = _LENGTH_MM_RE.search(rest)
+            if length_match:
+                length = length_match.group(1)
+                rest = rest[:length_match.start()] + ' ' + rest[length_match.end():]
+
+        quantity = None
+        if parsed_line.qty_units or parsed_line.qty_packs:
+            unit = 'шт' if parsed_line.qty_units else 'уп'
+            quantity = f"{_number(str(parsed_line.qty_units or parsed_line.qty_packs))} {unit}"
+            rest = _QUANTITY_RE.sub(' ', rest, count=1)
+
+        # Материал ищется по всей строке: он может быть частью алиаса ('анкер латунный')
+        material = None
+        for match in _MATERIAL_RE.finditer(text):
+            material = material or MATERIALS.get(match.group(1))
+        rest = _MATERIAL_RE.sub(' ', _DETAIL_RE.sub(' ', rest))
+
+        unknown += sum(1 for token in _TOKEN_RE.findall(rest) if token not in STOP_WORDS)
+
+        confidence = 0.0
+        if item_type:
+            confidence += TYPE_SCORE
+        if diameter and (length or item_type in DIAMETER_ONLY_TYPES):
+            confidence += SIZE_SCORE
+        elif diameter or length:
+            confidence += PARTIAL_SIZE_SCORE
+        if quantity:
+            confidence += QUANTITY_SCORE
+        if params.get('standard') or params.get('coating') or material:
+            confidence += DETAIL_SCORE
+        confidence -= UNKNOWN_PENALTY * unknown
+
+        return {
+            'type': item_type or 'неизвестно',
+            'subtype': subtype,
+            'diameter': diameter,
+            'length': length,
+            'material': material,
+            'coating': params.get('coating') if params.get('coating') == 'оцинкованный' else None,
+            'standard': params.get('standard'),
+            'quantity': quantity,
+            'confidence': round(min(max(confidence, 0.0), 1.0), 2),
+        }
+
+
+# Глобальный разборщик строк
+_rule_parser = None
+
+def get_rule_parser() -> RuleParser:
+    """Получает глобальный разборщик строк правилами"""
+    global _rule_parser
+    if _rule_parser is None:
+        _rule_parser = RuleParser()
+    return _rule_parser
@@ -0,0 +1,219 @@
+"""
+Кэш результатов Edge Function fastener-search
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from shared.cache import LRUCache
+from shared.metrics import get_metrics
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # redis опционален
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+# Поля user_intent, от которых зависит ответ fastener-search
+SEARCH_INTENT_FIELDS = ('type', 'diameter', 'length', 'standard', 'coating', 'is_simple_parsed')
+
+_SPACES_RE = re.compile(r'\s+')
+# 4,2х90 / 4.2*90 / 4.2 × 90 -> 4.2x90
+_SIZE_RE = re.compile(r'(\d)\s*[xх×*]\s*(\d)')
+_DECIMAL_RE = re.compile(r'(\d),(\d)')
+
+
+def canonicalize_query(text: Any) -> str:
+    """Нормализует строку запроса для ключа кэша"""
+    text = _SPACES_RE.sub(' ', str(text or '').lower()).strip()
+    text = _DECIMAL_RE.sub(r'\1.\2', text)
+    return _SIZE_RE.sub(r'\1x\2', text)
+
+
+def make_search_key(search_query: str, user_intent: Optional[Dict[str, Any]]) -> str:
+    """Ключ кэша по нормализованному запросу и значимым полям user_intent"""
+    intent = user_intent or {}
+    fields = {
+        field: canonicalize_query(intent[field])
+        for field in SEARCH_INTENT_FIELDS if intent.get(field) not in (None, '')
+    }
+    payload = json.dumps([canonicalize_query(search_query), fields], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemorySearchBackend:
+    """Хранилище в памяти процесса: LRU ограниченного размера с TTL записей"""
+
+    def __init__(self, maxsize: int = 5000):
+        self._cache = LRUCache(maxsize)
+
+    async def get(self, key: str) -> Optional[List[Dict]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            return None
+        return value
+
+    async def set(self, key: str, value: List[Dict], ttl: float) -> None:
+        self._cache.put(key, (time.monotonic() + ttl, value))
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+
+class RedisSearchBackend:
+    """Хранилище в Redis (общий кэш для нескольких процессов)"""
+
+    def __init__(self, url: str, prefix: str = 'fastener-search:'):
+        if redis_asyncio is None:
+            raise RuntimeError("Пакет redis не установлен")
+        self._redis = redis_asyncio.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[List[Dict]]:
+        raw = await self._redis.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: List[Dict], ttl: float) -> None:
+        await self._redis.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=max(1, int(ttl)))
+
+    async def clear(self) -> None:
+        async for key in self._redis.scan_iter(match=self.prefix + '*'):
+            await self._redis.delete(key)
+
+
+class SearchResultCache:
+    """Кэш ответов fastener-search с TTL, негативным кэшем и версией каталога
+
+    Версия каталога входит в ключ и перепроверяется не чаще раза в
+    version_interval секунд; при ее смене старые записи становятся
+    недостижимы (а память очищается). Пустые ответы хранятся negative_ttl.
+    """
+
+    def __init__(self, backend, ttl: float = 600, negative_ttl: float = 60,
+                 check_version: Optional[Callable[[], Awaitable[Any]]] = None,
+                 version_interval: float = 60, metrics_prefix: str = 'search_cache'):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._check_version = check_version
+        self.version_interval = version_interval
+        self.catalog_version: Optional[str] = None
+        self._version_checked_at: Optional[float] = None
+
+        metrics = get_metrics()
+        self._hits = metrics.counter(f'{metrics_prefix}.hits')
+        self._negative_hits = metrics.counter(f'{metrics_prefix}.negative_hits')
+        self._misses = metrics.counter(f'{metrics_prefix}.misses')
+        self._errors = metrics.counter(f'{metrics_prefix}.errors')
+        metrics.gauge(f'{metrics_prefix}.hit_rate', lambda: round(self.hit_rate, 4))
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self._hits.value + self._negative_hits.value
+        total = hits + self._misses.value
+        return hits / total if total else 0.0
+
+    async def set_catalog_version(self, version: Any) -> None:
+        """Переключает кэш на версию каталога; при смене очищает память"""
+        version = None if version is None else str(version)
+        self._version_checked_at = time.monotonic()
+        if version == self.catalog_version:
+            return
+        if self.catalog_version is not None and isinstance(self.backend, MemorySearchBackend):
+            await self.backend.clear()
+        logger.info(f"Кэш поиска: версия каталога {self.catalog_version} -> {version}")
+        self.catalog_version = version
+
+    async def _refresh_version(self) -> None:
+        if self._check_version is None:
+            return
+        if self._version_checked_at is not None and time.monotonic() - self._version_checked_at < self.version_interval:
+            return
+        try:
+            version = await self._check_version()
+        except Exception as e:
+            logger.warning(f"Не удалось проверить версию каталога: {e}")
+            self._version_checked_at = time.monotonic()
+            return
+        await self.set_catalog_version(version)
+
+    def _key(self, search_query: str, user_intent: Optional[Dict[str, Any]]) -> str:
+        return f"{self.catalog_version}:{make_search_key(search_query, user_intent)}"
+
+    async def get(self, search_query: str, user_intent: Optional[Dict[str, Any]] = None) -> Optional[List[Dict]]:
+        """Возвращает копию закэшированных результатов или None"""
+        await self._refresh_version()
+        try:
+            value = await self.backend.get(self._key(search_query, user_intent))
+        except Exception as e:
+            self._errors.inc()
+            logger.warning(f"Ошибка чтения кэша поиска: {e}")
+            value = None
+
+        if value is None:
+            self._misses.inc()
+            return None
+        if value:
+            self._hits.inc()
+        else:
+            self._negative_hits.inc()
+        # Вызывающий код дополняет результаты полями позиции заказа
+        return copy.deepcopy(value)
+
+    async def set(self, search_query: str, user_intent: Optional[Dict[str, Any]], results: List[Dict]) -> None:
+        ttl = self.ttl if results else self.negative_ttl
+        if ttl <= 0:
+            return
+        await self._refresh_version()
+        try:
+            await self.backend.set(self._key(search_query, user_intent), copy.deepcopy(results), ttl)
+        except Exception as e:
+            self._errors.inc()
+            logger.warning(f"Ошибка записи в кэш поиска: {e}")
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+
+# Глобальный кэш результатов поиска
+_search_cache = None
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """Получает глобальный кэш результатов поиска (None, если кэш отключен)"""
+    global _search_cache
+    if _search_cache is None:
+        from config import (
+            SEARCH_CACHE_TTL, SEARCH_CACHE_NEGATIVE_TTL, SEARCH_CACHE_SIZE,
+            SEARCH_CACHE_REDIS_URL, SEARCH_CACHE_VERSION_INTERVAL
+        )
+        from database.supabase_client import get_catalog_version
+
+        if SEARCH_CACHE_TTL <= 0:
+            return None
+
+        backend = None
+        if SEARCH_CACHE_REDIS_URL:
+            try:
+                backend = RedisSearchBackend(SEARCH_CACHE_REDIS_URL)
+            except Exception as e:
+                logger.warning(f"Redis для кэша поиска недоступен, используем память: {e}")
+        if backend is None:
+            backend = MemorySearchBackend(SEARCH_CACHE_SIZE)
+
+        _search_cache = SearchResultCache(
+            backend,
+            ttl=SEARCH_CACHE_TTL,
+            negative_ttl=SEARCH_CACHE_NEGATIVE_TTL,
+            check_version=get_catalog_version,
+            version_interval=SEARCH_CACHE_VERSION_INTERVAL,
+        )
+    return _search_cache
@@ -0,0 +1,135 @@
+"""
+Общий HTTP-клиент приложения (aiohttp) с пулом соединений и метриками
+"""
+
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+import aiohttp
+
+from config import HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT
+from shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Время жизни записей DNS-кэша коннектора (секунды)
+DNS_CACHE_TTL = 300
+
+# Сколько держать простаивающее keep-alive соединение (секунды)
+KEEPALIVE_TIMEOUT = 30
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _create_trace_config(metrics_prefix: str = 'http') -> aiohttp.TraceConfig:
+    """Трассировка запросов: длительность запроса, установки соединения и DNS"""
+    metrics = get_metrics()
+    request_ms = metrics.histogram(f'{metrics_prefix}.request_ms')
+    connect_ms = metrics.histogram(f'{metrics_prefix}.connect_ms')
+    dns_ms = metrics.histogram(f'{metrics_prefix}.dns_ms')
+    connections_created = metrics.counter(f'{metrics_prefix}.connections_created')
+    connections_reused = metrics.counter(f'{metrics_prefix}.connections_reused')
+    request_errors = metrics.counter(f'{metrics_prefix}.request_errors')
+
+    async def on_request_start(session, ctx, params):
+        ctx.request_start = time.perf_counter()
+
+    async def on_request_end(session, ctx, params):
+        request_ms.observe((time.perf_counter() - ctx.request_start) * 1000)
+
+    async def on_request_exception(session, ctx, params):
+        request_errors.inc()
+
+    async def on_connection_create_start(session, ctx, params):
+        ctx.connect_start = time.perf_counter()
+
+    async def on_connection_create_end(session, ctx, params):
+        connections_created.inc()
+        connect_ms.observe((time.perf_counter() - ctx.connect_start) * 1000)
+
+    async def on_connection_reuseconn(session, ctx, params):
+        connections_reused.inc()
+
+    async def on_dns_resolvehost_start(session, ctx, params):
+        ctx.dns_start = time.perf_counter()
+
+    async def on_dns_resolvehost_end(session, ctx, params):
+        dns_ms.observe((time.perf_counter() - ctx.dns_start) * 1000)
+
+    trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=lambda trace_request_ctx: SimpleNamespace())
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    return trace_config
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Создает сессию с keep-alive пулом, DNS-кэшем и таймаутами"""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, trace_configs=[_create_trace_config()])
+
+
+def _release_session(session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Освобождает сессию другого event loop
+
+    Если ее loop еще не закрыт, закрытие планируется в нем (соединения
+    принадлежат этому loop). В закрытом loop закрыть их уже нельзя, поэтому
+    коннектор отвязывается, и сессия считается закрытой.
+    """
+    if session.closed:
+        return
+    if loop is not None and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(session.close(), loop)
+    else:
+        session.detach()
+    logger.info("HTTP-сессия другого event loop освобождена")
+
+
+async def open_http_session() -> aiohttp.ClientSession:
+    """Открывает общую сессию (вызывается при старте приложения)"""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        if _session is not None:
+            _release_session(_session, _session_loop)
+        _session = create_http_session()
+        _session_loop = loop
+        logger.info("Общая HTTP-сессия открыта")
+    return _session
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    """Возвращает общую сессию, открывая ее при первом обращении
+
+    Сессия привязана к event loop, поэтому в другом loop (скрипты, тесты)
+    создается новая.
+    """
+    return await open_http_session()
+
+
+async def close_http_session() -> None:
+    """Закрывает общую сессию (вызывается при остановке приложения)"""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        if _session_loop is asyncio.get_running_loop():
+            await _session.close()
+            logger.info("Общая HTTP-сессия закрыта")
+        else:
+            _release_session(_session, _session_loop)
+    _session = None
+    _session_loop = None
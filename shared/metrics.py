@@ -0,0 +1,122 @@
+"""
+Простые метрики процесса: счетчики, gauge и гистограммы
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Границы корзин по умолчанию (миллисекунды)
+DEFAULT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Counter:
+    """Монотонный счетчик"""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля по верхней границе корзины"""
+        if not self._count:
+            return None
+        rank = q * self._count
+        seen = 0
+        for i, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self._max
+        return self._max
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            buckets = {str(le): count for le, count in zip(self.buckets, self._counts)}
+            buckets['+Inf'] = self._counts[-1]
+            return {
+                'count': self._count,
+                'sum': round(self._sum, 3),
+                'avg': round(self._sum / self._count, 3) if self._count else None,
+                'max': round(self._max, 3),
+                'p50': self.quantile(0.5),
+                'p95': self.quantile(0.95),
+                'buckets': buckets,
+            }
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса"""
+
+    def __init__(self):
+        self._counters: Dict[str, Counter] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter()
+            return self._counters[name]
+
+    def histogram(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS_MS) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(buckets)
+            return self._histograms[name]
+
+    def gauge(self, name: str, fn: Callable[[], float]) -> None:
+        """Регистрирует gauge, значение вычисляется при снятии снапшота"""
+        with self._lock:
+            self._gauges[name] = fn
+
+    def snapshot(self) -> Dict:
+        gauges = {}
+        for name, fn in list(self._gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception:
+                gauges[name] = None
+        return {
+            'counters': {name: c.value for name, c in list(self._counters.items())},
+            'gauges': gauges,
+            'histograms': {name: h.snapshot() for name, h in list(self._histograms.items())},
+        }
+
+
+# Глобальный реестр метрик
+_metrics = None
+
+def get_metrics() -> MetricsRegistry:
+    """Получает глобальный реестр метрик"""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
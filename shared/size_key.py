@@ -0,0 +1,84 @@
+"""
+Канонический ключ размера крепежа (диаметр x длина, размеры уголков и колец)
+
+Ключ - числа через "x" без префикса М: "М10х30" -> "10x30",
+"4,2 × 90 мм" -> "4.2x90", "50х50х40" -> "50x50x40". Тот же алгоритм
+реализован в supabase/functions/fastener-search/index.ts (sizeKey,
+sizeKeysFromText) - при изменении правьте оба места.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_X_RE = re.compile(r'[×хx*]')
+_DECIMAL_COMMA_RE = re.compile(r'(\d),(\d)')
+_MM_RE = re.compile(r'(\d)\s*мм')
+_NUMBER = r'\d+(?:\.\d+)?'
+# Два или три числа через x, не являющиеся продолжением другого числа
+_SIZE_RE = re.compile(rf'(?<![\d.])({_NUMBER}(?:\s*x\s*{_NUMBER}){{1,2}})(?![\d.])')
+_DIAMETER_RE = re.compile(rf'^[mм]?\s*({_NUMBER}(?:\s*x\s*{_NUMBER})?)$')
+_LENGTH_RE = re.compile(rf'^({_NUMBER})$')
+# Первый размер в названии: [М]диаметр x длина или отдельный метрический диаметр М8
+_NAME_SIZE_RE = re.compile(rf'(?<![a-zа-я\d.])([mм])?\s?({_NUMBER})\s*x\s*({_NUMBER})')
+_NAME_DIAMETER_RE = re.compile(rf'(?<![a-zа-я\d.])[mм]({_NUMBER})(?![\d.])')
+
+
+def _prepare(text: Any) -> str:
+    text = _X_RE.sub('x', str(text or '').lower())
+    text = _DECIMAL_COMMA_RE.sub(r'\1.\2', text)
+    return _MM_RE.sub(r'\1', text).strip()
+
+
+def _join(size: str) -> str:
+    return 'x'.join(part.strip() for part in size.split('x'))
+
+
+def size_key(diameter: Any, length: Any) -> Optional[str]:
+    """Ключ размера запроса по диаметру и длине (None, если размер неполный)"""
+    d = _DIAMETER_RE.match(_prepare(diameter))
+    l = _LENGTH_RE.match(_prepare(length))
+    if not d or not l:
+        return None
+    return f"{_join(d.group(1))}x{l.group(1)}"
+
+
+def size_keys_from_text(text: Any) -> List[str]:
+    """Все ключи размеров, встречающиеся в названии позиции (в порядке появления)
+
+    Для трехчастного размера добавляется и ключ первых двух чисел
+    ("8х100х12" -> "8x100x12", "8x100"), чтобы его находил запрос диаметр x длина.
+    """
+    keys = []
+    for size in _SIZE_RE.findall(_prepare(text)):
+        key = _join(size)
+        keys.append(key)
+        parts = key.split('x')
+        if len(parts) == 3:
+            keys.append('x'.join(parts[:2]))
+    return list(dict.fromkeys(keys))
+
+
+def parse_size(text: Any) -> Tuple[str, str]:
+    """Диаметр и длина из названия позиции: ("M10", "30"), ("4.2", "90"), ("M8", "")"""
+    prepared = _prepare(text)
+    match = _NAME_SIZE_RE.search(prepared)
+    if match:
+        prefix, diameter, length = match.groups()
+        return ('M' if prefix else '') + diameter, length
+    match = _NAME_DIAMETER_RE.search(prepared)
+    if match:
+        return 'M' + match.group(1), ''
+    return '', ''
+
+
+def item_size_keys(item: Dict[str, Any]) -> List[str]:
+    """Ключи размеров позиции каталога: вычисленные при загрузке или из названия и specs"""
+    keys = item.get('size_keys')
+    if keys is not None:
+        return list(keys)
+    keys = size_keys_from_text(item.get('name'))
+    specs = item.get('specs_json') or {}
+    spec_key = size_key(specs.get('diameter'), specs.get('length'))
+    if spec_key and spec_key not in keys:
+        keys.append(spec_key)
+    return keys
@@ -0,0 +1,118 @@
+"""
+Защита от повторной обработки обновлений Telegram (по update_id)
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed_updates (
+    update_id INTEGER PRIMARY KEY,
+    received_at REAL NOT NULL
+)
+"""
+
+
+class UpdateDeduplicator:
+    """Помнит последние maxsize update_id в кольцевом буфере
+
+    Telegram повторяет доставку, если webhook отвечает долго или с ошибкой,
+    и повтор приходит с тем же update_id. Первый claim возвращает True,
+    повторные - False. С path буфер дублируется в SQLite и переживает
+    перезапуск процесса (повторы после деплоя тоже отсекаются).
+    """
+
+    def __init__(self, maxsize: int = 10000, path: Optional[str] = None, metrics_prefix: str = 'webhook'):
+        self.maxsize = maxsize
+        self.path = path
+        self._ids: deque = deque()
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(SCHEMA)
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT update_id FROM processed_updates ORDER BY received_at DESC, update_id DESC LIMIT ?",
+                (maxsize,)
+            ).fetchall()
+            for (update_id,) in reversed(rows):
+                self._remember(update_id)
+            # Старше кольцевого буфера записи больше не нужны
+            self._conn.execute(
+                "DELETE FROM processed_updates WHERE update_id NOT IN "
+                "(SELECT update_id FROM processed_updates ORDER BY received_at DESC, update_id DESC LIMIT ?)",
+                (maxsize,)
+            )
+            self._conn.commit()
+
+        metrics = get_metrics()
+        self._duplicates = metrics.counter(f'{metrics_prefix}.duplicates')
+        metrics.gauge(f'{metrics_prefix}.dedup_size', lambda: len(self))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, update_id: int) -> bool:
+        return update_id in self._seen
+
+    def _remember(self, update_id: int) -> Optional[int]:
+        """Добавляет id в буфер; возвращает вытесненный id"""
+        self._ids.append(update_id)
+        self._seen.add(update_id)
+        if len(self._ids) > self.maxsize:
+            evicted = self._ids.popleft()
+            self._seen.discard(evicted)
+            return evicted
+        return None
+
+    def claim(self, update_id: Optional[int]) -> bool:
+        """True, если обновление пришло впервые (и запоминает его); False для повтора"""
+        if update_id is None or self.maxsize <= 0:
+            return True
+        with self._lock:
+            if update_id in self._seen:
+                self._duplicates.inc()
+                return False
+            evicted = self._remember(update_id)
+            if self._conn is not None:
+                try:
+                    self._conn.execute("INSERT OR IGNORE INTO processed_updates VALUES (?, ?)", (update_id, time.time()))
+                    if evicted is not None:
+                        self._conn.execute("DELETE FROM processed_updates WHERE update_id = ?", (evicted,))
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Не удалось сохранить update_id {update_id}: {e}")
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Глобальный фильтр повторов
+_update_deduplicator = None
+
+def get_update_deduplicator() -> UpdateDeduplicator:
+    """Получает глобальный фильтр повторов (SQLite, если задан UPDATE_DEDUP_PATH)"""
+    global _update_deduplicator
+    if _update_deduplicator is None:
+        from config import UPDATE_DEDUP_SIZE, UPDATE_DEDUP_PATH
+        try:
+            _update_deduplicator = UpdateDeduplicator(UPDATE_DEDUP_SIZE, UPDATE_DEDUP_PATH or None)
+        except sqlite3.Error as e:
+            logger.warning(f"Фильтр повторов работает без SQLite: {e}")
+            _update_deduplicator = UpdateDeduplicator(UPDATE_DEDUP_SIZE)
+    return _update_deduplicator
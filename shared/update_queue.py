@@ -0,0 +1,126 @@
+"""
+Ограниченная очередь входящих обновлений с пулом asyncio-воркеров и метриками
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable, List, Optional
+
+from shared.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueue:
+    """Пул воркеров, разбирающих ограниченные очереди обновлений
+
+    Обновления с одинаковым ключом (например, chat_id) попадают в очередь
+    одного и того же воркера и обрабатываются по порядку; разные ключи
+    обрабатываются параллельно. Если очередь воркера заполнена, submit
+    возвращает False, и вызывающий отвечает отказом (Telegram повторит
+    доставку позже).
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], workers: int = 4, maxsize: int = 100,
+                 key: Optional[Callable[[Any], Hashable]] = None, metrics_prefix: str = 'webhook'):
+        self.handler = handler
+        self.workers = max(1, workers)
+        # Емкость делится между воркерами, но не меньше одного обновления на воркер
+        self.maxsize = max(maxsize, self.workers)
+        self.key = key
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._next = 0
+        self._busy = 0
+
+        metrics = get_metrics()
+        self._enqueued = metrics.counter(f'{metrics_prefix}.enqueued')
+        self._rejected = metrics.counter(f'{metrics_prefix}.rejected')
+        self._processed = metrics.counter(f'{metrics_prefix}.processed')
+        self._failed = metrics.counter(f'{metrics_prefix}.failed')
+        self._wait_ms = metrics.histogram(f'{metrics_prefix}.queue_wait_ms')
+        self._handle_ms = metrics.histogram(f'{metrics_prefix}.handle_ms')
+        metrics.gauge(f'{metrics_prefix}.queue_depth', lambda: self.depth)
+        metrics.gauge(f'{metrics_prefix}.busy_workers', lambda: self.busy)
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    @property
+    def depth(self) -> int:
+        """Сколько обновлений ждут воркера"""
+        return sum(queue.qsize() for queue in self._queues)
+
+    @property
+    def busy(self) -> int:
+        """Сколько обновлений сейчас обрабатывается"""
+        return self._busy
+
+    def start(self) -> None:
+        """Запускает воркеры в текущем event loop (повторный вызов ничего не делает)"""
+        if self.running:
+            return
+        per_worker = -(-self.maxsize // self.workers)
+        self._queues = [asyncio.Queue(per_worker) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(queue), name=f'update-worker-{i}')
+            for i, queue in enumerate(self._queues)
+        ]
+        logger.info(f"Очередь обновлений запущена: {self.workers} воркеров, до {per_worker * self.workers} в очереди")
+
+    def submit(self, update: Any) -> bool:
+        """Ставит обновление в очередь без ожидания; False, если очередь переполнена"""
+        if not self.running:
+            self.start()
+        queue = self._queues[self._shard(update)]
+        try:
+            queue.put_nowait((time.perf_counter(), update))
+        except asyncio.QueueFull:
+            self._rejected.inc()
+            logger.warning(f"Очередь обновлений переполнена ({self.depth} ждут), обновление отклонено")
+            return False
+        self._enqueued.inc()
+        return True
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Дожидается обработки очереди (не дольше timeout) и останавливает воркеры"""
+        if self._queues:
+            try:
+                await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Очередь обновлений не разобрана за {timeout} с, осталось {self.depth}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+
+    def _shard(self, update: Any) -> int:
+        if self.key is not None:
+            key = self.key(update)
+            if key is not None:
+                return hash(key) % self.workers
+        # Без ключа распределяем по кругу
+        self._next = (self._next + 1) % self.workers
+        return self._next
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            enqueued_at, update = await queue.get()
+            started = time.perf_counter()
+            self._busy += 1
+            self._wait_ms.observe((started - enqueued_at) * 1000)
+            try:
+                await self.handler(update)
+                self._processed.inc()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed.inc()
+                logger.error(f"Ошибка обработки обновления из очереди: {e}")
+            finally:
+                self._busy -= 1
+                self._handle_ms.observe((time.perf_counter() - started) * 1000)
+                queue.task_done()
@@ -28,6 +28,52 @@ function canonLength(l) {
   return l ? l.replace(/\s*мм$/i, "") : "";
 }
 
+// ---------- канонический ключ размера (shared/size_key.py) ----------
+// Числа через "x" без префикса М: "М10х30" -> "10x30", "4,2 × 90 мм" -> "4.2x90".
+// Алгоритм совпадает с Python-версией - при изменении правьте оба места.
+const SIZE_NUMBER = "\\d+(?:\\.\\d+)?";
+const SIZE_RE = new RegExp(`(?<![\\d.])(${SIZE_NUMBER}(?:\\s*x\\s*${SIZE_NUMBER}){1,2})(?![\\d.])`, "g");
+const DIAMETER_RE = new RegExp(`^[mм]?\\s*(${SIZE_NUMBER}(?:\\s*x\\s*${SIZE_NUMBER})?)$`);
+const LENGTH_RE = new RegExp(`^(${SIZE_NUMBER})$`);
+
+function prepareSize(text) {
+  return String(text || "").toLowerCase()
+    .replace(/[×хx*]/g, "x")
+    .replace(/(\d),(\d)/g, "$1.$2")
+    .replace(/(\d)\s*мм/g, "$1")
+    .trim();
+}
+
+function joinSize(size: string): string {
+  return size.split("x").map(part => part.trim()).join("x");
+}
+
+// Ключ размера запроса (null, если нет диаметра или длины)
+function sizeKey(d, l): string | null {
+  const dm = prepareSize(d).match(DIAMETER_RE);
+  const lm = prepareSize(l).match(LENGTH_RE);
+  if (!dm || !lm) return null;
+  return `${joinSize(dm[1])}x${lm[1]}`;
+}
+
+// Ключи размеров в названии; для трехчастного размера и ключ первых двух чисел
+function sizeKeysFromText(text): string[] {
+  const keys: string[] = [];
+  for (const m of prepareSize(text).matchAll(SIZE_RE)) {
+    const key = joinSize(m[1]);
+    keys.push(key);
+    const parts = key.split("x");
+    if (parts.length === 3) keys.push(parts.slice(0, 2).join("x"));
+  }
+  return Array.from(new Set(keys));
+}
+
+// Ключи позиции каталога: колонка size_keys (заполняется при загрузке) или разбор названия
+function itemSizeKeys(item): string[] {
+  return Array.isArray(item?.size_keys) ? item.size_keys : sizeKeysFromText(item?.name);
+}
+
+// Варианты записи размера - только для запроса к базе без колонки size_keys или без ее значений
 function mxlVariants(d, l) {
   const D = canonDiameter(d), L = canonLength(l);
   if (!D || !L) return [];
@@ -73,6 +119,11 @@ function mxlVariants(d, l) {
 
 // ---------- РАНЖИРОВАНИЕ ----------
 
+// Нормализованное название: колонка name_normalized (считается при загрузке каталога) или normalizeStr
+function itemNormalizedName(item): string {
+  return item?.name_normalized || normalizeStr(item?.name || "");
+}
+
 // Интерфейсы для типизации
 interface MatchAnalysis {
   type_match: boolean;
@@ -91,16 +142,16 @@ interface ProbabilityData {
 interface RankingTokens {
   typeTok: string | null;
   stdToks: string[];
-  mxlToks: string[];
+  sizeKey: string | null;
   coatToks: string[];
 }
 
 // Упрощенная функция для определения причины совпадения
-function getMatchReason(name: string, tokens: RankingTokens): string {
-  const n = normalizeStr(name);
+function getMatchReason(item, tokens: RankingTokens): string {
+  const n = itemNormalizedName(item);
+  const sizeHit = tokens.sizeKey !== null && itemSizeKeys(item).includes(tokens.sizeKey);
   
-  if (tokens.typeTok && n.includes(tokens.typeTok) && 
-      tokens.mxlToks.some(t => n.includes(normalizeStr(t)))) {
+  if (tokens.typeTok && n.includes(tokens.typeTok) && sizeHit) {
     return 'Точное совпадение типа и размеров';
   }
   
@@ -112,7 +163,7 @@ function getMatchReason(name: string, tokens: RankingTokens): string {
     return 'Совпадение стандарта';
   }
   
-  if (tokens.mxlToks.some(t => n.includes(normalizeStr(t)))) {
+  if (sizeHit) {
     return 'Совпадение размеров';
   }
   
@@ -120,8 +171,8 @@ function getMatchReason(name: string, tokens: RankingTokens): string {
 }
 
 // Функция для детального анализа совпадений
-function analyzeMatches(name: string, tokens: RankingTokens): MatchAnalysis {
-  const n = normalizeStr(name);
+function analyzeMatches(item, tokens: RankingTokens): MatchAnalysis {
+  const n = itemNormalizedName(item);
   const analysis: MatchAnalysis = {
     type_match: false,
     standard_match: false,
@@ -150,12 +201,11 @@ function analyzeMatches(name: string, tokens: RankingTokens): MatchAnalysis {
     // Совпадение стандарта найдено
   }
   
-  // Проверяем совпадение размеров
-  const matchedSizes = tokens.mxlToks.filter(t => n.includes(normalizeStr(t)));
-  if (matchedSizes.length > 0) {
+  // Проверяем совпадение размеров: сравниваем канонические ключи
+  if (tokens.sizeKey !== null && itemSizeKeys(item).includes(tokens.sizeKey)) {
     analysis.size_match = true;
-    analysis.matched_tokens.push(...matchedSizes);
-    analysis.explanation.push(`✅ Совпадение размеров: "${matchedSizes.join(', ')}"`);
+    analysis.matched_tokens.push(tokens.sizeKey);
+    analysis.explanation.push(`✅ Совпадение размеров: "${tokens.sizeKey}"`);
     // Совпадение размеров найдено
   }
   
@@ -256,14 +306,14 @@ function calculateProbability(analysis: MatchAnalysis): ProbabilityData {
 // Основная функция ранжирования
 function rankResults(results: any[], tokens: RankingTokens, search_query: string) {
   return results.map(it => {
-    const analysis = analyzeMatches(it.name || "", tokens);
+    const analysis = analyzeMatches(it, tokens);
     const probabilityData = calculateProbability(analysis);
     
     return {
       ...it,
       relevance_score: probabilityData.probability,
       probability_percent: probabilityData.probability,
-      match_reason: getMatchReason(it.name || "", tokens),
+      match_reason: getMatchReason(it, tokens),
       explanation: probabilityData.explanation,
       matched_tokens: analysis.matched_tokens,
       search_query: search_query,
@@ -272,221 +322,256 @@ function rankResults(results: any[], tokens: RankingTokens, search_query: string
   }).sort((a, b) => b.probability_percent - a.probability_percent);
 }
 
-serve(async (req) => {
-  if (req.method === "OPTIONS") {
-    return new Response("ok", { headers: corsHeaders });
+// Поиск по ключу размера (колонка size_keys с GIN-индексом), при typeTok - вместе с типом.
+// Если колонки еще нет (миграция не применена) или поиск по ней ничего не нашел
+// (size_keys не заполнена) - прежний полнотекстовый запрос по вариантам записи размера
+async function searchBySize(supabase, typeTok, sizeKeyTok, user_intent) {
+  let query = supabase
+    .from("parts_catalog")
+    .select("*")
+    .contains("size_keys", [sizeKeyTok]);
+  if (typeTok) {
+    query = query.textSearch("search_vector", typeTok, { config: "russian", type: "websearch" });
+  }
+  const { data, error } = await query.limit(20);
+  if (error) {
+    console.error("Поиск по size_keys недоступен, используем варианты размеров:", error);
+  } else if (data?.length) {
+    return data;
   }
 
-  try {
-    const { search_query, user_intent } = await req.json();
-    
-    console.log('🔍 FastenerSearch: Получен запрос:', { 
-      search_query, 
-      user_intent_type: user_intent?.type,
-      is_simple_parsed: user_intent?.is_simple_parsed 
+  // size_keys остается NULL, пока каталог не перезагружен ingest_catalog.py
+  const searchQuery = [typeTok, ...mxlVariants(user_intent?.diameter, user_intent?.length)]
+    .filter(Boolean)
+    .join(" ");
+  const { data: legacyResults, error: legacyError } = await supabase
+    .from("parts_catalog")
+    .select("*")
+    .textSearch("search_vector", searchQuery, { config: "russian", type: "websearch" })
+    .limit(20);
+  if (legacyError) console.error("Полнотекстовый поиск по размеру, ошибка:", legacyError);
+  return legacyResults || [];
+}
+
+// Максимум позиций в одном batch-запросе
+const MAX_BATCH_SIZE = 50;
+
+// Поиск одной позиции: каскад шагов 1-5 и ранжирование
+async function searchOne(supabase, search_query, user_intent) {
+  console.log('🔍 FastenerSearch: Получен запрос:', { 
+    search_query, 
+    user_intent_type: user_intent?.type,
+    is_simple_parsed: user_intent?.is_simple_parsed 
+  });
+
+  // ---- ПОИСК ПО ПРИОРИТЕТУ ----
+  
+  // Тип детали
+  const typeTok = user_intent?.type ? normalizeStr(user_intent.type) : null;
+  
+  // Стандарты
+  const stdToks = [];
+  if (user_intent?.standard) {
+    const standard = user_intent.standard.toLowerCase();
+    stdToks.push(standard);
+    if (standard.includes("din")) {
+      stdToks.push(standard.replace(/\s+/g, "")); // DIN965
+      stdToks.push(standard.replace(/\s+/g, " ")); // DIN 965
+    }
+  }
+  
+  // Размеры: канонический ключ (сравнивается с size_keys позиций)
+  const sizeKeyTok = sizeKey(user_intent?.diameter, user_intent?.length);
+  
+  // Покрытия
+  const coatToks = [];
+  if (user_intent?.coating) {
+    const coating = user_intent.coating.toLowerCase();
+    coatToks.push(coating);
+    if (coating.includes("цинк")) {
+      coatToks.push("цинк", "оцинк", "оцинкованный");
+    }
+  }
+
+  console.log('🔍 FastenerSearch: Подготовленные токены:', {
+    typeTok, stdToks, sizeKeyTok, coatToks
+  });
+  
+  // Детальное логирование ключа размера
+  if (sizeKeyTok) {
+    console.log('🔍 FastenerSearch: Ключ размера:', sizeKeyTok);
+    console.log('🔍 FastenerSearch: Исходные размеры:', {
+      diameter: user_intent?.diameter,
+      length: user_intent?.length
     });
+  }
 
-    const supabase = createClient(
-      Deno.env.get("SUPABASE_URL") ?? "",
-      Deno.env.get("SUPABASE_ANON_KEY") ?? ""
-    );
+  let results = [];
 
-    // ---- ПОИСК ПО ПРИОРИТЕТУ ----
+  // ---- ШАГ 1: Векторный поиск по типу + ключ размера ----
+  if (typeTok && sizeKeyTok) {
+    console.log("🔍 Шаг 1: Векторный поиск по типу + ключ размера");
+    results = await searchBySize(supabase, typeTok, sizeKeyTok, user_intent);
+    console.log("🔍 Шаг 1 найдено:", results.length);
+  }
+
+  // ---- ШАГ 2: Векторный поиск только по типу ----
+  if (results.length === 0 && typeTok) {
+    console.log("🔍 Шаг 2: Векторный поиск только по типу");
     
-    // Тип детали
-    const typeTok = user_intent?.type ? normalizeStr(user_intent.type) : null;
+    const searchQuery = typeTok;
+    console.log("🔍 Векторный запрос:", searchQuery);
     
-    // Стандарты
-    const stdToks = [];
-    if (user_intent?.standard) {
-      const standard = user_intent.standard.toLowerCase();
-      stdToks.push(standard);
-      if (standard.includes("din")) {
-        stdToks.push(standard.replace(/\s+/g, "")); // DIN965
-        stdToks.push(standard.replace(/\s+/g, " ")); // DIN 965
-      }
-    }
+    const { data: step2Results, error } = await supabase
+      .from("parts_catalog")
+      .select("*")
+      .textSearch("search_vector", searchQuery, { config: "russian", type: "websearch" })
+      .limit(20);
     
-    // Размеры
-    const mxlToks = mxlVariants(user_intent?.diameter, user_intent?.length);
+    if (error) console.error("Шаг 2 ошибка:", error);
     
-    // Покрытия
-    const coatToks = [];
-    if (user_intent?.coating) {
-      const coating = user_intent.coating.toLowerCase();
-      coatToks.push(coating);
-      if (coating.includes("цинк")) {
-        coatToks.push("цинк", "оцинк", "оцинкованный");
-      }
-    }
+    results = step2Results || [];
+    console.log("🔍 Шаг 2 найдено:", results.length);
+  }
 
-    console.log('🔍 FastenerSearch: Подготовленные токены:', {
-      typeTok, stdToks, mxlToks, coatToks
-    });
+  // ---- ШАГ 3: Поиск по ключу размера ----
+  if (results.length === 0 && sizeKeyTok) {
+    console.log("🔍 Шаг 3: Поиск по ключу размера");
+    results = await searchBySize(supabase, null, sizeKeyTok, user_intent);
+    console.log("🔍 Шаг 3 найдено:", results.length);
+  }
+
+  // ---- ШАГ 4: Поиск по стандарту ----
+  if (results.length === 0 && stdToks.length > 0) {
+    console.log("🔍 Шаг 4: Поиск по стандарту");
     
-    // Детальное логирование токенов размеров
-    if (mxlToks.length > 0) {
-      console.log('🔍 FastenerSearch: Токены размеров:', mxlToks);
-      console.log('🔍 FastenerSearch: Исходные размеры:', {
-        diameter: user_intent?.diameter,
-        length: user_intent?.length
-      });
-    }
+    const stdConds = stdToks.map(t => `name.ilike.%${escapeSqlLike(t)}%`).join(",");
+    
+    const { data: step4Results, error } = await supabase
+      .from("parts_catalog")
+      .select("*")
+      .or(stdConds)
+      .limit(20);
+    
+    if (error) console.error("Шаг 4 ошибка:", error);
+    
+    results = step4Results || [];
+    console.log("🔍 Шаг 4 найдено:", results.length);
+  }
 
-    let results = [];
-
-    // ---- ШАГ 1: Векторный поиск по типу + размеры ----
-    if (typeTok && mxlToks.length > 0) {
-      console.log("🔍 Шаг 1: Векторный поиск по типу + размеры");
-      
-      // Создаем поисковый запрос для векторного поиска (websearch, русская морфология)
-      const searchQuery = [typeTok, ...mxlToks].join(" ");
-      console.log("🔍 Векторный запрос:", searchQuery);
-      
-      const { data: step1Results, error } = await supabase
-        .from("parts_catalog")
-        .select("*")
-        .textSearch("search_vector", searchQuery, { config: "russian", type: "websearch" })
-        .limit(20);
-      
-      if (error) console.error("Шаг 1 ошибка:", error);
-      
-      results = step1Results || [];
-      console.log("🔍 Шаг 1 найдено:", results.length);
-    }
+  // ---- ШАГ 5: Поиск по покрытию ----
+  if (results.length === 0 && coatToks.length > 0) {
+    console.log("🔍 Шаг 5: Поиск по покрытию");
+    
+    const coatConds = coatToks.map(t => `name.ilike.%${escapeSqlLike(t)}%`).join(",");
+    
+    const { data: step5Results, error } = await supabase
+      .from("parts_catalog")
+      .select("*")
+      .or(coatConds)
+      .limit(20);
+    
+    if (error) console.error("Шаг 5 ошибка:", error);
+    
+    results = step5Results || [];
+    console.log("🔍 Шаг 5 найдено:", results.length);
+  }
 
-    // ---- ШАГ 2: Векторный поиск только по типу ----
-    if (results.length === 0 && typeTok) {
-      console.log("🔍 Шаг 2: Векторный поиск только по типу");
-      
-      const searchQuery = typeTok;
-      console.log("🔍 Векторный запрос:", searchQuery);
-      
-      const { data: step2Results, error } = await supabase
-        .from("parts_catalog")
-        .select("*")
-        .textSearch("search_vector", searchQuery, { config: "russian", type: "websearch" })
-        .limit(20);
-      
-      if (error) console.error("Шаг 2 ошибка:", error);
-      
-      results = step2Results || [];
-      console.log("🔍 Шаг 2 найдено:", results.length);
-    }
+  console.log("🔍 FastenerSearch: Итого найдено результатов:", results.length);
 
-    // ---- ШАГ 3: Векторный поиск по размеру ----
-    if (results.length === 0 && mxlToks.length > 0) {
-      console.log("🔍 Шаг 3: Векторный поиск по размеру");
-      
-      const searchQuery = mxlToks.join(" ");
-      console.log("🔍 Векторный запрос:", searchQuery);
-      
-      const { data: step3Results, error } = await supabase
-        .from("parts_catalog")
-        .select("*")
-        .textSearch("search_vector", searchQuery, { config: "russian", type: "websearch" })
-        .limit(20);
-      
-      if (error) console.error("Шаг 3 ошибка:", error);
-      
-      results = step3Results || [];
-      console.log("🔍 Шаг 3 найдено:", results.length);
-    }
+  // ---- Ранжирование результатов ----
+  const tokens: RankingTokens = { typeTok, stdToks, sizeKey: sizeKeyTok, coatToks };
+  const ranked = rankResults(results, tokens, search_query);
 
-    // ---- ШАГ 4: Поиск по стандарту ----
-    if (results.length === 0 && stdToks.length > 0) {
-      console.log("🔍 Шаг 4: Поиск по стандарту");
-      
-      const stdConds = stdToks.map(t => `name.ilike.%${escapeSqlLike(t)}%`).join(",");
-      
-      const { data: step4Results, error } = await supabase
-        .from("parts_catalog")
-        .select("*")
-        .or(stdConds)
-        .limit(20);
-      
-      if (error) console.error("Шаг 4 ошибка:", error);
-      
-      results = step4Results || [];
-      console.log("🔍 Шаг 4 найдено:", results.length);
-    }
+  console.log("🔍 FastenerSearch: Отранжировано результатов:", ranked.length);
+  if (ranked.length > 0) {
+    console.log("🔍 FastenerSearch: Топ-3 по релевантности:", 
+      ranked.slice(0, 3).map(r => ({ 
+        name: r.name, 
+        sku: r.sku, 
+        score: r.relevance_score,
+        probability_percent: r.probability_percent,
+        reason: r.match_reason 
+      }))
+    );
+    
+    // Детальное логирование первого результата для отладки
+    const firstResult = ranked[0];
+    console.log("🔍 FastenerSearch: Детали первого результата:", {
+      name: firstResult.name,
+      sku: firstResult.sku,
+      probability_percent: firstResult.probability_percent,
+      relevance_score: firstResult.relevance_score,
+      match_reason: firstResult.match_reason,
+      explanation: firstResult.explanation,
+      matched_tokens: firstResult.matched_tokens
+    });
+  }
 
-    // ---- ШАГ 5: Поиск по покрытию ----
-    if (results.length === 0 && coatToks.length > 0) {
-      console.log("🔍 Шаг 5: Поиск по покрытию");
-      
-      const coatConds = coatToks.map(t => `name.ilike.%${escapeSqlLike(t)}%`).join(",");
-      
-      const { data: step5Results, error } = await supabase
-        .from("parts_catalog")
-        .select("*")
-        .or(coatConds)
-        .limit(20);
-      
-      if (error) console.error("Шаг 5 ошибка:", error);
-      
-      results = step5Results || [];
-      console.log("🔍 Шаг 5 найдено:", results.length);
+  return {
+    results: ranked,
+    search_metadata: {
+      query_type: user_intent?.is_simple_parsed ? 'simple' : 'complex',
+      total_results: ranked.length,
+      search_time_ms: Date.now(),
+      used_fallback: false
     }
+  };
+}
 
-    console.log("🔍 FastenerSearch: Итого найдено результатов:", results.length);
-
-    // ---- Ранжирование результатов ----
-    const tokens: RankingTokens = { typeTok, stdToks, mxlToks, coatToks };
-    const ranked = rankResults(results, tokens, search_query);
-
-    console.log("🔍 FastenerSearch: Отранжировано результатов:", ranked.length);
-    if (ranked.length > 0) {
-      console.log("🔍 FastenerSearch: Топ-3 по релевантности:", 
-        ranked.slice(0, 3).map(r => ({ 
-          name: r.name, 
-          sku: r.sku, 
-          score: r.relevance_score,
-          probability_percent: r.probability_percent,
-          reason: r.match_reason 
-        }))
-      );
-      
-      // Детальное логирование первого результата для отладки
-      const firstResult = ranked[0];
-      console.log("🔍 FastenerSearch: Детали первого результата:", {
-        name: firstResult.name,
-        sku: firstResult.sku,
-        probability_percent: firstResult.probability_percent,
-        relevance_score: firstResult.relevance_score,
-        match_reason: firstResult.match_reason,
-        explanation: firstResult.explanation,
-        matched_tokens: firstResult.matched_tokens
-      });
-    }
+function jsonResponse(body, status = 200) {
+  return new Response(JSON.stringify(body), {
+    headers: {
+      ...corsHeaders,
+      "Content-Type": "application/json"
+    },
+    status
+  });
+}
+
+serve(async (req) => {
+  if (req.method === "OPTIONS") {
+    return new Response("ok", { headers: corsHeaders });
+  }
+
+  try {
+    const body = await req.json();
+
+    const supabase = createClient(
+      Deno.env.get("SUPABASE_URL") ?? "",
+      Deno.env.get("SUPABASE_ANON_KEY") ?? ""
+    );
 
-    return new Response(JSON.stringify({
-      results: ranked,
-      search_metadata: {
-        query_type: user_intent?.is_simple_parsed ? 'simple' : 'complex',
-        total_results: ranked.length,
-        search_time_ms: Date.now(),
-        used_fallback: false
+    // Batch-контракт: { queries: [{ search_query, user_intent }, ...] }
+    //   -> { batch_results: [{ results, search_metadata } | { error }, ...] } в том же порядке
+    if (Array.isArray(body?.queries)) {
+      if (body.queries.length > MAX_BATCH_SIZE) {
+        return jsonResponse({
+          error: "Batch too large",
+          details: `max ${MAX_BATCH_SIZE} queries per request`
+        }, 400);
       }
-    }), {
-      headers: {
-        ...corsHeaders,
-        "Content-Type": "application/json"
-      },
-      status: 200
-    });
+
+      console.log('🔍 FastenerSearch: Batch-запрос, позиций:', body.queries.length);
+      const batch_results = await Promise.all(body.queries.map(async (q) => {
+        try {
+          return await searchOne(supabase, q?.search_query, q?.user_intent);
+        } catch (e) {
+          console.error("❌ FastenerSearch: Ошибка позиции batch:", e);
+          return { error: e?.message || String(e) };
+        }
+      }));
+      return jsonResponse({ batch_results });
+    }
+
+    const { search_query, user_intent } = body;
+    return jsonResponse(await searchOne(supabase, search_query, user_intent));
 
   } catch (e) {
     console.error("❌ FastenerSearch: Критическая ошибка:", e);
-    return new Response(JSON.stringify({
+    return jsonResponse({
       error: "Internal error",
       details: e?.message || String(e)
-    }), {
-      headers: {
-        ...corsHeaders,
-        "Content-Type": "application/json"
-      },
-      status: 500
-    });
+    }, 500);
   }
 });
\ No newline at end of file
@@ -0,0 +1,6 @@
+-- Канонические ключи размеров позиций каталога ("10x30", "4.2x90", "8x100x12")
+-- Заполняются при загрузке каталога (shared/size_key.py), используются
+-- fastener-search вместо генерации вариантов записи размера на каждый запрос.
+ALTER TABLE parts_catalog ADD COLUMN IF NOT EXISTS size_keys TEXT[];
+
+CREATE INDEX IF NOT EXISTS parts_catalog_size_keys_idx ON parts_catalog USING GIN (size_keys);
@@ -0,0 +1,10 @@
+-- Поля поиска, которые ingest_catalog.py считает из названия один раз при загрузке
+-- (services/catalog_ingest.py), вместо разбора названий на каждый запрос
+ALTER TABLE parts_catalog ADD COLUMN IF NOT EXISTS diameter VARCHAR(20);
+ALTER TABLE parts_catalog ADD COLUMN IF NOT EXISTS length VARCHAR(20);
+ALTER TABLE parts_catalog ADD COLUMN IF NOT EXISTS standard VARCHAR(50);
+ALTER TABLE parts_catalog ADD COLUMN IF NOT EXISTS strength_class VARCHAR(20);
+ALTER TABLE parts_catalog ADD COLUMN IF NOT EXISTS coating VARCHAR(50);
+ALTER TABLE parts_catalog ADD COLUMN IF NOT EXISTS name_normalized TEXT;
+
+CREATE INDEX IF NOT EXISTS parts_catalog_standard_idx ON parts_catalog (standard);
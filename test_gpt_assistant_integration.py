@@ -91,7 +91,7 @@ async def test_gpt_assistant_integration():
         print("✅ Обработка текстового сообщения завершена успешно")
         
         # Проверяем, что GPT ассистент был вызван
-        handler.openai_service.analyze_with_assistant.assert_called_once_with(test_text)
+        handler.openai_service.analyze_with_assistant.assert_called_once_with(test_text, chat_id="67890")
         print("✅ GPT ассистент был вызван")
         
         # Проверяем, что Excel был сгенерирован
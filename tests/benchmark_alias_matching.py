@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска по алиасам: прежние вложенные циклы алиасы x позиции
+против словаря алиасов CatalogIndex на каталоге из Source/
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.matching_engine import MatchingEngine
+from tests.test_alias_matching import load_catalog, legacy_alias_matches, parsed
+
+
+def run(repeat: int = 5):
+    items, aliases = load_catalog()
+    engine = MatchingEngine()
+    engine.typo_min_similarity = 0
+    index = CatalogIndex(items, engine.type_patterns, aliases)
+    lines = [parsed(alias['alias']) for alias in aliases] * repeat
+
+    async def run_new():
+        for line in lines:
+            await engine.find_local_candidates(line, items, aliases, index)
+
+    async def run_legacy():
+        for line in lines:
+            engine.finalize_candidates(line, legacy_alias_matches(line, aliases, items))
+
+    start = time.perf_counter()
+    asyncio.run(run_legacy())
+    legacy_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    asyncio.run(run_new())
+    new_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Каталог: {len(items)} позиций, {len(aliases)} алиасов, {len(lines)} строк")
+    print(f"{'циклы (прежний)':>20} | {legacy_ms:>8.1f} ms")
+    print(f"{'словарь алиасов':>20} | {new_ms:>8.1f} ms | {legacy_ms / max(new_ms, 1e-6):.1f}x")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    run()
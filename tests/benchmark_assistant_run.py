@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк ожидания ответа ассистента на локальном сервере Assistants API
+Сравниваем прежний опрос раз в секунду, опрос с растущей паузой и SSE-поток:
+задержка запуска сверх времени работы "модели" и число запросов к API.
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from openai import AsyncOpenAI
+
+from services.openai_service import OpenAIService
+from tests.fake_assistants_server import FakeAssistantsServer
+
+
+async def measure(mode: str, poll_initial: float, poll_max: float, queue_delay: float, work_delays: tuple):
+    """(мс на запуск, лишние мс сверх queue+work, запросов к API на запуск)"""
+    server = FakeAssistantsServer(queue_delay=queue_delay)
+    base_url = await server.start()
+    try:
+        service = OpenAIService()
+        service.client = AsyncOpenAI(api_key='test', base_url=base_url, max_retries=0,
+                                     default_headers={"OpenAI-Beta": "assistants=v2"})
+        service.run_mode = mode
+        service.poll_initial = poll_initial
+        service.poll_max = poll_max
+
+        server.work_delay = 0.0
+        await service.analyze_with_assistant('прогрев')
+        server.calls.clear()
+        elapsed = 0.0
+        for work_delay in work_delays:
+            server.work_delay = work_delay
+            start = time.perf_counter()
+            await service.analyze_with_assistant('болт М8х40 DIN 933 оцинкованный')
+            elapsed += time.perf_counter() - start
+    finally:
+        await server.stop()
+    runs = len(work_delays)
+    busy = queue_delay * runs + sum(work_delays)
+    return elapsed * 1000 / runs, (elapsed - busy) * 1000 / runs, sum(server.calls.values()) / runs
+
+
+def run(queue_delay: float = 0.3, work_delays: tuple = (0.6, 1.1, 1.7, 2.9, 4.3)):
+    """Время работы разное, чтобы опрос не совпадал по фазе с завершением"""
+    print(f"Запуск: {queue_delay * 1000:.0f} мс в очереди + {', '.join(f'{d:g}' for d in work_delays)} с работы")
+    print(f"{'':>26} | {'ms/run':>8} | {'сверх, ms':>9} | {'запросов/run':>12}")
+    print("-" * 66)
+    for label, mode, initial, maximum in (
+        ('poll 1 s (прежний)', 'poll', 1.0, 1.0),
+        ('poll 50 -> 500 ms', 'poll', 0.05, 0.5),
+        ('poll 50 -> 250 ms', 'poll', 0.05, 0.25),
+        ('stream (SSE)', 'stream', 0.05, 0.5),
+    ):
+        ms, overhead, calls = asyncio.run(measure(mode, initial, maximum, queue_delay, work_delays))
+        print(f"{label:>26} | {ms:>8.1f} | {overhead:>9.1f} | {calls:>12.1f}")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    run()
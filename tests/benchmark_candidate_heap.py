@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк отбора кандидатов: все совпадения выше порога (top_k=0) против ограниченной кучи
+Профиль аллокаций (tracemalloc) и число созданных MatchCandidate на строку при 100k SKU
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tracemalloc
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import TextParser
+from tests.benchmark_matching_engine import LINES, synthetic_catalog
+
+
+async def rank(engine: MatchingEngine, parsed_line, index: CatalogIndex):
+    return await engine.find_local_candidates(parsed_line, index.items, index.aliases, index)
+
+
+def profile(engine: MatchingEngine, parsed_lines, index: CatalogIndex):
+    """(мс на строку, пик аллокаций КБ на строку, MatchCandidate на строку)"""
+    built = 0
+    item_candidate = engine._item_candidate
+
+    def counting(*args, **kwargs):
+        nonlocal built
+        built += 1
+        return item_candidate(*args, **kwargs)
+
+    engine._item_candidate = counting
+    peak = elapsed = 0.0
+    try:
+        for parsed_line in parsed_lines:
+            tracemalloc.start()
+            asyncio.run(rank(engine, parsed_line, index))
+            peak += tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            asyncio.run(rank(engine, parsed_line, index))
+            elapsed += time.perf_counter() - start
+    finally:
+        engine._item_candidate = item_candidate
+    count = len(parsed_lines)
+    return elapsed * 1000 / count, peak / 1024 / count, built / 2 / count
+
+
+def run(size: int = 100_000):
+    parsed_lines = TextParser().parse_text_input("\n".join(LINES))
+    items = synthetic_catalog(size)
+
+    full_engine = MatchingEngine()
+    full_engine.top_k = 0
+    heap_engine = MatchingEngine()
+    for engine in (full_engine, heap_engine):
+        engine.typo_min_similarity = 0
+        engine.vector_min_shortlist = float('inf')
+    index = CatalogIndex(items, heap_engine.type_patterns)
+
+    print(f"Каталог: {size} SKU, строк: {len(parsed_lines)}")
+    print(f"{'':>22} | {'ms/line':>8} | {'peak alloc, KB/line':>19} | {'MatchCandidate/line':>19}")
+    print("-" * 78)
+    for label, engine in (
+        ('all candidates', full_engine),
+        (f'heap top-{heap_engine.top_k}', heap_engine),
+    ):
+        ms, peak_kb, built = profile(engine, parsed_lines, index)
+        print(f"{label:>22} | {ms:>8.2f} | {peak_kb:>19.1f} | {built:>19.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк представления каталога: список словарей против CatalogStore
+Замеряем память (tracemalloc и RSS) и время полного прохода по 100k SKU
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.catalog_store import CatalogStore
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import TextParser
+from tests.benchmark_matching_engine import LINES, synthetic_catalog
+
+
+def rss_mb() -> float:
+    """Текущий RSS процесса, МБ (Linux)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return float('nan')
+
+
+def measure(build):
+    """Строит представление каталога; возвращает (объект, МБ по tracemalloc, прирост RSS, МБ)"""
+    gc.collect()
+    rss_before = rss_mb()
+    tracemalloc.start()
+    result = build()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    return result, allocated / 2 ** 20, rss_mb() - rss_before
+
+
+def scan_specs(items) -> int:
+    """Проход по всем позициям: сравнение диаметра, как в _calculate_specs_similarity"""
+    matched = 0
+    for item in items:
+        specs = item.get('specs_json', {})
+        if (specs.get('diameter', '') or '').lower() == 'm10':
+            matched += 1
+    return matched
+
+
+def scan_column(store: CatalogStore) -> int:
+    """Тот же проход по колонке диаметров без построения представлений"""
+    return sum(1 for diameter in store.specs['diameter'] if (diameter or '').lower() == 'm10')
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(size: int = 100_000):
+    engine = MatchingEngine()
+    parsed_line = TextParser().parse_text_input(LINES[0])[0]
+
+    items, dict_mb, dict_rss = measure(lambda: synthetic_catalog(size))
+    store, store_mb, store_rss = measure(lambda: CatalogStore(synthetic_catalog(size)))
+
+    print(f"Каталог: {size} SKU")
+    print(f"{'':>22} | {'tracemalloc, MB':>15} | {'RSS, MB':>8} | {'scan specs, ms':>14} | {'similarity, ms':>14} | {'index, ms':>9}")
+    print("-" * 100)
+    for label, catalog, mb, rss in (('list[dict]', items, dict_mb, dict_rss), ('CatalogStore', store, store_mb, store_rss)):
+        scan_ms = timed(scan_specs, catalog)
+        similarity_ms = timed(lambda: [engine._calculate_similarity(parsed_line, item) for item in catalog], repeat=1)
+        index_ms = timed(CatalogIndex, catalog, engine.type_patterns, repeat=1)
+        print(f"{label:>22} | {mb:>15.1f} | {rss:>8.1f} | {scan_ms:>14.1f} | {similarity_ms:>14.1f} | {index_ms:>9.1f}")
+    print(f"{'CatalogStore (column)':>22} | {'':>15} | {'':>8} | {timed(scan_column, store):>14.1f} | {'':>14} | {'':>9}")
+    print(f"Экономия памяти: {dict_mb / store_mb:.1f}x")
+
+
+if __name__ == "__main__":
+    run()
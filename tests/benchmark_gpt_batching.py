@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пакетной GPT-валидации: 40 неуверенных строк, последовательно и пакетами
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from services.gpt_validator import GPTValidator
+from tests.fake_openai import FakeOpenAIService
+from tests.test_gpt_batching import make_lines
+
+
+async def run(lines: int = 40, latency: float = 0.8):
+    """latency - типичное время ответа gpt-4o-mini на один промпт (секунды)"""
+    order = make_lines(lines)
+
+    for label, batched in (("последовательно", False), ("пакетами", True)):
+        fake = FakeOpenAIService(latency=latency)
+        validator = GPTValidator()
+        validator.openai_service = fake
+
+        start = time.perf_counter()
+        if batched:
+            await validator.validate_batch(order)
+        else:
+            for parsed_line, candidates in order:
+                await validator.validate_single_line(parsed_line, candidates)
+        elapsed = time.perf_counter() - start
+
+        print(f"{label}: {lines} строк, {fake.calls} вызовов GPT, {elapsed:.2f} с")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
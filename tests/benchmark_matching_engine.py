@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк MatchingEngine: полный перебор каталога против индекса
+и векторной оценки шортлиста через NumPy (если установлен)
+Замеряем задержку на одну строку при 1k/10k/100k SKU
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import TextParser
+from pipeline.vector_scoring import get_vector_scorer, vector_scoring_available
+
+TYPES = ['Болт', 'Винт', 'Гайка', 'Шайба', 'Анкер клиновой', 'Саморез', 'Шуруп', 'Дюбель']
+STANDARDS = ['DIN 933', 'DIN 931', 'DIN 912', 'DIN 7985', 'ГОСТ 7798', 'ISO 4017']
+COATINGS = ['цинк', 'оцинк', 'нерж', 'латунь', '']
+
+LINES = [
+    "болт М10х30 DIN 933 оцинк",
+    "саморез 4,2х90",
+    "анкер клиновой М12х120",
+    "гайка М8 DIN 934",
+    "винт М6х20 DIN 912",
+]
+
+
+def synthetic_catalog(size: int, seed: int = 42) -> list:
+    """Генерирует синтетический каталог заданного размера"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(size):
+        item_type = rng.choice(TYPES)
+        diameter = rng.choice([3, 4, 5, 6, 8, 10, 12, 14, 16, 20])
+        length = rng.choice([10, 16, 20, 25, 30, 40, 50, 60, 80, 100, 120])
+        standard = rng.choice(STANDARDS)
+        coating = rng.choice(COATINGS)
+        items.append({
+            'sku': f'SKU-{i:06d}',
+            'name': f'{item_type} {standard} М{diameter}х{length} {coating}'.strip(),
+            'pack_qty': rng.choice([25, 50, 100, 200]),
+            'price': round(rng.uniform(0.5, 50), 2),
+            'unit': 'шт',
+            'is_active': True,
+            'specs_json': {
+                'diameter': f'M{diameter}',
+                'length': str(length),
+                'coating': coating,
+            }
+        })
+    return items
+
+
+def scan_line(engine: MatchingEngine, parsed_line, items: list) -> int:
+    """Старый путь: similarity для каждой позиции каталога"""
+    matched = 0
+    for item in items:
+        if engine._calculate_similarity(parsed_line, item) > 0.1:
+            matched += 1
+    return matched
+
+
+def index_ms_per_line(engine: MatchingEngine, parsed_lines, index: CatalogIndex) -> float:
+    start = time.perf_counter()
+    for parsed_line in parsed_lines:
+        asyncio.run(engine.find_local_candidates(parsed_line, index.items, index.aliases, index))
+    return (time.perf_counter() - start) * 1000 / len(parsed_lines)
+
+
+def run(sizes=(1_000, 10_000, 100_000)):
+    parser = TextParser()
+    parsed_lines = parser.parse_text_input("\n".join(LINES))
+    engine = MatchingEngine()
+    engine.vector_min_shortlist = float('inf')
+    # Векторная оценка включается с VECTOR_SCORING_MIN_SHORTLIST позиций в шортлисте
+    vector_engine = MatchingEngine()
+    # Все совпадения выше порога, как при полном переборе, без исправления опечаток
+    for matcher in (engine, vector_engine):
+        matcher.top_k = 0
+        matcher.typo_min_similarity = 0
+
+    print(f"{'SKU':>8} | {'build, ms':>10} | {'scan, ms/line':>14} | {'index, ms/line':>15} | {'speedup':>8} | {'numpy, ms/line':>15}")
+    print("-" * 86)
+    for size in sizes:
+        items = synthetic_catalog(size)
+
+        start = time.perf_counter()
+        index = CatalogIndex(items)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for parsed_line in parsed_lines:
+            scan_line(engine, parsed_line, items)
+        scan_ms = (time.perf_counter() - start) * 1000 / len(parsed_lines)
+
+        index_ms = index_ms_per_line(engine, parsed_lines, index)
+
+        numpy_column = f"{'-':>15}"
+        if vector_scoring_available():
+            get_vector_scorer(index)
+            numpy_column = f"{index_ms_per_line(vector_engine, parsed_lines, index):>15.2f}"
+
+        print(f"{size:>8} | {build_ms:>10.1f} | {scan_ms:>14.2f} | {index_ms:>15.2f} | {scan_ms / index_ms:>7.1f}x | {numpy_column}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк MessagePipeline._handle_multiple_order_search: 30 позиций, поштучно (последовательно, параллельно) и batch
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+import pipeline.message_processor as message_processor
+from pipeline.message_processor import MessagePipeline
+
+
+async def run(items_count: int = 30, unique: int = 24, latency: float = 0.5):
+    """latency - время ответа fastener-search на один запрос (секунды)"""
+    items = [{'type': 'саморез', 'diameter': f'{n % unique + 3}.5', 'length': '35'} for n in range(items_count)]
+
+    async def fake_search(query, user_intent):
+        await asyncio.sleep(latency)
+        return [{'sku': query, 'name': query, 'probability_percent': 90}]
+
+    async def no_batch(supabase_url, supabase_key, queries, **kwargs):
+        return [None] * len(queries)
+
+    async def fake_batch(supabase_url, supabase_key, queries, **kwargs):
+        # Один HTTP-запрос на весь заказ
+        await asyncio.sleep(latency)
+        return [[{'sku': query, 'name': query, 'probability_percent': 90}] for query, _ in queries]
+
+    message_processor.search_parts_direct = fake_search
+    pipeline = MessagePipeline.__new__(MessagePipeline)
+
+    for label, concurrency, batch in (("последовательно", 1, no_batch), ("параллельно", 8, no_batch),
+                                      ("batch", 8, fake_batch)):
+        message_processor.SEARCH_CONCURRENCY = concurrency
+        message_processor.fastener_search_batch = batch
+        start = time.perf_counter()
+        results = await pipeline._handle_multiple_order_search(items)
+        elapsed = time.perf_counter() - start
+        print(f"{label} (SEARCH_CONCURRENCY={concurrency}): {len(results)} позиций, {elapsed:.2f} с")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
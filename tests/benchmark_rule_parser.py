@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк локального разбора строк правилами перед ассистентом
+Запросы - из логов в репозитории (supabase_analysis_*.csv, test_results_user_request.json)
+и типовые заказы. Считаем долю строк, которые не уходят ассистенту, и время
+обработки текстового сообщения, когда ассистент - локальный сервер Assistants API
+с задержками, близкими к реальному запуску.
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from openai import AsyncOpenAI
+
+from pipeline.text_parser import TextParser
+from services.message_processor import MessageProcessor
+from services.rule_parser import RuleParser
+from tests.fake_assistants_server import FakeAssistantsServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_REQUESTS = [
+    "болт М10х30 DIN 933 оцинк 200 шт\nгайка М10 DIN 934 200 шт\nшайба М10 DIN 125 400 шт",
+    "саморез 4,2х90 1000 шт",
+    "анкер клиновой М12х120 50 шт\nанкер-болт М10х100 30 шт",
+    "винт М6х20 DIN 912 100 шт\nгровер М6 100 шт",
+    "дюбель 6х40 500 шт\nсаморез клоп 4,2х13 1000 шт",
+    "Анкер забиваемый латунный М10",
+    "нужно что-то для крепления гипсокартона",
+    "болт М8х40 100 шт\nшайба плоская\nшпилька М10х1000 5 шт",
+]
+
+
+def logged_requests() -> list:
+    """Тексты запросов из выгрузок Supabase и позиции сохраненного запроса пользователя"""
+    requests = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'supabase_analysis_*.csv'))):
+        with open(path, encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row['original_content'] not in requests:
+                    requests.append(row['original_content'])
+    path = os.path.join(ROOT, 'test_results_user_request.json')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            results = json.load(f)['detailed_results']
+        requests.append('\n'.join(result['search_query'] for result in results))
+    return requests
+
+
+def assistant_reply(text: str) -> str:
+    """Ответ ассистента: по позиции на каждую строку запроса (после строки с инструкцией)"""
+    items = [{'type': 'болт', 'diameter': 'M8', 'length': '40', 'confidence': 0.9}
+             for line in text.split('\n\n', 1)[-1].split('\n') if line.strip()]
+    return json.dumps(items[0] if len(items) == 1 else {'items': items}, ensure_ascii=False)
+
+
+async def measure(requests: list, min_confidence: float, queue_delay: float, work_delay: float):
+    """(мс на запрос, запусков ассистента)"""
+    server = FakeAssistantsServer(queue_delay=queue_delay, work_delay=work_delay, reply=assistant_reply)
+    base_url = await server.start()
+    try:
+        processor = MessageProcessor()
+        processor.rule_parser = RuleParser(min_confidence=min_confidence)
+        processor.openai_service.client = AsyncOpenAI(api_key='test', base_url=base_url, max_retries=0,
+                                                      default_headers={"OpenAI-Beta": "assistants=v2"})
+        processor.openai_service.run_mode = 'stream'
+        start = time.perf_counter()
+        for text in requests:
+            await processor._process_text_message(SimpleNamespace(text=text))
+        elapsed = time.perf_counter() - start
+    finally:
+        await server.stop()
+    return elapsed * 1000 / len(requests), server.calls['runs.create']
+
+
+def run(queue_delay: float = 0.3, work_delay: float = 1.0, min_confidence: float = 0.8):
+    requests = logged_requests() + SAMPLE_REQUESTS
+    parser = RuleParser(min_confidence=min_confidence)
+
+    lines = [line for text in requests for line in parser.parse(text)]
+    local = [line for line in lines if line.confident]
+    print(f"Запросов: {len(requests)}, строк: {len(lines)}, порог уверенности: {min_confidence}")
+    print(f"Без ассистента: {len(local)} строк ({len(local) / len(lines):.0%})")
+    for line in lines:
+        print(f"  {'local' if line.confident else 'GPT  '} {line.item['confidence']:.2f}  {line.line}")
+
+    cold = RuleParser(min_confidence=min_confidence, parser=TextParser())
+    start = time.perf_counter()
+    for text in requests:
+        cold.parse(text)
+    cold_us = (time.perf_counter() - start) * 1e6 / len(lines)
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in requests:
+            parser.parse(text)
+    cached_us = (time.perf_counter() - start) * 1e6 / (rounds * len(lines))
+    print(f"Разбор правилами: {cold_us:.1f} мкс/строку, из кэша строк {cached_us:.1f} мкс/строку")
+
+    print()
+    print(f"Ассистент: {queue_delay * 1000:.0f} мс в очереди + {work_delay * 1000:.0f} мс работы на запуск")
+    print(f"{'':>22} | {'ms/запрос':>10} | {'запусков':>9}")
+    print("-" * 48)
+    baseline = None
+    for label, threshold in (('все строки в GPT', 1.01), ('разбор правилами', min_confidence)):
+        ms, runs = asyncio.run(measure(requests, threshold, queue_delay, work_delay))
+        baseline = baseline or ms
+        print(f"{label:>22} | {ms:>10.1f} | {runs:>9}")
+    print(f"Экономия: {baseline - ms:.0f} мс на запрос ({1 - ms / baseline:.0%})")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    run()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк TextParser.parse_text_input на заказе из 10k строк
+"""
+
+import os
+import sys
+import time
+import random
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.text_parser import TextParser
+
+TEMPLATES = [
+    "болт М{d}х{l} DIN 933 оцинк {q} шт",
+    "саморез {d},2х{l} {q}шт",
+    "Анкер клиновой М{d}х{l} {q} уп",
+    "гайка M{d} DIN 934 цинк",
+    "- шайба плоская М{d} нержавейка {q} штук",
+    "винт din М{d}*{l} кл.пр.8.8",
+    "шестерка {l}мм латунь",
+    "клиновой анкер {d}x{l} мм",
+]
+
+
+def make_order(lines: int = 10_000, seed: int = 7) -> str:
+    """Генерирует заказ из заданного числа строк"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(lines):
+        template = rng.choice(TEMPLATES)
+        out.append(template.format(
+            d=rng.choice([4, 5, 6, 8, 10, 12, 16]),
+            l=rng.choice([20, 30, 40, 60, 90, 120]),
+            q=rng.randint(1, 500),
+        ))
+    return "\n".join(out)
+
+
+def measure(parser: TextParser, order: str, repeats: int) -> tuple:
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        parsed = parser.parse_text_input(order)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(parsed)
+
+
+def run(lines: int = 10_000, repeats: int = 3):
+    order = make_order(lines)
+
+    # Без кэша (чистая стоимость regex-конвейера) и с прогретым кэшем
+    for label, parser in (("без кэша", TextParser(cache_size=0)), ("с кэшем", TextParser())):
+        best, count = measure(parser, order, repeats)
+        print(f"{label}: {count} строк: {best * 1000:.1f} мс, {best * 1e6 / count:.1f} мкс/строка")
+        if parser.line_cache.maxsize:
+            print(f"  {parser.cache_stats()['lines']}")
+
+
+if __name__ == "__main__":
+    run()
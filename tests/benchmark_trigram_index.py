@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк исправления опечаток по триграммам
+Строки заказа - названия из каталога с одной опечаткой в первом слове.
+Сравниваем без исправления и с ним: сколько строк остаются без локальных
+кандидатов (уходят в Supabase), recall@5 по исходному SKU и задержку.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import TextParser
+from pipeline.trigram_index import is_word
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Source')
+VOWELS = 'аеиоуыэюя'
+
+
+def load_jsonl(name: str) -> list:
+    with open(os.path.join(SOURCE_DIR, name), encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Одна опечатка: замена гласной, пропуск, удвоение или перестановка букв"""
+    i = rng.randrange(1, len(word) - 1)
+    operation = rng.choice(['vowel', 'drop', 'double', 'swap'])
+    if operation == 'vowel' and word[i] in VOWELS:
+        return word[:i] + rng.choice(VOWELS.replace(word[i], '')) + word[i + 1:]
+    if operation == 'drop':
+        return word[:i] + word[i + 1:]
+    if operation == 'swap':
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + word[i] + word[i:]
+
+
+def typo_lines(rows: list, seed: int = 7) -> list:
+    """(строка с опечаткой, SKU) для названий, где есть слово для опечатки"""
+    rng = random.Random(seed)
+    lines = []
+    for row in rows:
+        words = row['name'].split()
+        for i, word in enumerate(words):
+            if is_word(word.lower()) and len(word) >= 4:
+                words[i] = misspell(word, rng)
+                lines.append((' '.join(words), row['sku']))
+                break
+    return lines
+
+
+def evaluate(engine: MatchingEngine, index: CatalogIndex, parsed_lines: list, skus: list):
+    """(доля строк без кандидатов, recall@5, мс на строку)"""
+    empty = found = 0
+    start = time.perf_counter()
+    for parsed_line, sku in zip(parsed_lines, skus):
+        candidates = asyncio.run(engine.find_local_candidates(parsed_line, index.items, index.aliases, index))
+        empty += not candidates
+        found += sku in [candidate.ku for candidate in candidates[:5]]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return empty / len(skus), found / len(skus), elapsed_ms / len(skus)
+
+
+def run():
+    rows = load_jsonl('normalized_skus.jsonl')
+    items = [
+        {'sku': row['sku'], 'name': row['name'], 'pack_qty': row.get('pack_size'), 'unit': row.get('unit'), 'is_active': True}
+        for row in rows
+    ]
+    engine = MatchingEngine()
+    index = CatalogIndex(items, engine.type_patterns, load_jsonl('aliases.jsonl'))
+
+    parser = TextParser()
+    lines = typo_lines(rows)
+    parsed_lines = [parser.parse_text_input(text)[0] for text, _ in lines]
+    skus = [sku for _, sku in lines]
+    clean_lines = [parser.parse_text_input(row['name'])[0] for row in rows]
+
+    print(f"Каталог: {len(items)} SKU, словарь триграмм: {len(index.vocabulary)} слов, строк с опечаткой: {len(lines)}")
+    print(f"{'':>24} | {'без кандидатов':>14} | {'recall@5':>8} | {'ms/line':>8}")
+    print("-" * 64)
+    min_similarity, max_candidates = engine.typo_min_similarity, engine.typo_max_candidates
+    for label, similarity, below, queries, expected in (
+        ('clean names', 0, 0, clean_lines, [row['sku'] for row in rows]),
+        ('typos, no correction', 0, 0, parsed_lines, skus),
+        ('typos, every line', min_similarity, float('inf'), parsed_lines, skus),
+        (f'typos, < {max_candidates} candidates', min_similarity, max_candidates, parsed_lines, skus),
+        ('clean, every line', min_similarity, float('inf'), clean_lines, [row['sku'] for row in rows]),
+        (f'clean, < {max_candidates} candidates', min_similarity, max_candidates, clean_lines, [row['sku'] for row in rows]),
+    ):
+        engine.typo_min_similarity, engine.typo_max_candidates = similarity, below
+        empty, recall, ms = evaluate(engine, index, queries, expected)
+        print(f"{label:>24} | {empty:>13.1%} | {recall:>8.1%} | {ms:>8.2f}")
+
+    words = [text.split()[0].lower() for text, _ in lines]
+    start = time.perf_counter()
+    for word in words:
+        index.vocabulary.search(word, k=5, min_similarity=min_similarity)
+    print(f"TrigramIndex.search: {(time.perf_counter() - start) * 1e6 / len(words):.1f} мкс на слово")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,185 @@
+"""
+Локальный сервер Assistants API (threads/messages/runs) для тестов и бенчмарков запуска ассистента
+"""
+
+import asyncio
+import json
+import time
+import itertools
+from collections import Counter
+
+from aiohttp import web
+
+REPLY = json.dumps({'type': 'болт', 'diameter': 'M8', 'length': '40', 'confidence': 0.9}, ensure_ascii=False)
+
+
+class FakeAssistantsServer:
+    """Запуск проводит queue_delay секунд в queued и work_delay в in_progress
+
+    Статус запуска при опросе вычисляется по времени с его создания; при
+    stream=True те же переходы отправляются событиями SSE. final_status -
+    чем закончится запуск (completed, failed, expired...). reply - текст ответа
+    или функция от текста запроса, отправленного с запуском. calls считает
+    запросы по операциям, cancelled - отмененные запуски, threads - треды,
+    которые еще не удалены.
+    """
+
+    def __init__(self, queue_delay: float = 0.05, work_delay: float = 0.1,
+                 final_status: str = 'completed', reply: str = REPLY):
+        self.queue_delay = queue_delay
+        self.work_delay = work_delay
+        self.final_status = final_status
+        self.reply = reply
+        self.calls = Counter()
+        self.cancelled = []
+        self.threads = set()
+        self.deleted = []
+        self.run_payloads = []
+        self.runs = {}
+        self._ids = itertools.count(1)
+        self._runner = None
+        self.base_url = None
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post('/v1/threads', self.create_thread)
+        app.router.add_delete('/v1/threads/{thread_id}', self.delete_thread)
+        app.router.add_post('/v1/threads/{thread_id}/messages', self.create_message)
+        app.router.add_get('/v1/threads/{thread_id}/messages', self.list_messages)
+        app.router.add_post('/v1/threads/{thread_id}/runs', self.create_run)
+        app.router.add_get('/v1/threads/{thread_id}/runs/{run_id}', self.retrieve_run)
+        app.router.add_post('/v1/threads/{thread_id}/runs/{run_id}/cancel', self.cancel_run)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}/v1'
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def _id(self, prefix: str) -> str:
+        return f'{prefix}_{next(self._ids)}'
+
+    def _status(self, run: dict) -> str:
+        if run['cancelled']:
+            return 'cancelled'
+        elapsed = time.monotonic() - run['started']
+        if elapsed < self.queue_delay:
+            return 'queued'
+        if elapsed < self.queue_delay + self.work_delay:
+            return 'in_progress'
+        return self.final_status
+
+    def _run_object(self, run: dict, status: str = None) -> dict:
+        return {
+            'id': run['id'], 'object': 'thread.run', 'thread_id': run['thread_id'],
+            'assistant_id': run['assistant_id'], 'status': status or self._status(run),
+            'created_at': int(run['created_at']), 'model': 'gpt-4o-mini', 'instructions': '',
+            'tools': [], 'metadata': {}, 'parallel_tool_calls': True,
+        }
+
+    def _reply(self, thread_id: str) -> str:
+        if not callable(self.reply):
+            return self.reply
+        runs = [run for run in self.runs.values() if run['thread_id'] == thread_id]
+        return self.reply(runs[-1]['content'] if runs else '')
+
+    def _message_object(self, thread_id: str, run_id: str = None) -> dict:
+        return {
+            'id': self._id('msg'), 'object': 'thread.message', 'thread_id': thread_id,
+            'role': 'assistant', 'run_id': run_id, 'status': 'completed',
+            'created_at': int(time.time()), 'attachments': [], 'metadata': {},
+            'content': [{'type': 'text', 'text': {'value': self._reply(thread_id), 'annotations': []}}],
+        }
+
+    async def create_thread(self, request):
+        self.calls['threads.create'] += 1
+        thread_id = self._id('thread')
+        self.threads.add(thread_id)
+        return web.json_response({'id': thread_id, 'object': 'thread',
+                                  'created_at': int(time.time()), 'metadata': {}})
+
+    async def delete_thread(self, request):
+        self.calls['threads.delete'] += 1
+        thread_id = request.match_info['thread_id']
+        self.threads.discard(thread_id)
+        self.deleted.append(thread_id)
+        return web.json_response({'id': thread_id, 'object': 'thread.deleted', 'deleted': True})
+
+    async def create_message(self, request):
+        self.calls['messages.create'] += 1
+        payload = await request.json()
+        thread_id = request.match_info['thread_id']
+        return web.json_response({
+            'id': self._id('msg'), 'object': 'thread.message', 'thread_id': thread_id,
+            'role': payload['role'], 'status': 'completed', 'created_at': int(time.time()),
+            'attachments': [], 'metadata': {},
+            'content': [{'type': 'text', 'text': {'value': payload['content'], 'annotations': []}}],
+        })
+
+    async def list_messages(self, request):
+        self.calls['messages.list'] += 1
+        message = self._message_object(request.match_info['thread_id'])
+        return web.json_response({'object': 'list', 'data': [message], 'first_id': message['id'],
+                                  'last_id': message['id'], 'has_more': False})
+
+    async def create_run(self, request):
+        self.calls['runs.create'] += 1
+        payload = await request.json()
+        self.run_payloads.append(dict(payload, thread_id=request.match_info['thread_id']))
+        run = {
+            'id': self._id('run'), 'thread_id': request.match_info['thread_id'],
+            'assistant_id': payload['assistant_id'], 'created_at': time.time(),
+            'started': time.monotonic(), 'cancelled': False,
+            'content': ''.join(str(message.get('content', '')) for message in payload.get('additional_messages') or []),
+        }
+        self.runs[run['id']] = run
+        if payload.get('stream'):
+            return await self._stream_run(request, run)
+        return web.json_response(self._run_object(run))
+
+    async def _stream_run(self, request, run: dict):
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+
+        async def send(event: str, data):
+            body = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+            await response.write(f'event: {event}\ndata: {body}\n\n'.encode('utf-8'))
+
+        try:
+            await send('thread.run.created', self._run_object(run, 'queued'))
+            await send('thread.run.queued', self._run_object(run, 'queued'))
+            await self._sleep(run, self.queue_delay)
+            await send('thread.run.in_progress', self._run_object(run, 'in_progress'))
+            await self._sleep(run, self.work_delay)
+            status = self._status(run)
+            if status == 'completed':
+                await send('thread.message.completed', self._message_object(run['thread_id'], run['id']))
+            await send(f'thread.run.{status}', self._run_object(run, status))
+            await send('done', '[DONE]')
+        except (ConnectionResetError, asyncio.CancelledError):
+            # Клиент закрыл поток (дедлайн) - он отменит запуск отдельным запросом
+            pass
+        return response
+
+    async def _sleep(self, run: dict, seconds: float) -> None:
+        """Пауза запуска, прерываемая его отменой"""
+        deadline = time.monotonic() + seconds
+        while not run['cancelled'] and time.monotonic() < deadline:
+            await asyncio.sleep(min(0.01, max(deadline - time.monotonic(), 0)))
+
+    async def retrieve_run(self, request):
+        self.calls['runs.retrieve'] += 1
+        run = self.runs[request.match_info['run_id']]
+        return web.json_response(self._run_object(run))
+
+    async def cancel_run(self, request):
+        self.calls['runs.cancel'] += 1
+        run = self.runs[request.match_info['run_id']]
+        run['cancelled'] = True
+        self.cancelled.append(run['id'])
+        return web.json_response(self._run_object(run, 'cancelling'))
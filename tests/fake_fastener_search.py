@@ -0,0 +1,62 @@
+"""
+Локальная подмена Edge Function fastener-search (одиночный и batch-контракт)
+"""
+
+from aiohttp import web
+
+FASTENER_SEARCH_PATH = '/functions/v1/fastener-search'
+
+
+class FakeFastenerSearch:
+    """Ищет по подстроке в каталоге в памяти и считает HTTP-запросы
+
+    supports_batch=False имитирует старую версию функции, которая на
+    {"queries": [...]} отвечает одиночным {"results": []};
+    failing_queries - позиции batch-запроса, возвращающие {"error": ...}.
+    """
+
+    def __init__(self, catalog, supports_batch: bool = True, failing_queries=()):
+        self.catalog = catalog
+        self.supports_batch = supports_batch
+        self.failing_queries = set(failing_queries)
+        self.requests = 0
+        self.batch_requests = 0
+        self.runner = None
+        self.url = None
+
+    def search(self, search_query: str):
+        words = search_query.lower().split()
+        return [
+            {'sku': item['sku'], 'name': item['name'], 'relevance_score': 0.9, 'probability_percent': 90}
+            for item in self.catalog
+            if all(word in item['name'].lower() for word in words)
+        ]
+
+    async def handle(self, request):
+        self.requests += 1
+        payload = await request.json()
+        if 'queries' in payload and self.supports_batch:
+            self.batch_requests += 1
+            batch_results = []
+            for query in payload['queries']:
+                if query['search_query'] in self.failing_queries:
+                    batch_results.append({'error': 'search failed'})
+                else:
+                    batch_results.append({'results': self.search(query['search_query']), 'search_metadata': {}})
+            return web.json_response({'batch_results': batch_results})
+        return web.json_response({'results': self.search(payload.get('search_query') or '')})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post(FASTENER_SEARCH_PATH, self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}'
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
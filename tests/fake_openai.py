@@ -0,0 +1,56 @@
+"""
+Локальная подмена OpenAIService.call_gpt для тестов и бенчмарков GPT-валидации
+"""
+
+import asyncio
+import json
+import re
+
+LINE_HEADER_RE = re.compile(r'=== СТРОКА (\d+) ===')
+KU_RE = re.compile(r'KU: (\S+)')
+
+
+class FakeOpenAIService:
+    """Отвечает первым кандидатом каждой строки с фиксированной задержкой
+
+    drop_lines - номера строк пакета, которые "модель" пропускает в ответе;
+    broken_batches - отвечать на пакетные промпты невалидным JSON.
+    """
+
+    def __init__(self, latency: float = 0.0, confidence: float = 0.9,
+                 drop_lines=(), broken_batches: bool = False):
+        self.latency = latency
+        self.confidence = confidence
+        self.drop_lines = set(drop_lines)
+        self.broken_batches = broken_batches
+        self.calls = 0
+        self.batch_calls = 0
+        self.prompts = []
+
+    async def call_gpt(self, prompt: str, model: str = "gpt-4o-mini",
+                       temperature: float = 0.1, max_tokens: int = 500) -> str:
+        self.calls += 1
+        self.prompts.append(prompt)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        sections = LINE_HEADER_RE.split(prompt)
+        if len(sections) == 1:
+            ku = KU_RE.search(prompt).group(1)
+            return json.dumps({'decision': ku, 'confidence': self.confidence, 'reason': 'fake'})
+
+        self.batch_calls += 1
+        if self.broken_batches:
+            return 'Извините, не могу ответить'
+
+        answer = []
+        for number, body in zip(sections[1::2], sections[2::2]):
+            if int(number) in self.drop_lines:
+                continue
+            answer.append({
+                'line': int(number),
+                'decision': KU_RE.search(body).group(1),
+                'confidence': self.confidence,
+                'reason': 'fake',
+            })
+        return json.dumps(answer, ensure_ascii=False)
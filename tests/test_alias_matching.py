@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.matching_engine import MatchingEngine, MatchCandidate
+from pipeline.processing_pipeline import convert_alias_rows
+from pipeline.text_parser import ParsedLine
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Source')
+
+
+def read_jsonl(name):
+    with open(os.path.join(SOURCE_DIR, name), encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_catalog():
+    items = [{
+        'sku': row['sku'],
+        'name': row['name'],
+        'pack_qty': row.get('pack_size'),
+        'price': None,
+        'unit': row.get('unit'),
+        'is_active': True,
+        'specs_json': {},
+    } for row in read_jsonl('normalized_skus.jsonl')]
+    aliases = convert_alias_rows(read_jsonl('aliases.jsonl'))
+    return items, aliases
+
+
+def legacy_alias_matches(parsed_line, aliases, items):
+    """Previous implementation: aliases x items nested loops"""
+    candidates = []
+    for alias in aliases:
+        if (alias.get('alias', '') or '').lower() == parsed_line.normalized_text.lower():
+            alias_type = alias.get('type', '')
+            if alias_type:
+                for item in items:
+                    item_name = (item.get('name', '') or '').lower()
+                    if alias_type.lower() in item_name:
+                        candidates.append(MatchCandidate(
+                            ku=item['sku'], name=item['name'], pack_qty=item.get('pack_qty'),
+                            price=item.get('price'), unit=item.get('unit'), score=0.6,
+                            explanation=f"Exact alias match: {alias['alias']} -> {alias_type}",
+                            source='rules'
+                        ))
+    return candidates
+
+
+def alias_matches(engine, line, index):
+    """Alias candidates of the line from local matching (all of them, typo correction off)"""
+    candidates = asyncio.run(engine.find_local_candidates(line, index.items, index.aliases, index))
+    return [c for c in candidates if c.explanation.startswith('Exact alias match')]
+
+
+def parsed(text):
+    return ParsedLine(raw_text=text, normalized_text=text, extracted_params={})
+
+
+def test_alias_map_matches_legacy_loops():
+    items, aliases = load_catalog()
+    engine = MatchingEngine()
+    engine.top_k = 0
+    engine.typo_min_similarity = 0
+    index = CatalogIndex(items, engine.type_patterns, aliases)
+
+    queries = [alias['alias'] for alias in aliases] + ['АНКЕР', 'не алиас']
+    for query in queries:
+        line = parsed(query)
+        # Alias matches outscore fuzzy ones, so ranking keeps every alias KU
+        expected = engine.finalize_candidates(line, legacy_alias_matches(line, aliases, items))
+        assert alias_matches(engine, line, index) == expected
+
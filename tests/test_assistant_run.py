@@ -0,0 +1,126 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+import pytest
+
+from shared.metrics import get_metrics
+from tests.fake_assistants_server import FakeAssistantsServer
+from tests.test_update_queue import import_fresh
+
+FAILED = {'type': 'неизвестно', 'confidence': 0.1}
+
+
+@pytest.fixture
+def openai_service(monkeypatch):
+    return import_fresh(monkeypatch, 'services.openai_service')
+
+
+def make_service(openai_service, base_url, mode, timeout=5.0):
+    from openai import AsyncOpenAI
+
+    service = openai_service.OpenAIService()
+    service.client = AsyncOpenAI(api_key='test', base_url=base_url, max_retries=0,
+                                 default_headers={"OpenAI-Beta": "assistants=v2"})
+    service.run_mode = mode
+    service.run_timeout = timeout
+    service.poll_initial = 0.01
+    service.poll_max = 0.05
+    return service
+
+
+def analyze(openai_service, server, mode, timeout=5.0):
+    async def scenario():
+        base_url = await server.start()
+        try:
+            service = make_service(openai_service, base_url, mode, timeout)
+            run_ms = get_metrics().histogram('assistant.run_ms').snapshot()['sum']
+            result = await service.analyze_with_assistant('болт М8х40')
+            # Time of the run itself, without thread creation and first-call imports
+            return result, (get_metrics().histogram('assistant.run_ms').snapshot()['sum'] - run_ms) / 1000
+        finally:
+            await server.stop()
+
+    return asyncio.run(scenario())
+
+
+def test_stream_mode_gets_reply_from_events(openai_service):
+    server = FakeAssistantsServer(queue_delay=0.05, work_delay=0.1)
+    metrics = get_metrics()
+    queued = metrics.histogram('assistant.queued_ms').snapshot()
+    in_progress = metrics.histogram('assistant.in_progress_ms').snapshot()
+
+    result, elapsed = analyze(openai_service, server, 'stream')
+
+    assert result['type'] == 'болт' and result['diameter'] == 'M8'
+    assert elapsed < 0.5
+    assert server.calls['runs.retrieve'] == 0 and server.calls['messages.list'] == 0
+    queued_after = metrics.histogram('assistant.queued_ms').snapshot()
+    in_progress_after = metrics.histogram('assistant.in_progress_ms').snapshot()
+    assert queued_after['count'] == queued['count'] + 1
+    # As seen by the client, so the first event's parsing eats into the 50 ms queued
+    assert queued_after['sum'] - queued['sum'] > 0
+    assert in_progress_after['sum'] - in_progress['sum'] >= 90
+
+
+def test_poll_mode_backs_off_from_short_delays(openai_service):
+    server = FakeAssistantsServer(queue_delay=0.05, work_delay=0.1)
+
+    result, elapsed = analyze(openai_service, server, 'poll')
+
+    assert result['type'] == 'болт'
+    assert elapsed < 0.5
+    # 10, 15, 22, 34, 50, 50... ms: a handful of polls instead of one per second
+    assert 2 <= server.calls['runs.retrieve'] <= 10
+    assert server.calls['messages.list'] == 1
+
+
+@pytest.mark.parametrize('mode', ['stream', 'poll'])
+def test_deadline_cancels_run(openai_service, mode):
+    server = FakeAssistantsServer(queue_delay=0.05, work_delay=5.0)
+    timeouts = get_metrics().counter('assistant.timeouts').value
+
+    result, elapsed = analyze(openai_service, server, mode, timeout=0.3)
+
+    assert result == FAILED
+    assert elapsed < 1.0
+    assert server.cancelled == list(server.runs)
+    assert get_metrics().counter('assistant.timeouts').value == timeouts + 1
+
+
+@pytest.mark.parametrize('mode', ['stream', 'poll'])
+def test_failed_run_returns_low_confidence(openai_service, mode):
+    server = FakeAssistantsServer(queue_delay=0.01, work_delay=0.01, final_status='failed')
+
+    result, _ = analyze(openai_service, server, mode)
+
+    assert result == FAILED
+    assert server.calls['messages.list'] == 0
+
+
+def test_cancelled_task_cancels_run(openai_service):
+    server = FakeAssistantsServer(queue_delay=0.01, work_delay=5.0)
+
+    async def scenario():
+        base_url = await server.start()
+        try:
+            service = make_service(openai_service, base_url, 'stream')
+            thread = await service.client.beta.threads.create()
+            task = asyncio.create_task(service.run_assistant(thread.id))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        finally:
+            await server.stop()
+
+    asyncio.run(scenario())
+
+    assert server.cancelled == list(server.runs)
@@ -0,0 +1,181 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+import pytest
+
+from shared.metrics import get_metrics
+from tests.fake_assistants_server import FakeAssistantsServer
+from tests.test_assistant_run import FAILED, make_service
+from tests.test_update_queue import import_fresh
+
+
+@pytest.fixture
+def openai_service(monkeypatch):
+    return import_fresh(monkeypatch, 'services.openai_service')
+
+
+@pytest.fixture
+def assistant_threads(monkeypatch):
+    return import_fresh(monkeypatch, 'services.assistant_threads')
+
+
+def run_with_server(server, scenario):
+    async def main():
+        base_url = await server.start()
+        try:
+            return await scenario(base_url)
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def make_manager(assistant_threads, base_url, **kwargs):
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key='test', base_url=base_url, max_retries=0,
+                         default_headers={"OpenAI-Beta": "assistants=v2"})
+    return assistant_threads.AssistantThreadManager(client, **kwargs)
+
+
+@pytest.mark.parametrize('mode', ['stream', 'poll'])
+def test_chat_reuses_its_thread_and_sends_message_with_run(openai_service, mode):
+    server = FakeAssistantsServer(queue_delay=0.01, work_delay=0.01)
+    reused = get_metrics().counter('assistant_threads.reused').value
+
+    async def scenario(base_url):
+        service = make_service(openai_service, base_url, mode)
+        results = [await service.analyze_with_assistant('болт М8', chat_id=chat_id) for chat_id in (1, 1, 2, 1)]
+        return results, len(service.threads)
+
+    results, pooled = run_with_server(server, scenario)
+
+    assert all(result['type'] == 'болт' for result in results)
+    assert server.calls['threads.create'] == 2 and pooled == 2
+    assert server.calls['messages.create'] == 0
+    assert get_metrics().counter('assistant_threads.reused').value == reused + 2
+    # The run sees only the message sent with it, not the chat's earlier requests
+    assert len({payload['thread_id'] for payload in server.run_payloads}) == 2
+    for payload in server.run_payloads:
+        assert payload['additional_messages'][0]['role'] == 'user'
+        assert payload['truncation_strategy'] == {'type': 'last_messages', 'last_messages': 1}
+
+
+def test_thread_is_recycled_after_max_runs(assistant_threads):
+    server = FakeAssistantsServer()
+
+    async def scenario(base_url):
+        manager = make_manager(assistant_threads, base_url, max_runs=2)
+        thread_ids = []
+        for _ in range(3):
+            async with manager.lease('chat') as thread:
+                thread_ids.append(thread.thread_id)
+        await manager.close()
+        return thread_ids
+
+    thread_ids = run_with_server(server, scenario)
+
+    assert thread_ids[0] == thread_ids[1] != thread_ids[2]
+    assert server.deleted == [thread_ids[0], thread_ids[2]]
+    assert server.threads == set()
+
+
+def test_cap_evicts_oldest_idle_thread_and_waits_when_all_leased(assistant_threads):
+    server = FakeAssistantsServer()
+
+    async def scenario(base_url):
+        manager = make_manager(assistant_threads, base_url, max_threads=2)
+        first = await manager.acquire('a')
+        second = await manager.acquire('b')
+        await manager.release(first)
+
+        # 'c' takes the slot of a's idle thread
+        third = await manager.acquire('c')
+        await asyncio.sleep(0.05)
+        evicted = list(server.deleted)
+
+        # Both threads are leased now: 'd' waits until one comes back
+        waiting = asyncio.create_task(manager.acquire('d'))
+        await asyncio.sleep(0.05)
+        blocked = not waiting.done()
+        await manager.release(second)
+        fourth = await asyncio.wait_for(waiting, 1)
+        await asyncio.sleep(0.05)
+        return first, second, third, fourth, evicted, blocked, list(server.deleted), len(manager)
+
+    first, second, third, fourth, evicted, blocked, deleted, pooled = run_with_server(server, scenario)
+
+    assert evicted == [first]
+    assert blocked
+    assert deleted == [first, second]
+    assert len({first, second, third, fourth}) == 4
+    assert pooled == 2
+
+
+def test_idle_threads_expire(assistant_threads):
+    server = FakeAssistantsServer()
+
+    async def scenario(base_url):
+        manager = make_manager(assistant_threads, base_url, idle_ttl=0.05)
+        async with manager.lease('chat') as thread:
+            first = thread.thread_id
+        await asyncio.sleep(0.1)
+        async with manager.lease('chat') as thread:
+            second = thread.thread_id
+        await manager.close()
+        return first, second
+
+    first, second = run_with_server(server, scenario)
+
+    assert first != second
+    assert server.deleted == [first, second]
+
+
+def test_interrupted_run_does_not_return_thread_to_pool(openai_service):
+    server = FakeAssistantsServer(queue_delay=0.01, work_delay=5.0)
+
+    async def scenario(base_url):
+        service = make_service(openai_service, base_url, 'stream', timeout=0.2)
+        result = await service.analyze_with_assistant('болт М8', chat_id=1)
+        await asyncio.sleep(0.05)
+        return result, len(service.threads)
+
+    result, pooled = run_with_server(server, scenario)
+
+    assert result == FAILED
+    assert pooled == 0
+    assert server.calls['threads.delete'] == 1 and server.threads == set()
+
+
+def test_services_share_one_pool_closed_on_shutdown(openai_service, monkeypatch):
+    from openai import AsyncOpenAI
+
+    server = FakeAssistantsServer(queue_delay=0.01, work_delay=0.01)
+
+    async def scenario(base_url):
+        monkeypatch.setattr(openai_service, '_openai_client', AsyncOpenAI(
+            api_key='test', base_url=base_url, max_retries=0, default_headers={"OpenAI-Beta": "assistants=v2"}
+        ))
+        monkeypatch.setattr(openai_service, '_thread_manager', None)
+        first, second = openai_service.OpenAIService(), openai_service.OpenAIService()
+        shared = first.threads is second.threads is openai_service.get_thread_manager()
+        await first.analyze_with_assistant('болт М8', chat_id=1)
+        await second.analyze_with_assistant('болт М8', chat_id=1)
+        idle = len(server.threads)
+        await openai_service.close_thread_manager()
+        return shared, idle
+
+    shared, idle = run_with_server(server, scenario)
+
+    assert shared
+    # The second service reused the chat's thread from the shared pool
+    assert idle == 1 and server.calls['threads.create'] == 1
+    assert server.threads == set()
@@ -0,0 +1,83 @@
+import os
+import sys
+import json
+import asyncio
+import random
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+import pytest
+
+from pipeline.candidate_heap import CandidateHeap
+from pipeline.catalog_index import CatalogIndex
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import TextParser
+from tests.benchmark_matching_engine import synthetic_catalog
+from tests.test_catalog_index import LINES, SKUS_PATH, load_items, ranked_matches
+
+ALIASES_PATH = os.path.join(os.path.dirname(SKUS_PATH), 'aliases.jsonl')
+
+
+def test_heap_matches_sort_and_dedupe():
+    rng = random.Random(3)
+    offers = [(f'KU-{rng.randrange(30)}', rng.choice([0.1, 0.25, 0.5, 0.5, 0.75, 1.0])) for _ in range(500)]
+    expected = []
+    for seq, (ku, score) in sorted(enumerate(offers), key=lambda offer: -offer[1][1]):
+        if ku not in [e[0] for e in expected]:
+            expected.append((ku, score, seq))
+
+    for k in (0, 1, 5, 29, 100):
+        heap = CandidateHeap(k)
+        for seq, (ku, score) in enumerate(offers):
+            heap.offer(ku, score, lambda ku=ku, score=score, seq=seq: (ku, score, seq))
+        assert heap.candidates() == (expected[:k] if k else expected)
+        assert heap.created < len(offers)
+
+
+def test_floor_prunes_only_when_full():
+    heap = CandidateHeap(2)
+    assert heap.can_enter(0.0) and heap.floor is None
+
+    heap.offer('A', 0.5, lambda: 'A')
+    heap.offer('B', 0.7, lambda: 'B')
+    assert heap.floor == 0.5
+    assert not heap.can_enter(0.5) and heap.pruned == 1
+
+    assert not heap.offer('C', 0.5, lambda: pytest.fail('must not be built'))
+    assert heap.offer('A', 0.9, lambda: 'A2')
+    assert heap.floor == 0.7
+    assert heap.candidates() == ['A2', 'B']
+
+
+@pytest.mark.parametrize('catalog, aliases', [
+    (load_items, True),
+    (lambda: synthetic_catalog(3_000), False),
+])
+@pytest.mark.parametrize('top_k', [0, 1, 5, 20])
+def test_local_candidates_match_full_ranking(catalog, aliases, top_k):
+    items = catalog()
+    alias_rows = []
+    if aliases:
+        with open(ALIASES_PATH, encoding='utf-8') as f:
+            alias_rows = [json.loads(line) for line in f if line.strip()]
+    engine = MatchingEngine()
+    engine.top_k = top_k
+    engine.typo_min_similarity = 0
+    engine.vector_min_shortlist = float('inf')
+    index = CatalogIndex(items, engine.type_patterns, alias_rows)
+    lines = LINES + [alias['alias'] for alias in alias_rows[:20]] + ["болт М10х30 DIN 933 оцинк", "SKU-000042"]
+
+    for parsed_line in TextParser().parse_text_input("\n".join(lines)):
+        # Pruning against the k-th best keeps the head of the unbounded ranking
+        expected = ranked_matches(engine, parsed_line, index)
+
+        actual = asyncio.run(engine.find_local_candidates(parsed_line, items, alias_rows, index))
+
+        assert actual == (expected[:top_k] if top_k else expected)
@@ -0,0 +1,139 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.catalog_cache import CatalogCache
+
+
+class FakeCatalog:
+    """In-memory stand-in for parts_catalog/aliases with call counters"""
+
+    def __init__(self):
+        self.version = 1
+        self.item_loads = 0
+        self.version_checks = 0
+
+    async def load_items(self):
+        self.item_loads += 1
+        return [{'sku': f'SKU-{self.version}', 'name': f'Болт М{self.version}', 'specs_json': {}}]
+
+    async def load_aliases(self):
+        return [{'alias': 'болт', 'type': 'Болт'}]
+
+    async def check_version(self):
+        self.version_checks += 1
+        return (self.version,)
+
+
+def make_cache(catalog, ttl):
+    return CatalogCache(catalog.load_items, catalog.load_aliases, catalog.check_version,
+                        ttl=ttl, metrics_prefix='test_catalog_cache')
+
+
+def test_catalog_loaded_once_within_ttl():
+    async def scenario():
+        catalog = FakeCatalog()
+        cache = make_cache(catalog, ttl=60)
+        snapshots = await asyncio.gather(*(cache.get() for _ in range(10)))
+        assert all(s is snapshots[0] for s in snapshots)
+        assert catalog.item_loads == 1
+        assert snapshots[0].index.items is snapshots[0].items
+        assert cache.age() is not None
+
+    asyncio.run(scenario())
+
+
+def test_stale_cache_checks_version_before_reload():
+    async def scenario():
+        catalog = FakeCatalog()
+        cache = make_cache(catalog, ttl=0)
+        first = await cache.get()
+
+        # Unchanged version: snapshot kept, no reload
+        await cache.get()
+        await cache._refresh_task
+        assert catalog.item_loads == 1
+        assert cache.snapshot is first
+
+        # Changed version: new snapshot swapped in by the background refresh
+        catalog.version = 2
+        stale = await cache.get()
+        assert stale is first
+        await cache._refresh_task
+        assert catalog.item_loads == 2
+        assert cache.snapshot.items[0]['sku'] == 'SKU-2'
+
+    asyncio.run(scenario())
+
+
+def test_index_is_built_off_the_event_loop(monkeypatch):
+    import threading
+    import time
+    import pipeline.catalog_cache as catalog_cache
+
+    builds = []
+    build_index = catalog_cache.CatalogIndex
+
+    def slow_index(*args):
+        builds.append(threading.current_thread() is threading.main_thread())
+        time.sleep(0.2)
+        return build_index(*args)
+
+    monkeypatch.setattr(catalog_cache, 'CatalogIndex', slow_index)
+
+    async def scenario():
+        cache = make_cache(FakeCatalog(), ttl=60)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await cache.get()
+        task.cancel()
+        return ticks
+
+    # The loop keeps serving other tasks while the index is built
+    assert asyncio.run(scenario()) >= 5
+    assert builds == [False]
+
+
+def test_pipeline_loaders_query_supabase_in_a_thread():
+    import threading
+    from types import SimpleNamespace
+    from pipeline.processing_pipeline import ProcessingPipeline
+
+    threads = []
+
+    class FakeTable:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def select(self, *args, **kwargs):
+            return self
+
+        def execute(self):
+            threads.append(threading.current_thread() is threading.main_thread())
+            return SimpleNamespace(data=self.rows)
+
+    tables = {
+        'parts_catalog': [{'sku': 'B-10', 'name': 'Болт М10х30', 'pack_size': 100, 'unit': 'шт'}],
+        'aliases': [{'alias': 'гровер', 'maps_to': {'type': 'шайба', 'subtype': 'пружинная'}}],
+    }
+    pipeline = ProcessingPipeline()
+    pipeline.supabase_client = SimpleNamespace(table=lambda name: FakeTable(tables[name]))
+
+    async def scenario():
+        return await asyncio.gather(pipeline._load_items(), pipeline._load_aliases())
+
+    items, aliases = asyncio.run(scenario())
+
+    assert [item['sku'] for item in items] == ['B-10']
+    assert [alias['type'] for alias in aliases] == ['шайба']
+    assert threads == [False, False]
@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+from pipeline.candidate_heap import CandidateHeap
+from pipeline.catalog_index import CatalogIndex
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import TextParser
+from shared.size_key import item_size_keys
+
+SKUS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Source', 'normalized_skus.jsonl')
+
+LINES = [
+    "Анкер забиваемый латунный М10",
+    "болт М10 DIN 933 оцинк",
+    "саморез 4,2х90",
+    "гайка M8",
+    "шайба плоская",
+    "что-то непонятное",
+]
+
+
+def load_items():
+    items = []
+    with open(SKUS_PATH, encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            row = json.loads(line)
+            items.append({
+                'sku': row['sku'],
+                'name': row['name'],
+                'pack_qty': row.get('pack_size'),
+                'price': None,
+                'unit': row.get('unit'),
+                'is_active': i % 50 != 0,
+                'specs_json': {'diameter': 'M10', 'length': '30', 'coating': 'цинк'} if i % 7 == 0 else {},
+            })
+    return items
+
+
+def ranked_matches(engine, parsed_line, index):
+    """Every alias and fuzzy match of the line above the threshold, best first, one per KU"""
+    heap = CandidateHeap(0)
+    engine._rank_matches(parsed_line, parsed_line, index, heap, order_base=0)
+    return heap.candidates()
+
+
+def full_scan(engine, parsed_line, items):
+    """Reference implementation: score every active item"""
+    required_type = engine._required_type(parsed_line)
+    scored = []
+    for item in items:
+        if not item.get('is_active', True):
+            continue
+        if required_type and not engine._matches_type(item['name'], required_type):
+            continue
+        similarity = engine._calculate_similarity(parsed_line, item)
+        if similarity > 0.1:
+            scored.append((item['sku'], engine._final_score(parsed_line, similarity, item['sku'], item['name'])))
+    scored.sort(key=lambda entry: -entry[1])
+    return [(sku, round(score, 6)) for sku, score in scored]
+
+
+def test_shortlist_matches_full_scan():
+    items = load_items()
+    engine = MatchingEngine()
+    index = CatalogIndex(items)
+    parser = TextParser()
+
+    for parsed_line in parser.parse_text_input("\n".join(LINES)):
+        assert not {'diameter', 'length'} <= set(parsed_line.extracted_params)
+        fuzzy = ranked_matches(engine, parsed_line, index)
+        assert [(c.ku, round(c.score, 6)) for c in fuzzy] == full_scan(engine, parsed_line, items)
+
+
+def test_index_reused_for_same_items():
+    items = load_items()
+    engine = MatchingEngine()
+    first = engine.get_catalog_index(items)
+    assert engine.get_catalog_index(items) is first
+    assert engine.get_catalog_index(list(items)) is not first
+
+
+def test_diameter_and_length_resolve_to_size_key():
+    items = load_items()
+    engine = MatchingEngine()
+    index = CatalogIndex(items, engine.type_patterns)
+    parsed_line = TextParser().parse_text_input("болт М10х30")[0]
+
+    fuzzy = ranked_matches(engine, parsed_line, index)
+    # Size comes from specs or is parsed from the name ("М10х30" -> "10x30")
+    expected = [
+        item['sku'] for item in items
+        if item['is_active'] and '10x30' in item_size_keys(item)
+    ]
+    assert sorted(c.ku for c in fuzzy) == sorted(expected)
+    assert any(not item['specs_json'] for item in items if item['sku'] in expected)
+    assert index.stats()['size'] == {'hits': 1, 'misses': 0}
+
+
+def test_attribute_index_counts_misses():
+    index = CatalogIndex(load_items(), MatchingEngine().type_patterns)
+    assert index.attributes.lookup('diameter', 'M99') == set()
+    assert index.attributes.lookup('coating', 'цинк')
+    assert index.attributes.type_ids('анкер')
+    stats = index.stats()
+    assert stats['diameter'] == {'hits': 0, 'misses': 1}
+    assert stats['coating'] == {'hits': 1, 'misses': 0}
+    assert stats['type'] == {'hits': 1, 'misses': 0}
@@ -0,0 +1,79 @@
+import os
+import sys
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from services.catalog_ingest import (
+    parse_catalog_fields, prepare_catalog, read_snapshot, stale_catalog_rows, write_snapshot, SNAPSHOT_COLUMNS
+)
+from services.local_search import LocalSearchEngine, load_catalog_jsonl, normalize_str
+
+CATALOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Source', 'normalized_skus.jsonl')
+
+
+def test_fields_parsed_from_name():
+    fields = parse_catalog_fields('Болт DIN 6921 кл.пр.10.9 цинк М10х30')
+
+    assert fields == {
+        'diameter': 'M10',
+        'length': '30',
+        'size_keys': ['10x30'],
+        'standard': 'DIN 6921',
+        'strength_class': 'кл.пр.10.9',
+        'coating': 'цинк',
+        'name_normalized': normalize_str('Болт DIN 6921 кл.пр.10.9 цинк М10х30'),
+    }
+    assert parse_catalog_fields('Саморез по металлу 4,2х90 A2-70')['strength_class'] == 'A2-70'
+    assert parse_catalog_fields('Гайка DIN 934 М8')['diameter'] == 'M8'
+    assert parse_catalog_fields('Шайба плоская')['size_keys'] == []
+
+
+def test_prepare_deduplicates_skus():
+    rows = prepare_catalog([
+        {'sku': 'A', 'name': 'Болт М10х30'},
+        {'sku': 'A', 'name': 'Болт М10х40'},
+        {'sku': '', 'name': 'без артикула'},
+    ])
+
+    assert [(row['sku'], row['length']) for row in rows] == [('A', '40')]
+    assert rows[0]['unit'] == 'шт'
+
+
+def test_backfill_recomputes_only_stale_rows():
+    fresh = prepare_catalog([{'sku': 'A', 'name': 'Болт DIN 933 М10х30'}])[0]
+    stale = dict(fresh, sku='B', size_keys=[])
+    legacy = {'sku': 'C', 'name': 'Гайка DIN 934 М8', 'type': 'Гайка', 'pack_size': 100, 'unit': 'шт'}
+
+    rows = stale_catalog_rows([fresh, stale, legacy])
+
+    assert [row['sku'] for row in rows] == ['B', 'C']
+    assert rows[0]['size_keys'] == ['10x30']
+    assert rows[1] == prepare_catalog([legacy])[0]
+
+
+def test_snapshot_round_trip(tmp_path):
+    rows = prepare_catalog(load_catalog_jsonl(CATALOG))
+    path = str(tmp_path / 'catalog.json.gz')
+
+    write_snapshot(rows, path, version=[640, None, 10])
+
+    assert read_snapshot(path) == [{column: row[column] for column in SNAPSHOT_COLUMNS} for row in rows]
+    assert os.path.getsize(path) < os.path.getsize(CATALOG)
+
+
+def test_search_on_ingested_rows_matches_raw_rows():
+    ingested = prepare_catalog(load_catalog_jsonl(CATALOG))
+    # Без вычисленных полей поисковик разбирает названия сам
+    plain = LocalSearchEngine([{'sku': row['sku'], 'name': row['name']} for row in ingested])
+    intent = {'type': 'болт', 'diameter': 'M10', 'length': '30', 'standard': 'DIN 933', 'coating': 'цинк'}
+
+    results = LocalSearchEngine(ingested).search('болт', intent)['results']
+
+    assert results
+    assert [(r['sku'], r['probability_percent']) for r in results] == \
+        [(r['sku'], r['probability_percent']) for r in plain.search('болт', intent)['results']]
+    assert results[0]['standard'] == 'DIN 933'
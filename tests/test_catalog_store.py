@@ -0,0 +1,77 @@
+import os
+import sys
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+import pytest
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.catalog_store import CatalogStore
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import TextParser
+from tests.test_catalog_index import LINES, load_items, ranked_matches
+
+
+ITEMS = [
+    {
+        'sku': 'BOLT-1', 'name': 'Болт DIN 933 М10х30, цинк', 'pack_qty': 100, 'price': 2.5,
+        'unit': 'шт', 'is_active': True, 'size_keys': ['10x30'],
+        'specs_json': {'diameter': 'M10', 'length': '30', 'coating': 'цинк', 'standard': None},
+    },
+    {
+        'sku': 'ANCHOR-1', 'name': 'Анкер клиновой М10х100', 'pack_qty': None, 'price': None,
+        'unit': 'шт', 'is_active': False, 'size_keys': None,
+        'specs_json': {'diameter': 'M10', 'type': 'клиновой'},
+    },
+    {'sku': 'NUT-1', 'name': 'Гайка М8', 'pack_qty': 2.5, 'unit': None},
+]
+
+
+def test_items_read_back_as_dicts():
+    store = CatalogStore(ITEMS)
+
+    assert len(store) == 3
+    assert dict(store[0]) == ITEMS[0] | {'size_keys': ('10x30',)}
+    assert store[1]['pack_qty'] is None and store[1]['price'] is None
+    assert store[1]['is_active'] is False and store[1]['size_keys'] is None
+    assert store[1]['specs_json'] == {'diameter': 'M10', 'type': 'клиновой'}
+    assert store[2]['pack_qty'] == 2.5 and store[2]['specs_json'] == {}
+    assert store[-1]['sku'] == 'NUT-1'
+    assert store[2].get('missing', 'default') == 'default'
+    assert [item['sku'] for item in store] == ['BOLT-1', 'ANCHOR-1', 'NUT-1']
+
+    with pytest.raises(IndexError):
+        store[3]
+    with pytest.raises(KeyError):
+        store[0]['missing']
+
+
+def test_repeated_values_are_shared():
+    store = CatalogStore(ITEMS + [dict(ITEMS[0], sku='BOLT-2')])
+
+    assert store.specs['diameter'][0] is store.specs['diameter'][1]
+    assert store.size_keys[0] is store.size_keys[3]
+    assert store.units[0] is store.units[1]
+
+
+def test_matching_engine_results_match_dict_catalog():
+    items = load_items()
+    store = CatalogStore(items)
+    engine = MatchingEngine()
+    parsed_lines = TextParser().parse_text_input("\n".join(LINES))
+
+    dict_index = CatalogIndex(items, engine.type_patterns)
+    store_index = CatalogIndex(store, engine.type_patterns)
+
+    assert dict_index.postings == store_index.postings
+    for parsed_line in parsed_lines:
+        expected = ranked_matches(engine, parsed_line, dict_index)
+        actual = ranked_matches(engine, parsed_line, store_index)
+        assert actual == expected
@@ -0,0 +1,92 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from services.fastener_search import fastener_search_batch
+from services.search_cache import SearchResultCache, MemorySearchBackend
+from shared.http import close_http_session
+from tests.fake_fastener_search import FakeFastenerSearch
+
+CATALOG = [
+    {'sku': 'B-10', 'name': 'Болт М10х30'},
+    {'sku': 'B-12', 'name': 'Болт М12х40'},
+    {'sku': 'N-10', 'name': 'Гайка М10'},
+    {'sku': 'W-10', 'name': 'Шайба М10'},
+]
+
+QUERIES = [
+    ('болт м10х30', {'type': 'болт'}),
+    ('гайка м10', {'type': 'гайка'}),
+    ('шуруп', {'type': 'шуруп'}),
+    ('болт м12х40', {'type': 'болт'}),
+    ('шайба м10', {'type': 'шайба'}),
+]
+
+
+def run_batch(server, queries=QUERIES, **kwargs):
+    async def scenario():
+        url = await server.start()
+        try:
+            return await fastener_search_batch(url, 'test', queries, **kwargs)
+        finally:
+            await close_http_session()
+            await server.stop()
+
+    return asyncio.run(scenario())
+
+
+def skus(results):
+    return [None if found is None else [r['sku'] for r in found] for found in results]
+
+
+def test_whole_order_in_one_request_in_order():
+    server = FakeFastenerSearch(CATALOG)
+
+    results = run_batch(server)
+
+    assert server.requests == 1
+    assert skus(results) == [['B-10'], ['N-10'], [], ['B-12'], ['W-10']]
+
+
+def test_large_order_is_split_into_chunks():
+    server = FakeFastenerSearch(CATALOG)
+    queries = [(f'болт м10х30 {n}', {}) for n in range(7)]
+
+    results = run_batch(server, queries, batch_size=3)
+
+    assert server.batch_requests == 3
+    assert len(results) == 7
+
+
+def test_failed_positions_are_left_for_fallback():
+    server = FakeFastenerSearch(CATALOG, failing_queries={'гайка м10'})
+
+    results = run_batch(server)
+
+    assert skus(results) == [['B-10'], None, [], ['B-12'], ['W-10']]
+
+
+def test_old_deployment_without_batch_contract():
+    server = FakeFastenerSearch(CATALOG, supports_batch=False)
+
+    results = run_batch(server)
+
+    assert server.requests == 1
+    assert results == [None] * len(QUERIES)
+
+
+def test_cached_positions_are_not_sent():
+    server = FakeFastenerSearch(CATALOG)
+    cache = SearchResultCache(MemorySearchBackend())
+
+    first = run_batch(server, search_cache=cache)
+    second = run_batch(server, search_cache=cache)
+
+    assert server.requests == 1
+    assert skus(second) == skus(first)
@@ -0,0 +1,92 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from pipeline.matching_engine import MatchCandidate
+from pipeline.text_parser import ParsedLine
+from services.gpt_validator import GPTValidator
+from tests.fake_openai import FakeOpenAIService
+
+
+def make_lines(count, candidates_per_line=3):
+    lines = []
+    for n in range(count):
+        parsed = ParsedLine(raw_text=f'болт М{n}х30', normalized_text=f'болт M{n}x30',
+                            extracted_params={'diameter': f'M{n}', 'length': '30'})
+        candidates = [MatchCandidate(ku=f'KU-{n}-{k}', name=f'Болт М{n}х30 вариант {k}', pack_qty=100,
+                                     price=1.0, unit='шт', score=0.6, explanation='test', source='rules')
+                      for k in range(candidates_per_line)]
+        lines.append((parsed, candidates))
+    return lines
+
+
+def make_validator(fake, **kwargs):
+    validator = GPTValidator(**kwargs)
+    validator.openai_service = fake
+    return validator
+
+
+def test_batch_packs_lines_and_keeps_order():
+    fake = FakeOpenAIService()
+    validator = make_validator(fake, batch_max_lines=10)
+    lines = make_lines(25)
+
+    results = asyncio.run(validator.validate_batch(lines))
+
+    assert fake.calls == 3  # 10 + 10 + 5
+    assert [r.chosen_ku for r in results] == [f'KU-{n}-0' for n in range(25)]
+
+
+def test_token_budget_splits_batches():
+    fake = FakeOpenAIService()
+    validator = make_validator(fake, batch_max_lines=100, batch_token_budget=2000)
+    lines = make_lines(12)
+
+    batches = validator._split_batches(lines, [(i, None) for i in range(len(lines))])
+    assert len(batches) > 1
+    assert sum(len(batch) for batch in batches) == 12
+
+    asyncio.run(validator.validate_batch(lines))
+    assert fake.calls == len(batches)
+
+
+def test_missing_lines_fall_back_to_single_prompt():
+    fake = FakeOpenAIService(drop_lines={2})
+    validator = make_validator(fake)
+    lines = make_lines(4)
+
+    results = asyncio.run(validator.validate_batch(lines))
+
+    assert fake.batch_calls == 1
+    assert fake.calls == 2  # batch + one per-line fallback
+    assert results[1].chosen_ku == 'KU-1-0'
+
+
+def test_unparsable_batch_falls_back_per_line():
+    fake = FakeOpenAIService(broken_batches=True)
+    validator = make_validator(fake)
+    lines = make_lines(3)
+
+    decisions = asyncio.run(validator.validate_lines(lines))
+
+    assert fake.calls == 4
+    assert decisions == [(f'KU-{n}-0', 'ok', 'gpt') for n in range(3)]
+
+
+def test_foreign_ku_is_rejected():
+    validator = make_validator(FakeOpenAIService())
+    lines = make_lines(2)
+    response = '[{"line": 1, "decision": "KU-1-0", "confidence": 0.9, "reason": "x"},' \
+               ' {"line": 2, "decision": "unsure", "confidence": 0.2, "reason": "y"}]'
+
+    parsed = validator._parse_batch_response(response, lines)
+
+    assert parsed[0] is None
+    assert parsed[1].decision == 'unsure'
+
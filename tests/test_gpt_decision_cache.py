@@ -0,0 +1,181 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from pipeline.matching_engine import MatchCandidate
+from pipeline.text_parser import ParsedLine
+from services.gpt_decision_cache import GPTDecisionCache, make_decision_key
+from services.gpt_validator import GPTValidator
+
+
+class FakeOpenAIService:
+    """Stand-in for OpenAIService.call_gpt with a call counter"""
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    async def call_gpt(self, **kwargs):
+        self.calls += 1
+        return self.response
+
+
+def make_candidates(*kus):
+    return [MatchCandidate(ku=ku, name=f'Болт {ku}', pack_qty=100, price=1.0, unit='шт',
+                           score=0.7, explanation='test', source='rules') for ku in kus]
+
+
+def make_validator(tmp_path, response='{"decision": "B-10", "confidence": 0.9, "reason": "ok"}'):
+    cache = GPTDecisionCache(str(tmp_path / 'gpt.sqlite3'), ttl=60, metrics_prefix='test_gpt_cache')
+    validator = GPTValidator(cache)
+    validator.openai_service = FakeOpenAIService(response)
+    return validator
+
+
+def test_decision_key_ignores_candidate_order():
+    params = {'diameter': 'M10', 'length': '30'}
+    assert make_decision_key('болт M10x30', params, ['B', 'A']) == make_decision_key('болт M10x30', params, ['A', 'B'])
+    assert make_decision_key('болт M10x30', params, ['A']) != make_decision_key('болт M10x30', params, ['A', 'B'])
+
+
+def test_repeated_line_served_from_cache(tmp_path):
+    validator = make_validator(tmp_path)
+    line = ParsedLine(raw_text='болт М10х30', normalized_text='болт M10x30', extracted_params={'diameter': 'M10'})
+
+    first = asyncio.run(validator.validate_candidates(line, make_candidates('B-10', 'B-12')))
+    second = asyncio.run(validator.validate_candidates(line, make_candidates('B-12', 'B-10')))
+
+    assert validator.openai_service.calls == 1
+    assert first == second
+    assert second.chosen_ku == 'B-10'
+    assert validator.decision_cache.hit_rate > 0
+
+    # Кэш переживает перезапуск процесса
+    reopened = GPTDecisionCache(validator.decision_cache.path, ttl=60, metrics_prefix='test_gpt_cache')
+    assert reopened.get(make_decision_key('болт M10x30', {'diameter': 'M10'}, ['B-10', 'B-12']))['decision'] == 'B-10'
+
+
+def test_catalog_change_invalidates(tmp_path):
+    validator = make_validator(tmp_path)
+    line = ParsedLine(raw_text='болт', normalized_text='болт', extracted_params={})
+
+    validator.set_catalog_version((100, '2025-01-01'))
+    asyncio.run(validator.validate_candidates(line, make_candidates('B-10')))
+    asyncio.run(validator.validate_candidates(line, make_candidates('B-10')))
+    assert validator.openai_service.calls == 1
+
+    validator.set_catalog_version((101, '2025-01-02'))
+    asyncio.run(validator.validate_candidates(line, make_candidates('B-10')))
+    assert validator.openai_service.calls == 2
+
+
+def test_ttl_expiry_and_unparsable_responses(tmp_path):
+    validator = make_validator(tmp_path, response='not json')
+    line = ParsedLine(raw_text='гайка', normalized_text='гайка', extracted_params={})
+
+    for _ in range(2):
+        result = asyncio.run(validator.validate_candidates(line, make_candidates('N-8')))
+        assert result.decision == 'unsure'
+    # Ошибочные ответы не кэшируются
+    assert validator.openai_service.calls == 2
+
+    validator.openai_service.response = '{"decision": "N-8", "confidence": 0.95, "reason": "ok"}'
+    validator.decision_cache.ttl = 0
+    asyncio.run(validator.validate_candidates(line, make_candidates('N-8')))
+    asyncio.run(validator.validate_candidates(line, make_candidates('N-8')))
+    assert validator.openai_service.calls == 4
+
+
+def test_batch_reads_and_writes_sqlite_once_off_the_loop(tmp_path):
+    import threading
+    from tests.fake_openai import FakeOpenAIService as FakeBatchService
+    from tests.test_gpt_batching import make_lines
+
+    cache = GPTDecisionCache(str(tmp_path / 'gpt.sqlite3'), ttl=60, metrics_prefix='test_gpt_cache')
+    validator = GPTValidator(cache)
+    validator.openai_service = FakeBatchService()
+    calls = []
+    for name in ('get_many', 'put_many'):
+        method = getattr(cache, name)
+
+        def record(*args, name=name, method=method):
+            calls.append((name, threading.current_thread() is threading.main_thread()))
+            return method(*args)
+
+        setattr(cache, name, record)
+    lines = make_lines(5)
+
+    first = asyncio.run(validator.validate_batch(lines))
+    assert calls == [('get_many', False), ('put_many', False)]
+
+    calls.clear()
+    assert asyncio.run(validator.validate_batch(lines)) == first
+    # Every line is cached now: one lookup, nothing to write
+    assert calls == [('get_many', False)]
+    assert validator.openai_service.calls == 1
+
+
+def test_cache_errors_are_treated_as_misses(tmp_path):
+    import sqlite3
+    from tests.fake_openai import FakeOpenAIService as FakeBatchService
+    from tests.test_gpt_batching import make_lines
+
+    cache = GPTDecisionCache(str(tmp_path / 'gpt.sqlite3'), ttl=60, metrics_prefix='test_gpt_cache')
+    validator = GPTValidator(cache)
+    validator.openai_service = FakeBatchService()
+
+    def broken(*args):
+        raise sqlite3.OperationalError('database is locked')
+
+    cache.get_many = broken
+    cache.put_many = broken
+    lines = make_lines(3)
+
+    results = asyncio.run(validator.validate_batch(lines))
+    assert [result.chosen_ku for result in results] == [candidates[0].ku for _, candidates in lines]
+    assert validator.openai_service.calls == 1
+
+    line = ParsedLine(raw_text='болт', normalized_text='болт', extracted_params={})
+    validator.openai_service = FakeOpenAIService('{"decision": "B-10", "confidence": 0.9, "reason": "ok"}')
+    result = asyncio.run(validator.validate_candidates(line, make_candidates('B-10')))
+    assert result.chosen_ku == 'B-10'
+
+
+def test_pipeline_switches_catalog_version_off_the_loop(tmp_path):
+    import threading
+    from pipeline.catalog_cache import CatalogSnapshot
+    from pipeline.processing_pipeline import ProcessingPipeline
+
+    pipeline = ProcessingPipeline()
+    pipeline.supabase_client = object()
+    pipeline.gpt_validator = make_validator(tmp_path)
+    cache = pipeline.gpt_validator.decision_cache
+    snapshot = CatalogSnapshot(items=[{'sku': 'B-10'}], aliases=[], index=None, version=(1, None, 0), loaded_at=0)
+    calls = []
+
+    async def get_snapshot():
+        return snapshot
+
+    async def no_matches(parsed_lines, items, aliases, catalog_index=None):
+        return [([], None) for _ in parsed_lines]
+
+    set_catalog_version = cache.set_catalog_version
+
+    def record(version):
+        calls.append(threading.current_thread() is threading.main_thread())
+        set_catalog_version(version)
+
+    pipeline.catalog_cache.get = get_snapshot
+    pipeline._match_lines = no_matches
+    cache.set_catalog_version = record
+
+    asyncio.run(pipeline.process_request('req-1', 'болт М10х30'))
+
+    assert calls == [False]
+    assert cache.catalog_version == str((1, None, 0))
@@ -0,0 +1,94 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from aiohttp import web
+
+from shared.http import open_http_session, get_http_session, close_http_session
+from shared.metrics import get_metrics
+
+
+async def start_server():
+    """Local stand-in for the fastener-search Edge Function"""
+    async def search(request):
+        payload = await request.json()
+        return web.json_response({'results': [{'sku': 'S-1', 'name': payload['search_query']}]})
+
+    app = web.Application()
+    app.router.add_post('/functions/v1/fastener-search', search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}/functions/v1/fastener-search'
+
+
+def test_connections_are_reused():
+    async def scenario():
+        runner, url = await start_server()
+        metrics = get_metrics()
+        created = metrics.counter('http.connections_created').value
+        reused = metrics.counter('http.connections_reused').value
+        requests = metrics.histogram('http.request_ms').snapshot()['count']
+        try:
+            session = await open_http_session()
+            for query in ('болт', 'гайка', 'шайба'):
+                assert await get_http_session() is session
+                async with session.post(url, json={'search_query': query}) as response:
+                    data = await response.json()
+                    assert data['results'][0]['name'] == query
+        finally:
+            await close_http_session()
+            await runner.cleanup()
+
+        assert metrics.counter('http.connections_created').value - created == 1
+        assert metrics.counter('http.connections_reused').value - reused == 2
+        assert metrics.histogram('http.request_ms').snapshot()['count'] - requests == 3
+
+    asyncio.run(scenario())
+
+
+def test_session_is_recreated_after_close_and_per_loop():
+    async def open_and_close():
+        session = await get_http_session()
+        await close_http_session()
+        assert session.closed
+        return session
+
+    first = asyncio.run(open_and_close())
+    second = asyncio.run(open_and_close())
+    assert first is not second
+
+
+def test_session_of_another_loop_is_released():
+    import threading
+    import time
+
+    # The old loop is still running in another thread: the session is closed there
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever)
+    thread.start()
+    try:
+        first = asyncio.run_coroutine_threadsafe(get_http_session(), other).result(5)
+        second = asyncio.run(get_http_session())
+        deadline = time.monotonic() + 5
+        while not first.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert first.closed and not second.closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join()
+        other.close()
+
+    # The old loop is closed: the session is detached instead of leaking as open
+    third = asyncio.run(get_http_session())
+    assert second.closed and third is not second
+    asyncio.run(close_http_session())
+    assert third.closed
@@ -0,0 +1,159 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+import pipeline.message_processor as message_processor
+from services.local_search import (
+    LocalSearchEngine, build_tokens, calculate_probability, analyze_matches,
+    load_catalog_jsonl, normalize_str, MODE_PRIMARY, MODE_FALLBACK
+)
+
+CATALOG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Source', 'normalized_skus.jsonl')
+
+ROWS = [
+    {'sku': 'B-1', 'name': 'Болт DIN 933 М10х30, цинк'},
+    {'sku': 'B-2', 'name': 'Болт DIN 933 М10х40, цинк'},
+    {'sku': 'B-3', 'name': 'Болты мебельные М6х40'},
+    {'sku': 'S-1', 'name': 'Саморез по металлу 4.2х90'},
+    {'sku': 'W-1', 'name': 'Шайба плоская оцинкованная М10'},
+]
+
+
+def test_normalize_and_size_token():
+    assert normalize_str('Болт  DIN 933 М10×30 оцинкованный') == 'болт din933 м10x30 цинк'
+    assert build_tokens({'diameter': 'М10', 'length': '30 мм'})['size'] == '10x30'
+    assert build_tokens({'diameter': 'М10'})['size'] is None
+
+
+def test_probability_weights_bonuses_and_caps():
+    tokens = build_tokens({'type': 'болт', 'diameter': 'M10', 'length': '30', 'standard': 'DIN 933', 'coating': 'цинк'})
+
+    full = calculate_probability(analyze_matches({'name': 'Болт DIN 933 М10х30, цинк'}, tokens))
+    assert full['probability'] == 100
+
+    type_only = calculate_probability(analyze_matches({'name': 'Болт М12х50'}, tokens))
+    assert type_only['probability'] == 25
+    assert 'только типа' in type_only['explanation']
+
+    coating_only = calculate_probability(analyze_matches({'name': 'Шайба цинк'}, tokens))
+    assert coating_only['probability'] == 15
+
+
+def test_cascade_steps():
+    engine = LocalSearchEngine(ROWS)
+
+    # Шаг 1: тип + размеры
+    results = engine.search('болт м10х30', {'type': 'болт', 'diameter': 'M10', 'length': '30'})['results']
+    assert [r['sku'] for r in results] == ['B-1']
+    assert results[0]['match_reason'] == 'Точное совпадение типа и размеров'
+
+    # Шаг 2: только тип (основа слова "болты")
+    results = engine.search('болт м8х100', {'type': 'болт', 'diameter': 'M8', 'length': '100'})['results']
+    assert {r['sku'] for r in results} == {'B-1', 'B-2', 'B-3'}
+
+    # Шаг 3: только размер
+    results = engine.search('4.2х90', {'type': 'шуруп', 'diameter': '4.2', 'length': '90'})['results']
+    assert [r['sku'] for r in results] == ['S-1']
+
+    # Шаг 5: покрытие
+    results = engine.search('оцинкованная', {'coating': 'оцинкованная'})['results']
+    assert [r['sku'] for r in results] == ['B-1', 'B-2', 'W-1']
+    assert all(r['probability_percent'] == 15 for r in results)
+
+    assert engine.search('гвоздь', {'type': 'гвоздь'})['results'] == []
+
+
+def test_results_are_ranked_on_real_catalog():
+    engine = LocalSearchEngine(load_catalog_jsonl(CATALOG))
+
+    response = engine.search('анкер латунный м12', {'type': 'анкер', 'diameter': 'М12', 'length': '38'})
+
+    results = response['results']
+    assert 0 < len(results) <= 20
+    assert response['search_metadata']['engine'] == 'local'
+    probabilities = [r['probability_percent'] for r in results]
+    assert probabilities == sorted(probabilities, reverse=True)
+    assert results[0]['sku'] == '9990154863'
+
+
+def patch_local(monkeypatch, mode):
+    engine = LocalSearchEngine(ROWS)
+
+    async def fake_local_search(search_query, user_intent=None):
+        return engine.search(search_query, user_intent)['results']
+
+    async def failing_edge(*args, **kwargs):
+        raise RuntimeError("Edge Function unavailable")
+
+    monkeypatch.setenv('SUPABASE_URL', 'http://localhost')
+    monkeypatch.setenv('SUPABASE_KEY', 'test')
+    monkeypatch.setattr(message_processor, 'local_search_mode', lambda: mode)
+    monkeypatch.setattr(message_processor, 'local_search', fake_local_search)
+    monkeypatch.setattr(message_processor, '_call_fastener_search', failing_edge)
+    monkeypatch.setattr(message_processor, 'get_search_cache', lambda: None)
+
+
+def test_primary_mode_skips_edge_function(monkeypatch):
+    patch_local(monkeypatch, MODE_PRIMARY)
+
+    results = asyncio.run(message_processor.search_parts_direct('болт м10х30', {'type': 'болт', 'diameter': 'M10', 'length': '30'}))
+
+    assert [r['sku'] for r in results] == ['B-1']
+
+
+def test_fallback_mode_used_when_edge_function_fails(monkeypatch):
+    patch_local(monkeypatch, MODE_FALLBACK)
+
+    results = asyncio.run(message_processor.search_parts_direct('шайба', {'type': 'шайба'}))
+
+    assert [r['sku'] for r in results] == ['W-1']
+
+
+def test_supabase_source_reuses_catalog_snapshot(monkeypatch):
+    import config
+    import services.local_search as local_search_module
+    import pipeline.processing_pipeline as processing_pipeline
+    from pipeline.catalog_store import CatalogStore
+
+    store = CatalogStore({
+        'sku': row['sku'], 'name': row['name'], 'pack_qty': 100, 'unit': 'шт',
+        'specs_json': {'diameter': 'M10'} if row['sku'] == 'B-1' else {},
+    } for row in ROWS)
+    loads = []
+
+    async def load_items():
+        loads.append('items')
+        return store
+
+    async def load_aliases():
+        return []
+
+    async def check_version():
+        return 1
+
+    pipeline = processing_pipeline.ProcessingPipeline()
+    pipeline.catalog_cache._load_items = load_items
+    pipeline.catalog_cache._load_aliases = load_aliases
+    pipeline.catalog_cache._check_version = check_version
+    monkeypatch.setattr(processing_pipeline, '_processing_pipeline', pipeline)
+    monkeypatch.setattr(config, 'LOCAL_SEARCH_SOURCE', 'supabase')
+    monkeypatch.setattr(local_search_module, '_local_search_engine', None)
+    monkeypatch.setattr(local_search_module, '_checked_at', None)
+    monkeypatch.setattr(local_search_module, '_load_lock', None)
+
+    results = asyncio.run(local_search_module.local_search(
+        'болт м10х30', {'type': 'болт', 'diameter': 'M10', 'length': '30'}
+    ))
+
+    assert [r['sku'] for r in results] == ['B-1']
+    assert results[0]['pack_size'] == 100
+    assert results[0]['diameter'] == 'M10'
+    # The engine searches the snapshot itself, no second catalog load
+    assert local_search_module._local_search_engine.rows is store
+    assert loads == ['items']
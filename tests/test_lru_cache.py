@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Тесты LRUCache
+"""
+
+import os
+import sys
+import asyncio
+import threading
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.cache import LRUCache, SingleFlight
+
+
+def test_eviction_order_and_stats():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1  # 'a' становится самым свежим
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 1, 'hit_rate': 0.6667}
+
+
+def test_get_or_compute_caches_none():
+    cache = LRUCache()
+    calls = []
+    for _ in range(3):
+        cache.get_or_compute('key', lambda: calls.append(1))
+    assert len(calls) == 1
+
+
+def test_concurrent_access():
+    cache = LRUCache(maxsize=50)
+
+    def worker(offset):
+        for i in range(1000):
+            cache.get_or_compute((offset + i) % 100, lambda: i)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) == 50
+    assert cache.hits + cache.misses == 8000
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.run(key, lambda key=key: fetch(key)) for key in 'aaab'))
+        assert results == ['A', 'A', 'A', 'B']
+        assert len(flight) == 0
+        # После завершения вызов выполняется снова
+        assert await flight.run('a', lambda: fetch('a')) == 'A'
+
+    asyncio.run(scenario())
+    assert calls == ['a', 'b', 'a']
+    assert flight.coalesced == 2
+
+
+def test_single_flight_shares_exceptions():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.run('k', fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
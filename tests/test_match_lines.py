@@ -0,0 +1,82 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('GPT_CACHE_PATH', '')
+
+from pipeline.processing_pipeline import ProcessingPipeline
+from pipeline.text_parser import ParsedLine
+
+
+def make_pipeline():
+    pipeline = ProcessingPipeline()
+
+    async def fake_match_line(parsed_line, items, aliases, catalog_index=None, search_fallback=True):
+        if float(parsed_line.normalized_text) < 0:
+            raise RuntimeError("boom")
+        return [parsed_line.raw_text], None
+
+    pipeline._match_line = fake_match_line
+    return pipeline
+
+
+def make_lines(*values):
+    return [ParsedLine(raw_text=f'line {i}', normalized_text=str(value)) for i, value in enumerate(values)]
+
+
+def test_lines_keep_input_order_and_failures_yield_none():
+    pipeline = make_pipeline()
+    lines = make_lines(0, -1, 0, 0)
+
+    matches = asyncio.run(pipeline._match_lines(lines, [], []))
+
+    assert matches[0] == (['line 0'], None)
+    assert matches[1] is None
+    assert matches[2] == (['line 2'], None)
+    assert matches[3] == (['line 3'], None)
+
+
+def test_search_timeout_leaves_lines_without_candidates():
+    pipeline = ProcessingPipeline()
+    pipeline.stage_timeout = 0.05
+    lines = make_lines(0, 0)
+
+    async def no_local(parsed_line, items, aliases, catalog_index=None):
+        return []
+
+    async def slow_search(parsed_lines):
+        await asyncio.sleep(1)
+        return [['late'] for _ in parsed_lines]
+
+    pipeline.matching_engine.find_local_candidates = no_local
+    pipeline.matching_engine.search_fallback_batch = slow_search
+
+    matches = asyncio.run(pipeline._match_lines(lines, [], []))
+
+    assert matches == [([], None)] * 2
+
+
+def test_lines_without_local_candidates_share_one_search():
+    pipeline = ProcessingPipeline()
+    lines = make_lines(0, 0, 0)
+    calls = []
+
+    async def no_local(parsed_line, items, aliases, catalog_index=None):
+        return []
+
+    async def search_fallback_batch(parsed_lines):
+        calls.append([line.raw_text for line in parsed_lines])
+        return [[] for _ in parsed_lines]
+
+    pipeline.matching_engine.find_local_candidates = no_local
+    pipeline.matching_engine.search_fallback_batch = search_fallback_batch
+
+    matches = asyncio.run(pipeline._match_lines(lines, [], []))
+
+    assert calls == [['line 0', 'line 1', 'line 2']]
+    assert matches == [([], None)] * 3
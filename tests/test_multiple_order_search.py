@@ -0,0 +1,92 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+import pipeline.message_processor as message_processor
+from pipeline.message_processor import MessagePipeline
+
+
+def make_items(count, unique):
+    return [{'type': 'болт', 'diameter': f'M{n % unique + 4}', 'length': '30 мм', 'quantity': n + 1}
+            for n in range(count)]
+
+
+def patch_search(monkeypatch, latency=0.0, concurrency=4):
+    state = {'calls': [], 'running': 0, 'peak': 0}
+
+    async def fake_search(query, user_intent):
+        state['calls'].append(query)
+        state['running'] += 1
+        state['peak'] = max(state['peak'], state['running'])
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            state['running'] -= 1
+        if user_intent['diameter'] == 'M4':
+            return []
+        return [{'sku': f"SKU-{user_intent['diameter']}", 'name': query, 'probability_percent': 90}]
+
+    async def no_batch(supabase_url, supabase_key, queries, **kwargs):
+        # Edge Function без batch-контракта: все позиции ищутся поштучно
+        return [None] * len(queries)
+
+    monkeypatch.setenv('SUPABASE_URL', 'http://localhost')
+    monkeypatch.setenv('SUPABASE_KEY', 'test')
+    monkeypatch.setattr(message_processor, 'fastener_search_batch', no_batch)
+    monkeypatch.setattr(message_processor, 'search_parts_direct', fake_search)
+    monkeypatch.setattr(message_processor, 'SEARCH_CONCURRENCY', concurrency)
+    return state
+
+
+def run_search(items):
+    # Для поиска позиций бот и сервисы не нужны
+    pipeline = MessagePipeline.__new__(MessagePipeline)
+    return asyncio.run(pipeline._handle_multiple_order_search(items))
+
+
+def test_results_keep_position_order(monkeypatch):
+    state = patch_search(monkeypatch, latency=0.01, concurrency=3)
+    items = make_items(12, unique=5)
+
+    results = run_search(items)
+
+    assert [r['order_position'] for r in results] == list(range(1, 13))
+    assert [r['requested_quantity'] for r in results] == list(range(1, 13))
+    assert sorted(state['calls']) == sorted(set(state['calls']))
+    assert len(state['calls']) == 5
+    assert state['peak'] == 3
+
+
+def test_duplicate_positions_get_independent_results(monkeypatch):
+    patch_search(monkeypatch)
+    items = make_items(6, unique=2)
+
+    results = run_search(items)
+
+    assert results[0]['sku'] == 'НЕ НАЙДЕНО'
+    assert results[1]['sku'] == 'SKU-M5'
+    assert results[3]['sku'] == 'SKU-M5'
+    assert results[1] is not results[3]
+    assert (results[1]['order_position'], results[3]['order_position']) == (2, 4)
+
+
+def test_primary_local_search_runs_positions_concurrently(monkeypatch):
+    from services.local_search import MODE_PRIMARY
+
+    state = patch_search(monkeypatch, latency=0.01, concurrency=3)
+    monkeypatch.setattr(message_processor, 'local_search_mode', lambda: MODE_PRIMARY)
+    items = make_items(8, unique=8)
+
+    results = run_search(items)
+
+    # Same semaphore as the per-item fallback of the batch call
+    assert [r['order_position'] for r in results] == list(range(1, 9))
+    assert len(state['calls']) == 8
+    assert state['peak'] == 3
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Тесты локального разбора строк правилами и отправки ассистенту только неуверенных строк
+"""
+
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+import pytest
+
+from services.rule_parser import RuleParser, load_alias_rows
+
+ALIASES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Source', 'aliases.jsonl')
+ITEM_KEYS = {'type', 'subtype', 'diameter', 'length', 'material', 'coating', 'standard', 'quantity', 'confidence'}
+
+
+@pytest.fixture(scope='module')
+def parser():
+    return RuleParser(load_alias_rows(ALIASES_PATH), min_confidence=0.8)
+
+
+def test_well_formed_lines_get_assistant_shaped_items(parser):
+    item = parser.parse_line("болты М10х30 DIN 933 оцинк 100 шт")
+    assert set(item) == ITEM_KEYS
+    assert item['type'] == 'болт'
+    assert (item['diameter'], item['length']) == ('M10', '30')
+    assert item['standard'] == 'DIN 933' and item['coating'] == 'оцинкованный'
+    assert item['quantity'] == '100 шт'
+    assert item['confidence'] >= 0.8
+
+    # Size as written in the prompt rules: 4,2х90 -> '4.2' and '90'
+    item = parser.parse_line("саморез 4,2х90")
+    assert (item['type'], item['diameter'], item['length']) == ('саморез', '4.2', '90')
+
+    # Nuts and washers need only a diameter
+    assert parser.parse_line("гайки М8")['confidence'] >= 0.8
+
+
+def test_three_part_size_keeps_latin_separator(parser):
+    from shared.size_key import size_key
+
+    item = parser.parse_line("дюбель 6x8x40 100 шт")
+    assert (item['diameter'], item['length']) == ('6x8', '40')
+    assert size_key(item['diameter'], item['length']) == '6x8x40'
+
+
+def test_aliases_give_type_and_subtype(parser):
+    item = parser.parse_line("гровер М10 50 шт")
+    assert (item['type'], item['subtype']) == ('шайба', 'пружинная')
+    assert parser.parse_line("анкер-болт М10х100")['type'] == 'анкерный болт'
+
+
+# Lines with the item the assistant returns for them (prompts/assistant_prompt.json rules)
+ASSISTANT_ITEMS = [
+    ("Анкер клиновой 10х100 20 шт",
+     {'type': 'анкер', 'subtype': 'клиновой', 'diameter': '10', 'length': '100', 'quantity': '20 шт'}),
+    ("анкер латунный М10х40",
+     {'type': 'анкер', 'diameter': 'M10', 'length': '40', 'material': 'латунь'}),
+    ("гайка колпачковая М8 DIN 1587 50 шт",
+     {'type': 'гайка', 'subtype': 'колпачковая', 'diameter': 'M8', 'standard': 'DIN 1587', 'quantity': '50 шт'}),
+    ("болт М10х30 DIN 933 оцинк",
+     {'type': 'болт', 'diameter': 'M10', 'length': '30', 'standard': 'DIN 933', 'coating': 'оцинкованный'}),
+    ("саморез 4,2х90 1000 шт",
+     {'type': 'саморез', 'diameter': '4.2', 'length': '90', 'quantity': '1000 шт'}),
+]
+
+
+@pytest.mark.parametrize('line,expected', ASSISTANT_ITEMS)
+def test_confident_items_carry_assistant_fields(parser, line, expected):
+    item = parser.parse_line(line)
+    assert item['confidence'] >= 0.8
+    assert {key: value for key, value in item.items() if key != 'confidence'} == dict.fromkeys(ITEM_KEYS - {'confidence'}) | expected
+
+
+@pytest.mark.parametrize('line', [
+    "что-то непонятное",
+    "нужно что-то для крепления",
+    "шайба плоская",
+    "болт с гайкой М8х40",
+    "Анкер с кольцом м8 10х100 (30шт)",
+    "шайба кровельная M4,8x14 EPDM Черный 2.5мм",
+    "шпилька М10х1000",
+])
+def test_unexplained_words_and_sizes_lower_confidence(parser, line):
+    assert parser.parse_line(line)['confidence'] < 0.8
+
+
+def test_parse_marks_uncertain_lines(parser):
+    lines = parser.parse("болт М8х40 100 шт\nчто-то непонятное\n- гайка М8 DIN 934")
+    assert [line.line for line in lines] == ["болт М8х40 100 шт", "что-то непонятное", "гайка М8 DIN 934"]
+    assert [line.confident for line in lines] == [True, False, True]
+
+
+def make_processor(parser, reply):
+    from services.message_processor import MessageProcessor
+
+    processor = MessageProcessor()
+    processor.rule_parser = parser
+    sent = []
+
+    async def fake_analyze(text: str, chat_id=None) -> dict:
+        sent.append((text, chat_id))
+        return reply
+
+    processor.openai_service.analyze_with_assistant = fake_analyze  # type: ignore
+    return processor, sent
+
+
+def process(processor, text, chat_id=42):
+    message = SimpleNamespace(text=text, chat_id=chat_id)
+    return asyncio.run(processor._process_text_message(message))['user_intent']
+
+
+def test_only_uncertain_lines_go_to_assistant(parser):
+    reply = {'type': 'шайба', 'subtype': 'кровельная', 'diameter': '4.8', 'length': '14', 'confidence': 0.9}
+    processor, sent = make_processor(parser, reply)
+
+    user_intent = process(processor, "болт М8х40 100 шт\nшайба кровельная 4,8х14 EPDM\nгайка М8 200 шт")
+
+    assert sent == [("шайба кровельная 4,8х14 EPDM", 42)]
+    assert user_intent['is_multiple_order']
+    # The assistant's item takes the place of its line
+    assert [item['type'] for item in user_intent['items']] == ['болт', 'шайба', 'гайка']
+    assert user_intent['items'][1]['subtype'] == 'кровельная'
+
+
+def test_confident_order_skips_assistant(parser):
+    processor, sent = make_processor(parser, {'type': 'неизвестно', 'confidence': 0.1})
+
+    user_intent = process(processor, "болт М8х40 100 шт\nгайка М8 200 шт")
+    single = process(processor, "саморез 4,2х90 1000 шт")
+
+    assert sent == []
+    assert [item['type'] for item in user_intent['items']] == ['болт', 'гайка']
+    # One shape for local results, as for the assistant's {'items': [...]}
+    assert single['is_multiple_order']
+    assert single['items'][0]['type'] == 'саморез' and single['items'][0]['quantity'] == '1000 шт'
+
+
+def test_failed_assistant_keeps_local_items(parser):
+    processor, sent = make_processor(parser, {'type': 'неизвестно', 'confidence': 0.1})
+
+    user_intent = process(processor, "болт М8х40 100 шт\nшайба плоская\nчто-то непонятное")
+
+    assert sent == [("шайба плоская\nчто-то непонятное", 42)]
+    assert [item['type'] for item in user_intent['items']] == ['болт', 'шайба']
+
+
+def test_uncertain_text_goes_to_assistant_whole(parser):
+    reply = {'items': [{'type': 'анкер', 'diameter': 'M8', 'confidence': 0.95}]}
+    processor, sent = make_processor(parser, reply)
+
+    user_intent = process(processor, "Анкер с кольцом м8 10х100 (30шт)")
+
+    assert sent == [("Анкер с кольцом м8 10х100 (30шт)", 42)]
+    assert user_intent == {'is_multiple_order': True, 'items': reply['items']}
+
+
+def test_unmatched_assistant_items_reparse_whole_message(parser):
+    text = "болт М8х40 100 шт\nшайба кровельная 4,8х14 EPDM\nгайка М8 200 шт"
+    reply = {'items': [{'type': 'шайба', 'confidence': 0.9}, {'type': 'шайба', 'confidence': 0.9}]}
+    processor, sent = make_processor(parser, reply)
+
+    user_intent = process(processor, text)
+
+    # Two items for one line cannot be placed, so the order is not guessed
+    assert sent == [("шайба кровельная 4,8х14 EPDM", 42), (text, 42)]
+    assert user_intent == {'is_multiple_order': True, 'items': reply['items']}
@@ -0,0 +1,133 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from aiohttp import web
+
+from services.search_cache import MemorySearchBackend, SearchResultCache, make_search_key
+from shared.http import close_http_session
+
+
+class FakeVersion:
+    def __init__(self):
+        self.version = 1
+        self.checks = 0
+
+    async def __call__(self):
+        self.checks += 1
+        return (self.version,)
+
+
+def make_cache(**kwargs):
+    return SearchResultCache(MemorySearchBackend(100), metrics_prefix='test_search_cache', **kwargs)
+
+
+def test_key_is_canonical():
+    assert make_search_key('Саморез  4,2х90', {'type': 'Саморез', 'quantity': 10}) == \
+        make_search_key('саморез 4.2x90', {'type': 'саморез', 'quantity': 500})
+    assert make_search_key('болт', {'diameter': 'M10'}) != make_search_key('болт', {'diameter': 'M12'})
+
+
+def test_hits_return_copies_and_empty_results_expire_sooner():
+    async def scenario():
+        cache = make_cache(ttl=60, negative_ttl=0.05)
+        await cache.set('болт M10', {}, [{'sku': 'B-10'}])
+        await cache.set('болт M99', {}, [])
+
+        first = await cache.get('болт M10', {})
+        first[0]['order_position'] = 3
+        assert await cache.get('болт M10', {}) == [{'sku': 'B-10'}]
+
+        assert await cache.get('болт M99', {}) == []
+        await asyncio.sleep(0.06)
+        assert await cache.get('болт M99', {}) is None
+        assert await cache.get('болт M10', {}) is not None
+
+    asyncio.run(scenario())
+
+
+def test_catalog_version_change_invalidates():
+    async def scenario():
+        version = FakeVersion()
+        cache = make_cache(check_version=version, version_interval=0)
+        await cache.set('гайка M8', {}, [{'sku': 'N-8'}])
+        assert await cache.get('гайка M8', {}) == [{'sku': 'N-8'}]
+
+        version.version = 2
+        assert await cache.get('гайка M8', {}) is None
+
+    asyncio.run(scenario())
+
+
+def test_catalog_version_is_shared_and_queried_in_a_thread(monkeypatch):
+    import threading
+    from database import supabase_client
+
+    queries = []
+
+    def fetch_catalog_version(client):
+        queries.append(threading.current_thread() is threading.main_thread())
+        return (640, None, 10)
+
+    monkeypatch.setattr(supabase_client, 'fetch_catalog_version', fetch_catalog_version)
+    monkeypatch.setattr(supabase_client, '_supabase_client', object())
+    monkeypatch.setattr(supabase_client, '_catalog_version', None)
+    monkeypatch.setattr(supabase_client, '_catalog_version_lock', None)
+
+    async def scenario():
+        cache = make_cache(check_version=supabase_client.get_catalog_version, version_interval=0)
+        await cache.set('гайка M8', {}, [{'sku': 'N-8'}])
+        assert await cache.get('гайка M8', {}) == [{'sku': 'N-8'}]
+        assert cache.catalog_version == str((640, None, 10))
+        assert await supabase_client.get_catalog_version() == (640, None, 10)
+        # One query for every reader within the TTL, made off the event loop thread
+        assert queries == [False]
+
+        # The catalog cache asks for a fresh version on every check
+        await supabase_client.get_catalog_version(max_age=0)
+        assert queries == [False, False]
+
+    asyncio.run(scenario())
+
+
+def test_search_parts_direct_uses_cache(monkeypatch):
+    import pipeline.message_processor as message_processor
+
+    async def scenario():
+        calls = []
+
+        async def search(request):
+            payload = await request.json()
+            calls.append(payload['search_query'])
+            return web.json_response({'results': [{'sku': 'S-1', 'name': payload['search_query']}]})
+
+        app = web.Application()
+        app.router.add_post('/functions/v1/fastener-search', search)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        cache = make_cache()
+        monkeypatch.setenv('SUPABASE_URL', f'http://127.0.0.1:{port}')
+        monkeypatch.setenv('SUPABASE_KEY', 'test')
+        monkeypatch.setattr(message_processor, 'get_search_cache', lambda: cache)
+        try:
+            first = await message_processor.search_parts_direct('болт М10х30', {'type': 'болт'})
+            second = await message_processor.search_parts_direct('болт  м10x30', {'type': 'Болт'})
+        finally:
+            await close_http_session()
+            await runner.cleanup()
+
+        assert calls == ['болт М10х30']
+        assert first == second
+
+    asyncio.run(scenario())
@@ -0,0 +1,78 @@
+import os
+import re
+import sys
+import json
+import shutil
+import subprocess
+
+import pytest
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.size_key import item_size_keys, size_key, size_keys_from_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EDGE_FUNCTION = os.path.join(ROOT, 'supabase', 'functions', 'fastener-search', 'index.ts')
+
+NAMES = [
+    'Болт DIN 933 кл.пр.8.8 М10х30, цинк',
+    'Саморез по металлу 4,2 × 90 мм',
+    'Анкер забиваемый латунный с насечками М8 (10х28)',
+    'Анкер двухраспорный 8х100х12 с крюком',
+    'Уголок крепежный 50x50x40',
+    'Шайба плоская М10',
+    'Шпилька М12х1000 DIN 975',
+]
+
+INTENTS = [
+    ('М10', '30 мм'), ('M10', '30'), ('10', '30'), ('4,2', '90'), ('4.2 мм', '90мм'),
+    ('50x50', '40'), ('М10', ''), ('', '30'), (None, None), ('M 8', '100'),
+]
+
+
+def test_query_key():
+    assert size_key('М10', '30 мм') == '10x30'
+    assert size_key('M10', '30') == size_key('10', '30')
+    assert size_key('4,2', '90') == '4.2x90'
+    assert size_key('50х50', '40') == '50x50x40'
+    assert size_key('М10', '') is None
+    assert size_key('болт', '30') is None
+
+
+def test_keys_from_name():
+    assert size_keys_from_text('Болт DIN 933 кл.пр.8.8 М10х30, цинк') == ['10x30']
+    assert size_keys_from_text('Саморез по металлу 4,2 × 90 мм') == ['4.2x90']
+    assert size_keys_from_text('Анкер двухраспорный 8х100х12 с крюком') == ['8x100x12', '8x100']
+    assert size_keys_from_text('Шайба плоская М10') == []
+
+
+def test_item_keys_prefer_ingested_column():
+    assert item_size_keys({'name': 'Болт М10х30', 'size_keys': ['12x40']}) == ['12x40']
+    assert item_size_keys({'name': 'Болт', 'specs_json': {'diameter': 'M10', 'length': '30'}}) == ['10x30']
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="node is not installed")
+def test_edge_function_uses_same_canonical_form(tmp_path):
+    source = open(EDGE_FUNCTION, encoding='utf-8').read()
+    start = source.index('// ---------- канонический ключ размера')
+    end = source.index('// Варианты записи размера')
+    # Снимаем аннотации типов TypeScript, чтобы выполнить блок в node
+    block = re.sub(r'\): string(\[\]| \| null)? \{', ') {', source[start:end])
+    block = re.sub(r'(\w+): string\)', r'\1)', block)
+    block = block.replace('const keys: string[] = []', 'const keys = []')
+
+    script = tmp_path / 'size_key.mjs'
+    script.write_text(block + f"""
+const names = {json.dumps(NAMES, ensure_ascii=False)};
+const intents = {json.dumps(INTENTS, ensure_ascii=False)};
+console.log(JSON.stringify({{
+  names: names.map(sizeKeysFromText),
+  intents: intents.map(([d, l]) => sizeKey(d, l)),
+}}));
+""", encoding='utf-8')
+
+    output = json.loads(subprocess.check_output(['node', str(script)]))
+
+    assert output['names'] == [size_keys_from_text(name) for name in NAMES]
+    assert output['intents'] == [size_key(d, l) for d, l in INTENTS]
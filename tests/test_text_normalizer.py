@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Тесты TextNormalizer: предкомпилированные шаблоны и однопроходная замена синонимов
+"""
+
+import os
+import sys
+
+# Добавляем родительскую папку в путь для импорта
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.text_parser import TextNormalizer, TextParser
+
+
+normalizer = TextNormalizer()
+
+
+def test_size_normalization():
+    assert normalizer.normalize_text("болт М10х30") == "болт M10x30"
+    assert normalizer.normalize_text("анкер 10 х 20 мм") == "анкер 10x20"
+    assert normalizer.normalize_text("винт M8*40") == "винт M8x40"
+
+
+def test_word_sizes():
+    assert normalizer.normalize_text("шпилька двенадцатка").startswith("шпилька M12")
+    assert normalizer.extract_parameters(normalizer.normalize_text("шестерка 40"))['diameter'] == 'M6'
+
+
+def test_synonyms():
+    assert normalizer.normalize_text("болт анкерный M10x100") == "анкерный болт M10x100"
+    assert normalizer.normalize_text("гайка ZN") == "гайка оцинкованный"
+
+
+def test_standard_forms_are_kept():
+    # Уже нормализованные слова не раскрываются повторно и сохраняют регистр
+    assert normalizer.normalize_text("оцинкованный болт") == "оцинкованный болт"
+    assert normalizer.normalize_text("Анкер клиновой") == "Анкер клиновой"
+
+
+def test_normalize_is_idempotent():
+    text = normalizer.normalize_text("болт анкерный М10х100 мм оцинк")
+    assert normalizer.normalize_text(text) == text
+
+
+def test_quantity_prefers_pieces():
+    assert normalizer.extract_quantity("5 уп 100 шт") == (100.0, 'шт')
+    assert normalizer.extract_quantity("3 упаковок") == (3.0, 'уп')
+    assert normalizer.extract_quantity("болт") == (None, None)
+
+
+def test_parse_text_input():
+    lines = TextParser().parse_text_input("- болт М10х30 DIN 933 цинк 50 шт;гайка M10")
+    assert [line.raw_text for line in lines] == ["болт М10х30 DIN 933 цинк 50 шт", "гайка M10"]
+    assert lines[0].qty_units == 50.0
+    assert lines[0].extracted_params == {
+        'diameter': 'M10', 'length': '30', 'standard': 'DIN 933', 'coating': 'оцинкованный'
+    }
+
+
+def test_parser_cache_hits_and_copies():
+    parser = TextParser(cache_size=2)
+    first = parser.parse_text_input("болт М10х30 DIN 933 5 шт")[0]
+    first.extracted_params['diameter'] = 'M99'
+    first.raw_text = "Row 1: " + first.raw_text
+
+    second = parser.parse_text_input("болт М10х30 DIN 933 5 шт")[0]
+    assert second.extracted_params['diameter'] == 'M10'
+    assert second.raw_text == "болт М10х30 DIN 933 5 шт"
+    assert parser.cache_stats()['lines']['hits'] == 1
+
+    # Размер кэша ограничен, старые строки вытесняются
+    parser.parse_text_input("гайка M8\nшайба M6")
+    assert len(parser.line_cache) == 2
+    assert parser.line_cache.get("болт М10х30 DIN 933 5 шт") is None
@@ -0,0 +1,83 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import ParsedLine
+from pipeline.trigram_index import TrigramIndex, trigrams
+
+ITEMS = [
+    {'sku': 'S-1', 'name': 'Саморез кровельный 4,8х35', 'specs_json': {}},
+    {'sku': 'A-1', 'name': 'Анкер клиновой М10х100', 'specs_json': {}},
+    {'sku': 'D-1', 'name': 'Дюбель молли', 'specs_json': {}},
+]
+ALIASES = [{'alias': 'саморез по металлу', 'type': 'Саморез'}]
+
+
+def test_trigrams_are_padded():
+    assert trigrams('Болт') == {'  б', ' бо', 'бол', 'олт', 'лт '}
+
+
+def test_search_ranks_by_similarity_and_filters():
+    index = TrigramIndex(['саморез', 'саморезы', 'анкер', 'болт', 'Саморез'])
+
+    assert len(index) == 4
+    assert index.search('самарез', k=2) == [('саморез', 5 / 11), ('саморезы', 4 / 13)]
+    assert index.search('самарез', k=2, min_similarity=0.44) == [('саморез', 5 / 11)]
+    assert index.search('анкерр', k=5)[0][0] == 'анкер'
+    assert index.search('шайба') == []
+
+
+def test_correct_typos_uses_name_and_alias_words():
+    index = CatalogIndex(ITEMS, aliases=ALIASES)
+
+    assert index.correct_typos('самарез по металу 4,8х35') == (
+        'саморез по металлу 4,8х35', [('самарез', 'саморез'), ('металу', 'металлу')]
+    )
+    assert index.correct_typos('анкер клиновой') == ('анкер клиновой', [])
+    assert index.correct_typos('шуруп') == ('шуруп', [])
+
+
+def test_misspelled_line_finds_local_candidates():
+    engine = MatchingEngine()
+    index = CatalogIndex(ITEMS, engine.type_patterns, ALIASES)
+    line = ParsedLine(raw_text='дюпель', normalized_text='дюпель', extracted_params={})
+
+    candidates = asyncio.run(engine.find_local_candidates(line, ITEMS, ALIASES, index))
+
+    assert [candidate.ku for candidate in candidates] == ['D-1']
+    assert candidates[0].explanation.endswith('(typo: дюпель -> дюбель)')
+
+    engine.typo_min_similarity = 0
+    assert asyncio.run(engine.find_local_candidates(line, ITEMS, ALIASES, index)) == []
+
+
+def test_correction_skips_normalizer_words_and_well_matched_lines():
+    engine = MatchingEngine()
+    items = ITEMS + [{'sku': 'B-1', 'name': 'Болт DIN 933 М10х30 оцинк', 'specs_json': {}}]
+    index = CatalogIndex(items, engine.type_patterns, ALIASES)
+
+    # "оцинк" is normalized to "оцинкованный"; the catalog's "оцинк" is not a correction of it
+    assert index.correct_typos('болт оцинкованный')[1] == [('оцинкованный', 'оцинк')]
+    assert index.correct_typos('болт оцинкованный', keep=engine.normalized_words) == ('болт оцинкованный', [])
+
+    corrected = []
+    correct_typos = index.correct_typos
+    index.correct_typos = lambda *args, **kwargs: corrected.append(args[0]) or correct_typos(*args, **kwargs)
+    engine.typo_max_candidates = 1
+    for text in ('болт М10х30', 'дюпель'):
+        line = ParsedLine(raw_text=text, normalized_text=text, extracted_params={})
+        asyncio.run(engine.find_local_candidates(line, items, ALIASES, index))
+
+    # Lines that already have enough local candidates are not corrected
+    assert corrected == ['дюпель']
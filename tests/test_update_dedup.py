@@ -0,0 +1,127 @@
+import os
+import sys
+import asyncio
+from types import SimpleNamespace
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from shared.metrics import get_metrics
+from shared.update_dedup import UpdateDeduplicator
+from tests.test_update_queue import import_fresh
+
+
+def payload(update_id):
+    return {'update_id': update_id, 'message': {
+        'message_id': update_id, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'text': 'болт М8'
+    }}
+
+
+def test_claim_rejects_repeats_within_ring():
+    dedup = UpdateDeduplicator(maxsize=3, metrics_prefix='test_dedup')
+
+    assert [dedup.claim(update_id) for update_id in (1, 2, 1, 3, 2)] == [True, True, False, True, False]
+    assert dedup.claim(4)  # evicts 1
+    assert 1 not in dedup and len(dedup) == 3
+    assert dedup.claim(1)
+    assert dedup.claim(None) and dedup.claim(None)
+    assert get_metrics().counter('test_dedup.duplicates').value == 2
+
+
+def test_sqlite_keeps_ids_across_restarts(tmp_path):
+    path = str(tmp_path / 'updates.sqlite3')
+    first = UpdateDeduplicator(maxsize=2, path=path, metrics_prefix='test_dedup_sqlite')
+    for update_id in (10, 11, 12):
+        first.claim(update_id)
+    first.close()
+
+    second = UpdateDeduplicator(maxsize=2, path=path, metrics_prefix='test_dedup_sqlite')
+    assert not second.claim(11) and not second.claim(12)
+    assert second.claim(10)
+    rows = second._conn.execute("SELECT update_id FROM processed_updates ORDER BY update_id").fetchall()
+    assert rows == [(10,), (12,)]
+    second.close()
+
+
+def test_webhook_v2_skips_redelivered_updates(monkeypatch):
+    import httpx
+    webhook_app_v2 = import_fresh(monkeypatch, 'webhook_app_v2')
+
+    async def scenario():
+        handled = []
+
+        async def handler(update):
+            handled.append(update['update_id'])
+
+        queue = webhook_app_v2.update_queue
+        queue.handler = handler
+        transport = httpx.ASGITransport(app=webhook_app_v2.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            responses = [
+                (await client.post('/telegram/webhook', json=payload(update_id))).json()
+                for update_id in (5001, 5002, 5001, 5001)
+            ]
+        await queue.stop()
+        return responses, handled
+
+    responses, handled = asyncio.run(scenario())
+
+    assert handled == [5001, 5002]
+    assert [response.get('duplicate', False) for response in responses] == [False, False, True, True]
+
+
+def test_webhook_v1_skips_redelivered_updates(monkeypatch):
+    webhook_app = import_fresh(monkeypatch, 'webhook_app')
+    processed = []
+
+    async def process_update(update):
+        processed.append(update.update_id)
+
+    monkeypatch.setattr(webhook_app, 'application', SimpleNamespace(bot=None, process_update=process_update))
+
+    async def scenario():
+        for update_id in (6001, 6001, 6002):
+            await webhook_app.handle_update(payload(update_id))
+
+    asyncio.run(scenario())
+
+    assert processed == [6001, 6002]
+
+
+def test_webhook_v2_processes_redelivery_of_rejected_update(monkeypatch):
+    import httpx
+    webhook_app_v2 = import_fresh(monkeypatch, 'webhook_app_v2')
+
+    async def scenario():
+        handled = []
+        release = asyncio.Event()
+
+        async def handler(update):
+            await release.wait()
+            handled.append(update['update_id'])
+
+        queue = webhook_app_v2.UpdateQueue(handler, workers=1, maxsize=1)
+        monkeypatch.setattr(webhook_app_v2, 'update_queue', queue)
+        transport = httpx.ASGITransport(app=webhook_app_v2.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            # 5101 is taken by the worker, 5102 fills the queue, 5103 is rejected
+            statuses = []
+            for update_id in (5101, 5102, 5103):
+                statuses.append((await client.post('/telegram/webhook', json=payload(update_id))).status_code)
+                await asyncio.sleep(0.01)
+            release.set()
+            await asyncio.sleep(0.05)
+            # Telegram redelivers the rejected update
+            redelivered = (await client.post('/telegram/webhook', json=payload(5103))).json()
+        await queue.stop()
+        return statuses, redelivered, handled
+
+    statuses, redelivered, handled = asyncio.run(scenario())
+
+    assert statuses == [200, 200, 503]
+    assert redelivered == {'ok': True}
+    assert handled == [5101, 5102, 5103]
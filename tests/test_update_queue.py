@@ -0,0 +1,157 @@
+import os
+import sys
+import asyncio
+import importlib
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+
+from shared.metrics import get_metrics
+from shared.update_queue import UpdateQueue
+
+
+def test_updates_of_one_key_run_in_order_and_keys_in_parallel():
+    async def scenario():
+        handled = []
+        running = 0
+        peak = 0
+
+        async def handler(update):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            handled.append(update)
+            running -= 1
+
+        queue = UpdateQueue(handler, workers=4, maxsize=40, key=lambda update: update[0], metrics_prefix='test_order')
+        for i in range(5):
+            for chat in ('a', 'b', 'c'):
+                assert queue.submit((chat, i))
+        await queue.stop()
+        return handled, peak
+
+    handled, peak = asyncio.run(scenario())
+
+    assert len(handled) == 15
+    for chat in ('a', 'b', 'c'):
+        assert [i for key, i in handled if key == chat] == list(range(5))
+    assert peak > 1
+
+
+def test_full_queue_rejects_and_metrics_are_recorded():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(update):
+            await release.wait()
+            if update == 'bad':
+                raise ValueError(update)
+
+        queue = UpdateQueue(handler, workers=1, maxsize=2, metrics_prefix='test_overload')
+        accepted = [queue.submit(update) for update in ('first', 'bad', 'third')]
+        await asyncio.sleep(0)  # the worker takes 'first', freeing a slot
+        accepted.append(queue.submit('fourth'))
+        accepted.append(queue.submit('fifth'))
+        depth = get_metrics().snapshot()['gauges']['test_overload.queue_depth']
+        release.set()
+        await queue.stop()
+        return accepted, depth
+
+    accepted, depth = asyncio.run(scenario())
+    metrics = get_metrics().snapshot()
+
+    assert accepted == [True, True, False, True, False]
+    assert depth == 2
+    assert metrics['counters']['test_overload.enqueued'] == 3
+    assert metrics['counters']['test_overload.rejected'] == 2
+    assert metrics['counters']['test_overload.processed'] == 2
+    assert metrics['counters']['test_overload.failed'] == 1
+    assert metrics['histograms']['test_overload.queue_wait_ms']['count'] == 3
+    assert metrics['gauges']['test_overload.queue_depth'] == 0
+
+
+def test_stop_gives_up_after_timeout():
+    async def scenario():
+        async def handler(update):
+            await asyncio.sleep(10)
+
+        queue = UpdateQueue(handler, workers=1, maxsize=5, metrics_prefix='test_stop')
+        queue.submit('slow')
+        await asyncio.wait_for(queue.stop(timeout=0.05), 1)
+        return queue.running
+
+    assert asyncio.run(scenario()) is False
+
+
+def import_fresh(monkeypatch, name):
+    """Fresh import of a module with the real telegram, openai and dotenv packages"""
+    # test_smart_parser replaces these packages with stubs for the whole session
+    for stubbed in ('telegram', 'telegram.ext', 'openai', 'dotenv'):
+        module = sys.modules.get(stubbed)
+        if module is not None and getattr(module, '__file__', None) is None:
+            monkeypatch.delitem(sys.modules, stubbed)
+    monkeypatch.delitem(sys.modules, name, raising=False)
+    return importlib.import_module(name)
+
+
+def test_webhook_responds_before_update_is_handled(monkeypatch):
+    import httpx
+    webhook_app_v2 = import_fresh(monkeypatch, 'webhook_app_v2')
+
+    async def scenario():
+        release = asyncio.Event()
+        handled = []
+
+        async def handler(payload):
+            await release.wait()
+            handled.append(payload['update_id'])
+
+        queue = webhook_app_v2.update_queue
+        queue.handler = handler
+        transport = httpx.ASGITransport(app=webhook_app_v2.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            statuses = []
+            for update_id in range(queue.maxsize + 1):
+                payload = {'update_id': update_id, 'message': {'chat': {'id': 1}, 'text': 'болт'}}
+                response = await asyncio.wait_for(client.post('/telegram/webhook', json=payload), 1)
+                statuses.append(response.status_code)
+            metrics = (await client.get('/metrics')).json()
+
+        release.set()
+        await queue.stop()
+        return statuses, handled, metrics
+
+    statuses, handled, metrics = asyncio.run(scenario())
+
+    # One chat shares a worker: its queue holds maxsize / workers, the worker holds one more
+    per_worker = webhook_app_v2.update_queue.maxsize // webhook_app_v2.update_queue.workers
+    assert statuses.count(200) == per_worker + 1
+    assert set(statuses[per_worker + 1:]) == {503}
+    assert handled == list(range(per_worker + 1))
+    assert metrics['gauges']['webhook.queue_depth'] == per_worker
+
+
+def test_metrics_require_the_webhook_secret(monkeypatch):
+    import httpx
+    webhook_app_v2 = import_fresh(monkeypatch, 'webhook_app_v2')
+    monkeypatch.setattr(webhook_app_v2, 'SECRET', 'webhook-secret')
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=webhook_app_v2.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            anonymous = await client.get('/metrics')
+            wrong = await client.get('/metrics', headers={'X-Telegram-Bot-Api-Secret-Token': 'guess'})
+            allowed = await client.get('/metrics', headers={'X-Telegram-Bot-Api-Secret-Token': 'webhook-secret'})
+        if webhook_app_v2.update_queue is not None:
+            await webhook_app_v2.update_queue.stop()
+        return anonymous, wrong, allowed
+
+    anonymous, wrong, allowed = asyncio.run(scenario())
+
+    assert (anonymous.status_code, wrong.status_code) == (403, 403)
+    assert allowed.status_code == 200 and 'counters' in allowed.json()
@@ -0,0 +1,84 @@
+import os
+import sys
+import asyncio
+
+# Ensure package root is importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Ensure required env variables for config
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('OPENAI_API_KEY', 'test')
+os.environ.setdefault('SUPABASE_URL', 'http://localhost')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from pipeline.catalog_index import CatalogIndex
+from pipeline.catalog_store import CatalogStore
+from pipeline.matching_engine import MatchingEngine
+from pipeline.text_parser import TextParser
+from pipeline.vector_scoring import top_k_positions
+from tests.benchmark_matching_engine import synthetic_catalog
+from tests.test_catalog_index import LINES, load_items, ranked_matches
+
+SYNTHETIC_LINES = LINES + [
+    "болт М10х30 DIN 933 оцинк",
+    "саморез 4,2х90",
+    "анкер клиновой М12х120",
+    "гайка М8 DIN 934",
+    "винт М6х20 DIN 912",
+    "SKU-000042",
+]
+
+
+def engines(top_k=0):
+    scalar, vector = MatchingEngine(), MatchingEngine()
+    scalar.vector_min_shortlist = float('inf')
+    vector.vector_min_shortlist = 0
+    scalar.top_k = vector.top_k = top_k
+    return scalar, vector
+
+
+def local_candidates(engine, parsed_line, index):
+    return asyncio.run(engine.find_local_candidates(parsed_line, index.items, index.aliases, index))
+
+
+@pytest.mark.parametrize('catalog, lines', [
+    (load_items, LINES),
+    (lambda: synthetic_catalog(5_000), SYNTHETIC_LINES),
+    (lambda: CatalogStore(synthetic_catalog(5_000)), SYNTHETIC_LINES),
+])
+@pytest.mark.parametrize('top_k', [0, 1, 7])
+def test_vectorized_scores_match_scalar_path(catalog, lines, top_k):
+    items = catalog()
+    scalar, vector = engines(top_k)
+    index = CatalogIndex(items, scalar.type_patterns)
+
+    for parsed_line in TextParser().parse_text_input("\n".join(lines)):
+        assert ranked_matches(vector, parsed_line, index) == ranked_matches(scalar, parsed_line, index)
+
+        actual = local_candidates(vector, parsed_line, index)
+        assert actual == local_candidates(scalar, parsed_line, index)
+        if top_k:
+            assert len(actual) <= top_k
+
+
+def test_index_without_type_patterns():
+    items = synthetic_catalog(1_000)
+    scalar, vector = engines(top_k=3)
+    index = CatalogIndex(items)
+
+    for parsed_line in TextParser().parse_text_input("\n".join(SYNTHETIC_LINES)):
+        assert ranked_matches(vector, parsed_line, index) == ranked_matches(scalar, parsed_line, index)
+        assert local_candidates(vector, parsed_line, index) == local_candidates(scalar, parsed_line, index)
+
+
+def test_top_k_positions_breaks_ties_by_position():
+    scores = np.array([0.5, 0.9, 0.5, 0.7, 0.5, 0.9])
+
+    assert top_k_positions(scores, 3).tolist() == [1, 3, 5]
+    assert top_k_positions(scores, 4).tolist() == [0, 1, 3, 5]
+    assert top_k_positions(scores, 5).tolist() == [0, 1, 2, 3, 5]
+    assert top_k_positions(scores, 0).tolist() == list(range(6))
@@ -11,6 +11,7 @@ from telegram.ext import ContextTypes
 # Import V2 handlers
 from handlers.command_handler import handle_start, handle_help
 from handlers.message_handler_v2 import handle_message_v2 as handle_message
+from shared.update_dedup import get_update_deduplicator
 
 # Configuration
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
@@ -103,7 +104,9 @@ async def handle_update(payload: dict):
     try:
         # Create Update object from payload
         update = Update.de_json(payload, application.bot)
-        if update:
+        if update and not get_update_deduplicator().claim(update.update_id):
+            log.info(f"Skipping duplicate update {update.update_id}")
+        elif update:
             # Process the update
             await application.process_update(update)
             log.info(f"Processed update {update.update_id}")
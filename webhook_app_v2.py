@@ -17,6 +17,12 @@ from handlers.message_handler_v2 import handle_message_v2
 
 # Import improved logging
 from railway_logging import setup_railway_logging, log_telegram_message, log_error
+from shared.metrics import get_metrics
+from shared.http import open_http_session, close_http_session
+from shared.update_queue import UpdateQueue
+from shared.update_dedup import get_update_deduplicator
+from services.openai_service import close_thread_manager
+from config import WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, WEBHOOK_DRAIN_TIMEOUT
 
 # Configuration
 BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
@@ -89,8 +95,19 @@ async def initialize_bot():
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize bot on startup"""
+    """Initialize bot, shared HTTP session and update workers on startup"""
+    await open_http_session()
     await initialize_bot()
+    if update_queue:
+        update_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Finish queued updates, then delete idle assistant threads and close shared HTTP session"""
+    if update_queue:
+        await update_queue.stop(WEBHOOK_DRAIN_TIMEOUT)
+    await close_thread_manager()
+    await close_http_session()
 
 @app.get('/health')
 async def health():
@@ -103,6 +120,13 @@ async def version():
     sha = os.getenv('APP_VERSION', os.getenv('RAILWAY_GIT_COMMIT_SHA', 'unknown'))
     return {'version': sha[:7] if sha != 'unknown' else 'dev', 'architecture': 'v2'}
 
+@app.get('/metrics')
+async def metrics(x_telegram_bot_api_secret_token: str | None = Header(default=None)):
+    """Process metrics (catalog cache, latencies, webhook queue), behind the webhook secret"""
+    if SECRET and (x_telegram_bot_api_secret_token != SECRET):
+        return PlainTextResponse('forbidden', status_code=403)
+    return get_metrics().snapshot()
+
 async def handle_update(payload: dict):
     """Process Telegram update"""
     if application is None:
@@ -120,6 +144,41 @@ async def handle_update(payload: dict):
     except Exception as e:
         log.error(f"Error processing update: {e}")
 
+def update_chat_id(payload: dict):
+    """Chat id of an update payload, so one chat's updates are handled in order"""
+    for value in payload.values():
+        if isinstance(value, dict):
+            chat = value.get('chat') or (value.get('message') or {}).get('chat') or value.get('from')
+            if chat:
+                return chat.get('id')
+    return None
+
+# Updates are queued and handled by workers, so Telegram gets its response
+# without waiting for GPT, searches and Excel generation
+update_queue = UpdateQueue(handle_update, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE, key=update_chat_id) if WEBHOOK_WORKERS > 0 else None
+
+async def accept_update(payload: dict):
+    """Queue the update (or process it inline without workers) and build the webhook response
+
+    The update_id is claimed only once the update is accepted: an update rejected
+    with 503 must be processed when Telegram redelivers it.
+    """
+    dedup = get_update_deduplicator()
+    update_id = payload.get('update_id')
+    if update_id in dedup and not dedup.claim(update_id):
+        # Telegram redelivery of an update we already have: acknowledge without processing again
+        log.info(f"Skipping duplicate update {update_id}")
+        return JSONResponse({'ok': True, 'duplicate': True})
+    if update_queue is None:
+        dedup.claim(update_id)
+        await handle_update(payload)
+        return JSONResponse({'ok': True})
+    if not update_queue.submit(payload):
+        # Overloaded: Telegram redelivers updates that got an error response
+        return JSONResponse({'ok': False, 'error': 'overloaded'}, status_code=503, headers={'Retry-After': '5'})
+    dedup.claim(update_id)
+    return JSONResponse({'ok': True})
+
 @app.post('/telegram/webhook')
 async def telegram_webhook(req: Request, x_telegram_bot_api_secret_token: str | None = Header(default=None)):
     """Main webhook endpoint for Telegram"""
@@ -128,8 +187,7 @@ async def telegram_webhook(req: Request, x_telegram_bot_api_secret_token: str |
     
     try:
         payload = await req.json()
-        await handle_update(payload)
-        return JSONResponse({'ok': True})
+        return await accept_update(payload)
     except Exception as e:
         log.error(f"Error in telegram webhook: {e}")
         return JSONResponse({'ok': False, 'error': str(e)}, status_code=500)
@@ -144,8 +202,7 @@ async def telegram_webhook_token(token: str, req: Request, x_telegram_bot_api_se
     
     try:
         payload = await req.json()
-        await handle_update(payload)
-        return JSONResponse({'ok': True})
+        return await accept_update(payload)
     except Exception as e:
         log.error(f"Error in webhook with token: {e}")
         return JSONResponse({'ok': False, 'error': str(e)}, status_code=500)